@@ -1,12 +1,45 @@
+import asyncio
+import os
 import requests
 import json
+import time
+from typing import AsyncIterator, Optional
 
-OLLAMA_URL = "http://ollama:11434/api/generate"
-MODEL_NAME = "llama3" 
+import httpx
 
-def generate_match_commentary(context_text: str):
-    prompt = f"""
-    You are a professional football analyst covering the Premier League.
+from . import leagues, metrics
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://ollama:11434/api/generate")
+MODEL_NAME = os.getenv("OLLAMA_MODEL", "llama3")
+# (connect, read) timeouts in seconds; CPU-only generation can take a while
+OLLAMA_TIMEOUT = (
+    float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("OLLAMA_READ_TIMEOUT", "180"))
+)
+
+# Shared keep-alive clients (created on first use, so a pod that never
+# generates commentary never opens a connection to Ollama)
+_session: Optional[requests.Session] = None
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        _session = requests.Session()
+    return _session
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        connect, read = OLLAMA_TIMEOUT
+        _async_client = httpx.AsyncClient(timeout=httpx.Timeout(read, connect=connect))
+    return _async_client
+
+
+PROMPT_TEMPLATE = """
+    You are a professional football analyst covering {league_name} matches.
     Write a match preview based STRICTLY on the provided data.
     Predict the exact score of the match.
     Predict which team will score first and how many cards will be given, and to whom.
@@ -27,16 +60,84 @@ def generate_match_commentary(context_text: str):
     Then provide the full match preview and analysis.
     """
 
+
+# Part of the commentary cache key (commentary.content_key); bump it when the
+# prompt built from the same template and data changes
+PROMPT_VERSION = 2
+
+
+def build_prompt(context_text: str, league: str = leagues.DEFAULT_LEAGUE) -> str:
+    return PROMPT_TEMPLATE.format(league_name=leagues.display_name(league), context_text=context_text)
+
+
+def generate_match_commentary(context_text: str, league: str = leagues.DEFAULT_LEAGUE):
+    prompt = build_prompt(context_text, league)
     payload = {
         "model": MODEL_NAME,
         "prompt": prompt,
         "stream": False
     }
 
+    started = time.perf_counter()
     try:
-        response = requests.post(OLLAMA_URL, json=payload)
+        response = _get_session().post(OLLAMA_URL, json=payload, timeout=OLLAMA_TIMEOUT)
         response.raise_for_status()
-        return response.json().get("response", "Error generating analysis.")
+        text = response.json().get("response")
+        if not text or not text.strip():
+            # Never cached or stored as commentary
+            raise RuntimeError("Empty response from the model")
+        metrics.OLLAMA_DURATION.labels("generate", "ok").observe(time.perf_counter() - started)
+        return text
     except Exception as e:
+        metrics.OLLAMA_DURATION.labels("generate", "error").observe(time.perf_counter() - started)
         print(f"Ollama Error: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+async def stream_match_commentary(context_text: str, league: str = leagues.DEFAULT_LEAGUE) -> AsyncIterator[str]:
+    """
+    Yields commentary tokens as Ollama produces them (newline-delimited JSON
+    chunks with "stream": True). Raises on HTTP or connection errors.
+    """
+    payload = {
+        "model": MODEL_NAME,
+        "prompt": build_prompt(context_text, league),
+        "stream": True
+    }
+
+    started = time.perf_counter()
+    first_token = True
+    outcome = "error"
+    try:
+        async with _get_async_client().stream("POST", OLLAMA_URL, json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                if chunk.get("response"):
+                    if first_token:
+                        metrics.OLLAMA_FIRST_TOKEN.observe(time.perf_counter() - started)
+                        first_token = False
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+        outcome = "ok"
+    except (GeneratorExit, asyncio.CancelledError):
+        # The client went away mid-stream
+        outcome = "cancelled"
+        raise
+    finally:
+        metrics.OLLAMA_DURATION.labels("stream", outcome).observe(time.perf_counter() - started)
+
+
+async def close_clients():
+    global _session, _async_client
+    if _session is not None:
+        _session.close()
+        _session = None
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -1,12 +1,24 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, desc
-from . import models
+import numpy as np
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import or_, desc, insert, select, union_all
+from . import leaderboards, leagues, metrics, models, profiler
+
+def _last_finished(team_column, team_id: int, limit: int):
+    return select(models.Match.id, models.Match.date).filter(
+        team_column == team_id, models.Match.status == 'FINISHED'
+    ).order_by(desc(models.Match.date)).limit(limit).subquery()
 
 def get_team_form(db: Session, team_id: int, limit: int = 5):
     """Analyzes form based on the last 5 matches."""
-    matches = db.query(models.Match).filter(
-        or_(models.Match.home_team_id == team_id, models.Match.away_team_id == team_id),
-        models.Match.status == 'FINISHED'
+    # Home and away halves separately (instead of an OR) so each one is an
+    # index range read on (team, status, date DESC)
+    home = _last_finished(models.Match.home_team_id, team_id, limit)
+    away = _last_finished(models.Match.away_team_id, team_id, limit)
+    last = union_all(select(home.c.id, home.c.date), select(away.c.id, away.c.date)).subquery()
+    matches = db.query(models.Match).options(
+        joinedload(models.Match.stats)
+    ).filter(
+        models.Match.id.in_(select(last.c.id))
     ).order_by(desc(models.Match.date)).limit(limit).all()
 
     stats = {
@@ -42,17 +54,17 @@ def get_team_form(db: Session, team_id: int, limit: int = 5):
 
     return stats
 
-def get_top_players_string(db: Session, team_id: int):
-    """NEW: Gets the top 4 players of a team (by goals and xG).
-    Used to feed Ollama with real names."""
-    players = db.query(models.Player).filter(models.Player.team_id == team_id).all()
-    
+def format_squad(players) -> str:
+    """
+    Formats the top 4 players (by goals, then xG) as a prompt string.
+    `players` is any iterable of objects/rows with name, goals, assists and xg.
+    """
     if not players:
         return "No player data available."
 
     # Sort players: First by Goals, then by xG. Take the top 4.
     top_players = sorted(players, key=lambda p: (p.goals, p.xg), reverse=True)[:4]
-    
+
     # Create a string e.g.: "Salah (10G, 5.2xG), Nunez (5G)"
     names_list = []
     for p in top_players:
@@ -60,75 +72,266 @@ def get_top_players_string(db: Session, team_id: int):
         if p.assists > 0: stats_part += f", {p.assists} Assists"
         if p.xg > 0: stats_part += f", {p.xg:.2f} xG"
         names_list.append(f"{p.name} ({stats_part})")
-        
+
     return "; ".join(names_list)
 
-def generate_predictions(db: Session):
-    upcoming = db.query(models.Match).filter(
+def get_top_players_string(db: Session, team_id: int):
+    """NEW: Gets the top 4 players of a team (by goals and xG).
+    Used to feed Ollama with real names."""
+    return _squads_by_team(db, [team_id])[team_id]
+
+def compute_form_table(db: Session, limit: int = 5, seasons=None, team_ids=None) -> dict:
+    """
+    Batch form engine: loads every finished match (with xG) in one query and
+    computes last-`limit` form for all teams in a single vectorized pass.
+    `seasons` limits it to those seasons (team rows are per season anyway),
+    `team_ids` to the matches of those teams (only their rows are complete).
+
+    Returns parallel arrays indexed by team position, sorted by team id:
+    team_ids, matches, points, goals_scored, goals_conceded, xg_created,
+    xg_conceded, plus `results` (list of W/D/L lists, most recent first).
+    """
+    query = db.query(
+        models.Match.home_team_id, models.Match.away_team_id,
+        models.Match.home_score, models.Match.away_score,
+        models.MatchStat.home_xg, models.MatchStat.away_xg
+    ).outerjoin(
+        models.MatchStat, models.MatchStat.match_id == models.Match.id
+    )
+    if team_ids is None:
+        query = query.filter(models.Match.status == 'FINISHED')
+    else:
+        # The teams' finished matches: home and away halves (instead of an
+        # OR), each an index range read, then a primary key lookup per match
+        team_ids = list(team_ids)
+        played = union_all(
+            select(models.Match.id).filter(models.Match.home_team_id.in_(team_ids), models.Match.status == 'FINISHED'),
+            select(models.Match.id).filter(models.Match.away_team_id.in_(team_ids), models.Match.status == 'FINISHED'),
+        )
+        query = query.filter(models.Match.id.in_(played))
+    if seasons is not None:
+        query = query.filter(models.Match.season.in_(list(seasons)))
+    rows = query.order_by(models.Match.date, models.Match.id).all()
+
+    if not rows:
+        empty_i = np.zeros(0, dtype=np.int64); empty_f = np.zeros(0)
+        return {
+            "team_ids": empty_i, "matches": empty_i, "points": empty_i,
+            "goals_scored": empty_i, "goals_conceded": empty_i,
+            "xg_created": empty_f, "xg_conceded": empty_f, "results": []
+        }
+
+    cols = np.array(
+        [(h, a, hs or 0, as_ or 0, hxg or 0.0, axg or 0.0) for h, a, hs, as_, hxg, axg in rows],
+        dtype=np.float64
+    )
+    n = len(cols)
+    home, away = cols[:, 0].astype(np.int64), cols[:, 1].astype(np.int64)
+    hs, as_ = cols[:, 2].astype(np.int64), cols[:, 3].astype(np.int64)
+
+    # One row per (team, match) appearance; `order` is the chronological rank
+    team = np.concatenate([home, away])
+    gf = np.concatenate([hs, as_]); ga = np.concatenate([as_, hs])
+    xgf = np.concatenate([cols[:, 4], cols[:, 5]]); xga = np.concatenate([cols[:, 5], cols[:, 4]])
+    order = np.concatenate([np.arange(n), np.arange(n)])
+
+    # Group by team, most recent first, and keep the first `limit` per group
+    idx = np.lexsort((-order, team))
+    team, gf, ga, xgf, xga = team[idx], gf[idx], ga[idx], xgf[idx], xga[idx]
+    first = np.r_[True, team[1:] != team[:-1]]
+    positions = np.arange(len(team))
+    rank = positions - np.maximum.accumulate(np.where(first, positions, 0))
+    keep = rank < limit
+
+    team_ids = team[first]
+    group = (np.cumsum(first) - 1)[keep]
+    gf, ga, xgf, xga = gf[keep], ga[keep], xgf[keep], xga[keep]
+    size = len(team_ids)
+
+    points = np.where(gf > ga, 3, np.where(gf == ga, 1, 0))
+    letters = np.where(gf > ga, "W", np.where(gf == ga, "D", "L"))
+    bounds = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])[1:]
+
+    return {
+        "team_ids": team_ids,
+        "matches": np.bincount(group, minlength=size),
+        "points": np.bincount(group, weights=points, minlength=size).astype(np.int64),
+        "goals_scored": np.bincount(group, weights=gf, minlength=size).astype(np.int64),
+        "goals_conceded": np.bincount(group, weights=ga, minlength=size).astype(np.int64),
+        "xg_created": np.bincount(group, weights=xgf, minlength=size),
+        "xg_conceded": np.bincount(group, weights=xga, minlength=size),
+        "results": [chunk.tolist() for chunk in np.split(letters, bounds)],
+    }
+
+def _form_index(form: dict, team_ids: np.ndarray) -> np.ndarray:
+    """Maps team ids to row positions in a form table (-1 when the team has no form)."""
+    known = form["team_ids"]
+    if len(known) == 0:
+        return np.full(len(team_ids), -1)
+    pos = np.clip(np.searchsorted(known, team_ids), 0, len(known) - 1)
+    return np.where(known[pos] == team_ids, pos, -1)
+
+def score_fixtures(form: dict, home_ids: np.ndarray, away_ids: np.ndarray) -> dict:
+    """
+    Vectorized prediction scores for many fixtures at once.
+    Returns arrays: valid, home_pos, away_pos, diff, outcome (1 home, 0 draw, -1 away), confidence.
+    """
+    hi = _form_index(form, home_ids); ai = _form_index(form, away_ids)
+    valid = (hi >= 0) & (ai >= 0)
+    if not valid.any():
+        zeros = np.zeros(len(home_ids))
+        return {
+            "valid": valid, "home_pos": hi, "away_pos": ai,
+            "diff": zeros, "outcome": zeros.astype(np.int64), "confidence": zeros
+        }
+    h = np.where(valid, hi, 0); a = np.where(valid, ai, 0)
+
+    mh = form["matches"][h]; ma = form["matches"][a]
+    h_attack = (form["goals_scored"][h] + form["xg_created"][h]) / mh
+    a_attack = (form["goals_scored"][a] + form["xg_created"][a]) / ma
+    h_defense = (form["goals_conceded"][h] + form["xg_conceded"][h]) / mh
+    a_defense = (form["goals_conceded"][a] + form["xg_conceded"][a]) / ma
+
+    home_score = h_attack - a_defense + 0.25 # Home advantage
+    away_score = a_attack - h_defense
+    diff = home_score - away_score
+
+    outcome = np.where(diff > 0.35, 1, np.where(diff < -0.35, -1, 0))
+    confidence = np.where(
+        outcome != 0,
+        0.5 + np.minimum(np.abs(diff) / 3, 0.45),
+        0.5 + (0.35 - np.abs(diff))
+    )
+    return {
+        "valid": valid, "home_pos": h, "away_pos": a,
+        "diff": diff, "outcome": outcome, "confidence": confidence
+    }
+
+def _squads_by_team(db: Session, team_ids) -> dict:
+    """Formats each team's top scorers, read from the leaderboard index in one query."""
+    players = leaderboards.squads(db, team_ids)
+    return {team_id: format_squad(players.get(team_id)) for team_id in team_ids}
+
+def _fixtures(db: Session):
+    """Upcoming fixtures with both team names."""
+    home_team = aliased(models.Team); away_team = aliased(models.Team)
+    return db.query(
+        models.Match.id, models.Match.league, models.Match.season,
+        models.Match.home_team_id, models.Match.away_team_id,
+        home_team.name.label("home_name"), away_team.name.label("away_name")
+    ).join(
+        home_team, home_team.id == models.Match.home_team_id
+    ).join(
+        away_team, away_team.id == models.Match.away_team_id
+    ).filter(
         or_(models.Match.status == 'SCHEDULED', models.Match.status == 'TIMED')
-    ).all()
+    )
 
-    print(f">>> [ALGO] Generating predictions for {len(upcoming)} matches...")
-    count = 0
+def _prediction_rows(upcoming, form: dict, scores: dict, squads: dict) -> list:
+    """Prediction rows (with the prompt text) of the fixtures that could be scored."""
+    predictions = []
+    for i in np.flatnonzero(scores["valid"]):
+        match = upcoming[i]
+        h = scores["home_pos"][i]; a = scores["away_pos"][i]
+        outcome = scores["outcome"][i]
+        confidence = float(scores["confidence"][i])
 
-    for match in upcoming:
-        # Delete old prediction to update player data
-        db.query(models.Prediction).filter(models.Prediction.match_id == match.id).delete()
-        
-        home_stats = get_team_form(db, match.home_team_id)
-        away_stats = get_team_form(db, match.away_team_id)
-        
-        if home_stats["matches"] == 0 or away_stats["matches"] == 0: continue
-
-        h_attack = (home_stats["goals_scored"] + home_stats["xg_created"]) / home_stats["matches"]
-        a_attack = (away_stats["goals_scored"] + away_stats["xg_created"]) / away_stats["matches"]
-        h_defense = (home_stats["goals_conceded"] + home_stats["xg_conceded"]) / home_stats["matches"]
-        a_defense = (away_stats["goals_conceded"] + away_stats["xg_conceded"]) / away_stats["matches"]
-
-        home_score = h_attack - a_defense + 0.25 # Home advantage
-        away_score = a_attack - h_defense
-
-        diff = home_score - away_score
-        winner_id = None; confidence = 0.5; outcome_text = "Draw"
-
-        if diff > 0.35:
-            winner_id = match.home_team_id
-            confidence = 0.5 + min(diff/3, 0.45)
-            outcome_text = f"{match.home_team.name} Win"
-        elif diff < -0.35:
-            winner_id = match.away_team_id
-            confidence = 0.5 + min(abs(diff)/3, 0.45)
-            outcome_text = f"{match.away_team.name} Win"
+        if outcome == 1:
+            winner_id = match.home_team_id; outcome_text = f"{match.home_name} Win"
+        elif outcome == -1:
+            winner_id = match.away_team_id; outcome_text = f"{match.away_name} Win"
         else:
-            outcome_text = "Draw"
-            confidence = 0.5 + (0.35 - abs(diff))
-
-        home_squad = get_top_players_string(db, match.home_team_id)
-        away_squad = get_top_players_string(db, match.away_team_id)
+            winner_id = None; outcome_text = "Draw"
 
         analysis_text = (
-            f"PREMIER LEAGUE MATCH DATA\n"
-            f"Match: {match.home_team.name} vs {match.away_team.name}\n"
+            f"{leagues.display_name(match.league).upper()} MATCH DATA\n"
+            f"Match: {match.home_name} vs {match.away_name}\n"
             f"Prediction: {outcome_text} (Confidence: {int(confidence*100)}%)\n\n"
-            f"=== {match.home_team.name} ===\n"
-            f"Recent Form: {', '.join(home_stats['results'])}\n"
-            f"Stats (Last 5): {home_stats['goals_scored']} Goals, {home_stats['xg_created']:.2f} xG\n"
-            f"KEY PLAYERS (AVAILABLE): {home_squad}\n\n"
-            f"=== {match.away_team.name} ===\n"
-            f"Recent Form: {', '.join(away_stats['results'])}\n"
-            f"Stats (Last 5): {away_stats['goals_scored']} Goals, {away_stats['xg_created']:.2f} xG\n"
-            f"KEY PLAYERS (AVAILABLE): {away_squad}\n"
+            f"=== {match.home_name} ===\n"
+            f"Recent Form: {', '.join(form['results'][h])}\n"
+            f"Stats (Last 5): {form['goals_scored'][h]} Goals, {form['xg_created'][h]:.2f} xG\n"
+            f"KEY PLAYERS (AVAILABLE): {squads[match.home_team_id]}\n\n"
+            f"=== {match.away_name} ===\n"
+            f"Recent Form: {', '.join(form['results'][a])}\n"
+            f"Stats (Last 5): {form['goals_scored'][a]} Goals, {form['xg_created'][a]:.2f} xG\n"
+            f"KEY PLAYERS (AVAILABLE): {squads[match.away_team_id]}\n"
         )
 
-        pred = models.Prediction(
-            match_id=match.id,
-            predicted_winner_id=winner_id,
-            is_draw_prediction=(winner_id is None),
-            confidence_score=confidence,
-            analysis_content=analysis_text
-        )
-        db.add(pred)
-        count += 1
+        predictions.append({
+            "match_id": match.id,
+            "predicted_winner_id": winner_id,
+            "is_draw_prediction": winner_id is None,
+            "confidence_score": confidence,
+            "analysis_content": analysis_text
+        })
+    return predictions
+
+def _score(form: dict, upcoming) -> tuple:
+    """Scores the fixtures; returns (scores, ids of the teams of the scored fixtures)."""
+    home_ids = np.array([m.home_team_id for m in upcoming], dtype=np.int64)
+    away_ids = np.array([m.away_team_id for m in upcoming], dtype=np.int64)
+    scores = score_fixtures(form, home_ids, away_ids)
+    valid = np.flatnonzero(scores["valid"])
+    return scores, {int(home_ids[i]) for i in valid} | {int(away_ids[i]) for i in valid}
+
+@profiler.profiled("generate_predictions")
+def generate_predictions(db: Session):
+    """
+    Regenerates predictions for all upcoming matches with a constant number
+    of queries: upcoming fixtures, finished matches (form), squads, one bulk
+    delete and one bulk insert.
+    """
+    with metrics.stage("predictions", "fixtures"):
+        upcoming = _fixtures(db).all()
+
+    print(f">>> [ALGO] Generating predictions for {len(upcoming)} matches...")
+    if not upcoming:
+        db.commit()
+        return {"status": "success", "predictions": 0}
+
+    with metrics.stage("predictions", "delete"):
+        # Delete old predictions to update player data
+        db.query(models.Prediction).filter(
+            models.Prediction.match_id.in_([m.id for m in upcoming])
+        ).delete(synchronize_session=False)
+
+    with metrics.stage("predictions", "score"):
+        form = compute_form_table(db, seasons={m.season for m in upcoming})
+        scores, scored_teams = _score(form, upcoming)
+
+    with metrics.stage("predictions", "squads"):
+        squads = _squads_by_team(db, scored_teams)
+
+    predictions = _prediction_rows(upcoming, form, scores, squads)
+
+    with metrics.stage("predictions", "write"):
+        if predictions:
+            db.execute(insert(models.Prediction.__table__), predictions)
+        db.commit()
+    return {"status": "success", "predictions": len(predictions)}
 
+@profiler.profiled("predict_match")
+def predict_match(db: Session, match_id: int) -> bool:
+    """
+    Creates the missing prediction of one upcoming fixture, the same one
+    generate_predictions would write, from the form of its two teams only.
+    Returns False when the match is not an upcoming fixture or a team has no
+    finished match yet.
+    """
+    upcoming = _fixtures(db).filter(models.Match.id == match_id).all()
+    if not upcoming:
+        return False
+    match = upcoming[0]
+    team_ids = (match.home_team_id, match.away_team_id)
+    form = compute_form_table(db, seasons={match.season}, team_ids=team_ids)
+    scores, scored_teams = _score(form, upcoming)
+    predictions = _prediction_rows(upcoming, form, scores, _squads_by_team(db, scored_teams))
+    if not predictions:
+        return False
+    db.query(models.Prediction).filter(
+        models.Prediction.match_id == match_id
+    ).delete(synchronize_session=False)
+    db.execute(insert(models.Prediction.__table__), predictions)
     db.commit()
-    return {"status": "success", "predictions": count}
\ No newline at end of file
+    print(f">>> [ALGO] Generated the prediction of match {match_id}")
+    return True
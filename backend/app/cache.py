@@ -3,32 +3,191 @@ Redis Cache Module for Football AI Backend
 
 Provides caching functionality for API endpoints to reduce database load
 and improve response times.
+
+Two tiers:
+    L1 - bounded in-process LRU (short TTL, size limit in bytes)
+    L2 - Redis, shared by all replicas
+
+All Redis keys live under a per-app namespace (CACHE_NAMESPACE) because the
+Redis database is shared. Every cached key is also recorded in a tag set for
+its family (the first key segment, e.g. "matches"), so invalidating a family
+renames the tag set (O(1)) and UNLINKs its members; nothing uses KEYS or
+deletes outside the namespace. Invalidations are published on a pub/sub
+channel so every replica drops the matching L1 entries.
+
+Entries are stored with a "fresh until" timestamp and kept CACHE_STALE_TTL
+longer than their TTL. get_or_compute() serves the stale value while a single
+background refresh runs, and on a real miss only one request per key (Redis
+lock, SET NX + token) rebuilds the value while the others wait for it.
+
+Values are stored serialized (orjson bytes, plus a gzip copy for larger
+bodies), so read endpoints can return a cache hit without parsing it. Each
+entry carries a strong ETag computed when it is written.
 """
 
 import os
 import json
+import asyncio
+import fnmatch
 import functools
-from typing import Optional, Any, Callable
+import gzip
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Any, Callable, NamedTuple
+import orjson
 import redis
+import redis.asyncio as aioredis
 from datetime import datetime
+from sqlalchemy.orm import Session
+
+from . import metrics
 
 # Redis configuration from environment
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))  # 5 minutes default
 CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+# Prefix for every key this app writes (the Redis database is shared)
+CACHE_NAMESPACE = os.getenv("CACHE_NAMESPACE", "fm")
+# Tag sets outlive their members; they are refreshed on every write
+TAG_TTL = int(os.getenv("CACHE_TAG_TTL", "86400"))
+# Keys per UNLINK / SCAN step
+BATCH_SIZE = 500
+# Stale-while-revalidate window after CACHE_TTL (0 disables serving stale values)
+STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "600"))
+# Single-flight: max time a rebuild holds the lock / others wait for its result
+LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "10"))
+LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", "5"))
+LOCK_POLL_INTERVAL = 0.05
+# Max connections of the asyncio Redis pool
+ASYNC_POOL_SIZE = int(os.getenv("REDIS_ASYNC_POOL_SIZE", "50"))
+# Bodies at least this large are also stored pre-gzipped
+GZIP_MIN_BYTES = int(os.getenv("CACHE_GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+# After a failed connect, wait this long before trying Redis again (requests
+# then skip the cache instead of each waiting for the connect timeout)
+RECONNECT_INTERVAL = float(os.getenv("REDIS_RECONNECT_INTERVAL", "10"))
+
+# In-process L1 tier
+L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "true").lower() == "true"
+L1_TTL = float(os.getenv("CACHE_L1_TTL", "5"))  # seconds; bounds staleness if a message is missed
+L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(32 * 1024 * 1024)))
+INVALIDATION_CHANNEL = f"{CACHE_NAMESPACE}:cache:invalidate"
+# Tags this process's invalidation messages, so its listener skips them
+REPLICA_ID = uuid.uuid4().hex
 
 # Redis client (lazy initialization)
 _redis_client: Optional[redis.Redis] = None
+_reconnect_at = 0.0
+# Second connection pool without response decoding, for cached bodies
+_binary_client: Optional[redis.Redis] = None
+# asyncio client for async endpoints (connections shared by all requests)
+_async_redis: Optional[aioredis.Redis] = None
+
+
+class LRUCache:
+    """
+    Thread-safe LRU with per-entry TTL and a total size limit in bytes.
+    Sizes are the length of the serialized value, as stored in Redis.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        """Returns (found, value)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return False, None
+            expires_at, size, value = item
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key: str, value: Any, size: int, ttl: float = None):
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        if size > self.max_bytes or ttl <= 0:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, pattern: str) -> int:
+        """Drops one key, or every key matching a glob pattern."""
+        with self._lock:
+            if any(ch in pattern for ch in "*?["):
+                keys = [k for k in self._data if fnmatch.fnmatchcase(k, pattern)]
+            else:
+                keys = [pattern] if pattern in self._data else []
+            for k in keys:
+                self._remove(k)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": L1_ENABLED,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+_l1 = LRUCache(L1_MAX_BYTES, L1_TTL)
+_listener: Optional[threading.Thread] = None
+_listener_stop = threading.Event()
 
 
 def get_redis_client() -> Optional[redis.Redis]:
     """Get or create Redis client connection."""
-    global _redis_client
+    global _redis_client, _reconnect_at
     
     if not CACHE_ENABLED:
         return None
     
-    if _redis_client is None:
+    if _redis_client is None and time.monotonic() >= _reconnect_at:
         try:
             _redis_client = redis.from_url(
                 REDIS_URL,
@@ -44,10 +203,30 @@ def get_redis_client() -> Optional[redis.Redis]:
         except redis.RedisError as e:
             print(f"[Cache] Failed to connect to Redis: {e}")
             _redis_client = None
+            _reconnect_at = time.monotonic() + RECONNECT_INTERVAL
     
     return _redis_client
 
 
+def get_binary_client() -> Optional[redis.Redis]:
+    """Redis client returning bytes (cached response bodies are stored as-is)."""
+    global _binary_client
+
+    if get_redis_client() is None:
+        return None
+
+    if _binary_client is None:
+        _binary_client = redis.from_url(
+            REDIS_URL,
+            decode_responses=False,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+            retry_on_timeout=True,
+            health_check_interval=30
+        )
+    return _binary_client
+
+
 def cache_key(prefix: str, *args, **kwargs) -> str:
     """Generate a cache key from prefix and arguments."""
     parts = [prefix]
@@ -56,81 +235,745 @@ def cache_key(prefix: str, *args, **kwargs) -> str:
     return ":".join(parts)
 
 
-def get_cache(key: str) -> Optional[Any]:
-    """Get value from cache."""
-    client = get_redis_client()
+def ns_key(key: str) -> str:
+    """Full Redis key for an app key (adds the namespace prefix)."""
+    return f"{CACHE_NAMESPACE}:{key}"
+
+
+def _family(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+def _tag_key(family: str) -> str:
+    return ns_key(f"tag:{family}")
+
+
+FAMILIES_KEY = ns_key("families")
+
+
+class CacheEntry(NamedTuple):
+    """A cached response body: JSON bytes, optional gzip bytes, fresh-until timestamp, ETag."""
+    body: bytes
+    gzip: Optional[bytes]
+    fresh_until: float
+    etag: str
+
+    @property
+    def fresh(self) -> bool:
+        return self.fresh_until > time.time()
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip or b"")
+
+
+def _json_default(obj):
+    return obj.isoformat() if isinstance(obj, datetime) else str(obj)
+
+
+def dumps(value: Any) -> bytes:
+    """Serializes a value to JSON bytes (orjson; datetimes as ISO 8601)."""
+    return orjson.dumps(
+        value, default=_json_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag of a JSON body (quoted, as sent in the header)."""
+    return '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _make_entry(body: bytes, ttl: int) -> CacheEntry:
+    gz = gzip.compress(body, compresslevel=GZIP_LEVEL) if len(body) >= GZIP_MIN_BYTES else None
+    return CacheEntry(body, gz, time.time() + ttl, etag_for(body))
+
+
+def _read_entry(key: str, use_l1: bool = True) -> Optional[CacheEntry]:
+    """
+    Returns the entry for a key or None. Entries are Redis hashes
+    {"body": json bytes, "gz": gzip bytes, "fresh": epoch seconds, "etag"}; past
+    `fresh` they are stale but still servable until the Redis TTL
+    (ttl + stale_ttl) removes them.
+    """
+    if L1_ENABLED and use_l1:
+        found, entry = _l1.get(key)
+        metrics.cache_lookup(key, "l1", found)
+        if found:
+            return entry
+
+    client = get_binary_client()
     if client is None:
         return None
-    
+
     try:
-        data = client.get(key)
-        if data:
-            return json.loads(data)
-    except (redis.RedisError, json.JSONDecodeError) as e:
+        entry = _parse_entry(key, client.hmget(ns_key(key), *ENTRY_FIELDS))
+        if use_l1:
+            metrics.cache_lookup(key, "redis", entry is not None)
+        return entry
+    except (redis.RedisError, ValueError) as e:
         print(f"[Cache] Get error for {key}: {e}")
-    
+
     return None
 
 
-def set_cache(key: str, value: Any, ttl: int = None) -> bool:
-    """Set value in cache with TTL."""
-    client = get_redis_client()
+ENTRY_FIELDS = ("body", "gz", "fresh", "etag")
+
+
+def _parse_entry(key: str, fields) -> Optional[CacheEntry]:
+    body, gz, fresh, etag = fields
+    if not body:
+        return None
+    entry = CacheEntry(body, gz or None, float(fresh or 0), etag.decode() if etag else etag_for(body))
+    if L1_ENABLED:
+        _l1.set(key, entry, entry.size)
+    return entry
+
+
+def _queue_write(pipe, key: str, entry: CacheEntry, ttl: int, stale_ttl: int):
+    """Adds the commands storing an entry to a (sync or asyncio) pipeline."""
+    family = _family(key)
+    mapping = {"body": entry.body, "fresh": repr(entry.fresh_until), "etag": entry.etag}
+    if entry.gzip:
+        mapping["gz"] = entry.gzip
+    pipe.delete(ns_key(key))
+    pipe.hset(ns_key(key), mapping=mapping)
+    pipe.expire(ns_key(key), ttl + stale_ttl)
+    pipe.sadd(_tag_key(family), ns_key(key))
+    pipe.expire(_tag_key(family), max(ttl + stale_ttl, TAG_TTL))
+    pipe.sadd(FAMILIES_KEY, family)
+
+
+def _write_entry(key: str, entry: CacheEntry, ttl: int, stale_ttl: int) -> bool:
+    client = get_binary_client()
     if client is None:
         return False
-    
+
     try:
-        ttl = ttl or CACHE_TTL
-        client.setex(key, ttl, json.dumps(value, default=str))
+        pipe = client.pipeline()
+        _queue_write(pipe, key, entry, ttl, stale_ttl)
+        pipe.execute()
+        metrics.cache_set(key)
+        if L1_ENABLED:
+            _l1.set(key, entry, entry.size, ttl + stale_ttl)
         return True
-    except (redis.RedisError, TypeError) as e:
+    except redis.RedisError as e:
+        print(f"[Cache] Set error for {key}: {e}")
+        return False
+
+
+def get_entry(key: str) -> Optional[CacheEntry]:
+    """The cached entry for a key, fresh or stale, or None; never builds it."""
+    entry = _read_entry(key)
+    metrics.cache_request(key, "miss" if entry is None else "fresh" if entry.fresh else "stale")
+    return entry
+
+
+def get_cache(key: str) -> Optional[Any]:
+    """Get a fresh value from cache (L1 first, then Redis)."""
+    entry = _read_entry(key)
+    if entry is not None and entry.fresh:
+        return orjson.loads(entry.body)
+    return None
+
+
+def set_cache(key: str, value: Any, ttl: int = None, stale_ttl: int = 0) -> bool:
+    """Set value in cache with TTL (kept `stale_ttl` longer for stale-while-revalidate)."""
+    ttl = ttl or CACHE_TTL
+    try:
+        body = dumps(value)
+    except TypeError as e:
         print(f"[Cache] Set error for {key}: {e}")
         return False
+    return _write_entry(key, _make_entry(body, ttl), ttl, stale_ttl)
+
+
+def replace(key: str, value: Any, ttl: int = None, stale_ttl: int = None) -> Optional[CacheEntry]:
+    """
+    Overwrites an entry in place (one MULTI/EXEC, so readers see either the old
+    or the new value, never a miss) and tells other replicas to drop their L1 copy.
+    """
+    ttl = ttl or CACHE_TTL
+    stale_ttl = STALE_TTL if stale_ttl is None else stale_ttl
+    entry = _make_entry(dumps(value), ttl)
+    if not _write_entry(key, entry, ttl, stale_ttl):
+        return None
+    _publish_invalidation(key)
+    # Publishing dropped the local copy too; keep the new entry warm here
+    if L1_ENABLED:
+        _l1.set(key, entry, entry.size, ttl + stale_ttl)
+    return entry
+
+
+# Compare-and-delete so a slow rebuild never releases someone else's lock
+_RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_flights_lock = threading.Lock()
+_flights = {}  # key -> {"event", "entry", "error"} for in-process coalescing
+_refreshing = set()  # keys with a background refresh running in this process
+
+
+def _acquire_lock(client: redis.Redis, key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    if client.set(ns_key(f"lock:{key}"), token, nx=True, px=int(LOCK_TIMEOUT * 1000)):
+        return token
+    return None
+
+
+def _release_lock(client: redis.Redis, key: str, token: str):
+    try:
+        client.eval(_RELEASE_LOCK, 1, ns_key(f"lock:{key}"), token)
+    except redis.RedisError as e:
+        print(f"[Cache] Lock release error for {key}: {e}")
+
+
+def _build_and_store(key: str, build: Callable[[], bytes], ttl: int, stale_ttl: int) -> CacheEntry:
+    entry = _make_entry(build(), ttl)
+    _write_entry(key, entry, ttl, stale_ttl)
+    return entry
+
+
+def _rebuild(key: str, build: Callable[[], bytes], ttl: int, stale_ttl: int) -> CacheEntry:
+    """
+    Single-flight across replicas: the Redis lock holder rebuilds, everyone
+    else waits (up to LOCK_WAIT) for the new entry to appear.
+    """
+    client = get_redis_client()
+    if client is None:
+        return _make_entry(build(), ttl)
+
+    try:
+        token = _acquire_lock(client, key)
+    except redis.RedisError as e:
+        print(f"[Cache] Lock error for {key}: {e}")
+        return _make_entry(build(), ttl)
+
+    if token:
+        try:
+            return _build_and_store(key, build, ttl, stale_ttl)
+        finally:
+            _release_lock(client, key, token)
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = _read_entry(key, use_l1=False)
+        if entry is not None and entry.fresh:
+            return entry
+
+    # The lock holder is too slow (or died); rebuild without waiting further
+    return _build_and_store(key, build, ttl, stale_ttl)
+
+
+def _single_flight(key: str, build: Callable[[], bytes], ttl: int, stale_ttl: int) -> CacheEntry:
+    """In-process coalescing: one thread per key rebuilds, the others share its entry."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = {"event": threading.Event(), "entry": None, "error": None}
+
+    if not leader:
+        if flight["event"].wait(LOCK_TIMEOUT) and flight["error"] is None:
+            return flight["entry"]
+        return _make_entry(build(), ttl)
+
+    try:
+        flight["entry"] = _rebuild(key, build, ttl, stale_ttl)
+        return flight["entry"]
+    except Exception as e:
+        flight["error"] = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight["event"].set()
+
+
+def _refresh_in_background(key: str, build: Callable[[], bytes], ttl: int, stale_ttl: int):
+    """Starts one background rebuild of a stale key (per process and across replicas)."""
+    with _flights_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    client = get_redis_client()
+    token = None
+    try:
+        token = _acquire_lock(client, key) if client is not None else "local"
+    except redis.RedisError as e:
+        print(f"[Cache] Lock error for {key}: {e}")
+
+    if not token:
+        # Another replica is already refreshing this key
+        with _flights_lock:
+            _refreshing.discard(key)
+        return
+
+    def run():
+        try:
+            _build_and_store(key, build, ttl, stale_ttl)
+        except Exception as e:
+            print(f"[Cache] Background refresh failed for {key}: {e}")
+        finally:
+            if client is not None:
+                _release_lock(client, key, token)
+            with _flights_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name=f"cache-refresh-{key}", daemon=True).start()
+
+
+def get_or_build(key: str, build: Callable[[], bytes], ttl: int = None,
+                 stale_ttl: int = None, refresh: Callable[[], bytes] = None) -> CacheEntry:
+    """
+    Returns the cached entry (serialized body) for `key`, building it on a miss.
+    `build` returns the JSON body bytes (see dumps()).
+
+    - Fresh hit: returned directly, nothing is deserialized.
+    - Stale hit (within `stale_ttl` after expiry): returned immediately while
+      one background refresh runs (stale-while-revalidate).
+    - Miss: single-flight; one request per key rebuilds (Redis lock), the
+      others wait for its entry instead of hitting the database.
+
+    `refresh` is used for background rebuilds when `build` cannot run
+    outside the request (e.g. it closes over a request-scoped DB session).
+    """
+    ttl = ttl or CACHE_TTL
+    stale_ttl = STALE_TTL if stale_ttl is None else stale_ttl
+
+    entry = _read_entry(key)
+    if entry is not None:
+        if entry.fresh:
+            metrics.cache_request(key, "fresh")
+            return entry
+        if stale_ttl:
+            metrics.cache_request(key, "stale")
+            _refresh_in_background(key, refresh or build, ttl, stale_ttl)
+            return entry
+
+    metrics.cache_request(key, "miss")
+    return _single_flight(key, build, ttl, stale_ttl)
+
+
+def get_or_compute(key: str, compute: Callable[[], Any], ttl: int = None,
+                   stale_ttl: int = None, refresh: Callable[[], Any] = None) -> Any:
+    """Like get_or_build() for callers that want the Python value back."""
+    computed = {}
+
+    def build():
+        computed["value"] = compute()
+        return dumps(computed["value"])
+
+    entry = get_or_build(
+        key, build, ttl, stale_ttl,
+        refresh=(lambda: dumps(refresh())) if refresh else None
+    )
+    return computed["value"] if "value" in computed else orjson.loads(entry.body)
+
+
+# --- asyncio variant (async endpoints) -------------------------------------
+# Same entries, locks and L1 tier as above, but through redis.asyncio with a
+# bounded connection pool, so async handlers never block the event loop.
+
+def get_async_redis() -> Optional[aioredis.Redis]:
+    """Get or create the asyncio Redis client (binary, pooled)."""
+    global _async_redis
+
+    if not CACHE_ENABLED:
+        return None
+
+    if _async_redis is None:
+        # Blocking pool: waits for a free connection instead of failing under bursts
+        pool = aioredis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=ASYNC_POOL_SIZE,
+            timeout=5,
+            socket_timeout=5,
+            socket_connect_timeout=5,
+            health_check_interval=30
+        )
+        _async_redis = aioredis.Redis(connection_pool=pool)
+    return _async_redis
+
+
+async def close_async_redis():
+    global _async_redis
+    if _async_redis is not None:
+        await _async_redis.aclose()
+        _async_redis = None
+
+
+async def _aread_entry(key: str, use_l1: bool = True) -> Optional[CacheEntry]:
+    if L1_ENABLED and use_l1:
+        found, entry = _l1.get(key)
+        metrics.cache_lookup(key, "l1", found)
+        if found:
+            return entry
+
+    client = get_async_redis()
+    if client is None:
+        return None
+
+    try:
+        entry = _parse_entry(key, await client.hmget(ns_key(key), *ENTRY_FIELDS))
+        if use_l1:
+            metrics.cache_lookup(key, "redis", entry is not None)
+        return entry
+    except (redis.RedisError, OSError, ValueError) as e:
+        print(f"[Cache] Get error for {key}: {e}")
+
+    return None
+
+
+async def _abuild_and_store(key: str, build, ttl: int, stale_ttl: int) -> CacheEntry:
+    entry = _make_entry(await build(), ttl)
+    client = get_async_redis()
+    if client is not None:
+        try:
+            pipe = client.pipeline()
+            _queue_write(pipe, key, entry, ttl, stale_ttl)
+            await pipe.execute()
+            metrics.cache_set(key)
+            if L1_ENABLED:
+                _l1.set(key, entry, entry.size, ttl + stale_ttl)
+        except (redis.RedisError, OSError) as e:
+            print(f"[Cache] Set error for {key}: {e}")
+    return entry
+
+
+async def _aacquire_lock(client, key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    if await client.set(ns_key(f"lock:{key}"), token, nx=True, px=int(LOCK_TIMEOUT * 1000)):
+        return token
+    return None
+
+
+async def _arelease_lock(client, key: str, token: str):
+    try:
+        await client.eval(_RELEASE_LOCK, 1, ns_key(f"lock:{key}"), token)
+    except (redis.RedisError, OSError) as e:
+        print(f"[Cache] Lock release error for {key}: {e}")
+
+
+async def _arebuild(key: str, build, ttl: int, stale_ttl: int) -> CacheEntry:
+    """Async counterpart of _rebuild (Redis lock holder rebuilds, others poll)."""
+    client = get_async_redis()
+    if client is None:
+        return _make_entry(await build(), ttl)
+
+    try:
+        token = await _aacquire_lock(client, key)
+    except (redis.RedisError, OSError) as e:
+        print(f"[Cache] Lock error for {key}: {e}")
+        return _make_entry(await build(), ttl)
+
+    if token:
+        try:
+            return await _abuild_and_store(key, build, ttl, stale_ttl)
+        finally:
+            await _arelease_lock(client, key, token)
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = await _aread_entry(key, use_l1=False)
+        if entry is not None and entry.fresh:
+            return entry
+
+    return await _abuild_and_store(key, build, ttl, stale_ttl)
+
+
+_async_flights = {}  # key -> rebuild task shared by concurrent misses
+_async_refreshes = set()  # running refresh tasks (keeps references alive)
+
+
+def _end_flight(key: str, flight: asyncio.Task):
+    if _async_flights.get(key) is flight:
+        del _async_flights[key]
+    if not flight.cancelled():
+        # The waiters re-raise it; retrieved even if they all went away
+        flight.exception()
+
+
+async def _asingle_flight(key: str, build, ttl: int, stale_ttl: int) -> CacheEntry:
+    """
+    In-process coalescing: concurrent misses await one rebuild task. The task
+    is not owned by any of them, so a caller that is cancelled (its client went
+    away) does not cancel the rebuild for the others.
+    """
+    flight = _async_flights.get(key)
+    if flight is None:
+        flight = _async_flights[key] = asyncio.ensure_future(_arebuild(key, build, ttl, stale_ttl))
+        flight.add_done_callback(lambda done: _end_flight(key, done))
+    return await asyncio.shield(flight)
+
+
+async def _arefresh(key: str, build, ttl: int, stale_ttl: int):
+    client = get_async_redis()
+    token = "local"
+    try:
+        if client is not None:
+            token = await _aacquire_lock(client, key)
+        if token:
+            await _abuild_and_store(key, build, ttl, stale_ttl)
+    except Exception as e:
+        print(f"[Cache] Background refresh failed for {key}: {e}")
+    finally:
+        if client is not None and token:
+            await _arelease_lock(client, key, token)
+        with _flights_lock:
+            _refreshing.discard(key)
+
+
+async def aget_or_build(key: str, build, ttl: int = None, stale_ttl: int = None) -> CacheEntry:
+    """
+    Async get_or_build(): `build` is an async callable returning the JSON body
+    bytes. Same fresh / stale-while-revalidate / single-flight behaviour.
+    """
+    ttl = ttl or CACHE_TTL
+    stale_ttl = STALE_TTL if stale_ttl is None else stale_ttl
+
+    entry = await _aread_entry(key)
+    if entry is not None:
+        if entry.fresh:
+            metrics.cache_request(key, "fresh")
+            return entry
+        if stale_ttl:
+            metrics.cache_request(key, "stale")
+            with _flights_lock:
+                start = key not in _refreshing
+                _refreshing.add(key)
+            if start:
+                task = asyncio.create_task(_arefresh(key, build, ttl, stale_ttl))
+                _async_refreshes.add(task)
+                task.add_done_callback(_async_refreshes.discard)
+            return entry
+
+    metrics.cache_request(key, "miss")
+    return await _asingle_flight(key, build, ttl, stale_ttl)
+
+
+def _publish_invalidation(*patterns: str):
+    """Drops matching L1 entries here and on every other replica."""
+    for pattern in patterns:
+        _l1.invalidate(pattern)
+
+    client = get_redis_client()
+    if client is None:
+        return
+    try:
+        client.publish(INVALIDATION_CHANNEL, json.dumps({"origin": REPLICA_ID, "patterns": list(patterns)}))
+    except redis.RedisError as e:
+        print(f"[Cache] Publish error on {INVALIDATION_CHANNEL}: {e}")
+
+
+def _handle_invalidation(data):
+    """Applies an invalidation message from the channel."""
+    message = json.loads(data)
+    if isinstance(message, list):
+        # Sent by a replica from before origins were added
+        message = {"patterns": message}
+    # Our own: already applied when published, and replace() has just
+    # written the new entry to L1
+    if message.get("origin") == REPLICA_ID:
+        return
+    for pattern in message["patterns"]:
+        _l1.invalidate(pattern)
+
+
+def _listen_for_invalidations():
+    while not _listener_stop.is_set():
+        client = get_redis_client()
+        if client is None:
+            _listener_stop.wait(5)
+            continue
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Messages may have been missed while (re)connecting
+            _l1.clear()
+            while not _listener_stop.is_set():
+                message = pubsub.get_message(timeout=1.0)
+                if message and message["type"] == "message":
+                    _handle_invalidation(message["data"])
+        except (redis.RedisError, ValueError) as e:
+            print(f"[Cache] Invalidation listener error: {e}")
+            _l1.clear()
+            _listener_stop.wait(1)
+        finally:
+            pubsub.close()
+
+
+def start_invalidation_listener():
+    """Subscribes this replica to cross-replica L1 invalidations."""
+    global _listener
+    if not L1_ENABLED or _listener is not None:
+        return
+    _listener_stop.clear()
+    _listener = threading.Thread(target=_listen_for_invalidations, name="cache-invalidation", daemon=True)
+    _listener.start()
+
+
+def stop_invalidation_listener():
+    global _listener
+    _listener_stop.set()
+    if _listener is not None:
+        _listener.join(timeout=2)
+        _listener = None
+
+
+def _unlink(client: redis.Redis, keys) -> int:
+    """Non-blocking delete in batches (memory is reclaimed in the background)."""
+    keys = list(keys)
+    deleted = 0
+    for i in range(0, len(keys), BATCH_SIZE):
+        deleted += client.unlink(*keys[i:i + BATCH_SIZE])
+    return deleted
+
+
+def invalidate_family(family: str) -> int:
+    """
+    Deletes every cached key of a family (e.g. "matches") via its tag set.
+    The tag set is renamed first, so keys written meanwhile go to a fresh set.
+    """
+    client = get_redis_client()
+    if client is None:
+        return 0
+
+    try:
+        purge_key = ns_key(f"tag:{family}:purge:{uuid.uuid4().hex}")
+        try:
+            client.rename(_tag_key(family), purge_key)
+        except redis.ResponseError:
+            # No tag set: nothing of this family is cached
+            _publish_invalidation(f"{family}:*")
+            return 0
+        members = client.smembers(purge_key)
+        deleted = _unlink(client, members)
+        client.unlink(purge_key)
+        _publish_invalidation(f"{family}:*")
+        return deleted
+    except redis.RedisError as e:
+        print(f"[Cache] Invalidate error for family {family}: {e}")
+
+    return 0
 
 
 def delete_cache(pattern: str) -> int:
-    """Delete cache keys matching pattern."""
+    """
+    Delete cache keys matching pattern.
+    "family:*" and "*" use the tag sets; other patterns use an incremental
+    SCAN restricted to the namespace.
+    """
+    if pattern == "*":
+        return invalidate_all_cache()
+    if pattern.endswith(":*") and not any(ch in pattern[:-2] for ch in ":*?["):
+        return invalidate_family(pattern[:-2])
+    if not any(ch in pattern for ch in "*?["):
+        return delete_keys(pattern)
+
     client = get_redis_client()
     if client is None:
         return 0
     
     try:
-        keys = client.keys(pattern)
-        if keys:
-            return client.delete(*keys)
+        deleted = 0
+        batch = []
+        for key in client.scan_iter(match=ns_key(pattern), count=BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= BATCH_SIZE:
+                deleted += _unlink(client, batch); batch = []
+        deleted += _unlink(client, batch)
+        _publish_invalidation(pattern)
+        return deleted
     except redis.RedisError as e:
         print(f"[Cache] Delete error for pattern {pattern}: {e}")
     
     return 0
 
 
+def delete_keys(*keys: str) -> int:
+    """Delete exact cache keys."""
+    client = get_redis_client()
+    if client is None or not keys:
+        return 0
+
+    try:
+        pipe = client.pipeline()
+        pipe.unlink(*(ns_key(k) for k in keys))
+        for key in keys:
+            pipe.srem(_tag_key(_family(key)), ns_key(key))
+        deleted = pipe.execute()[0]
+        _publish_invalidation(*keys)
+        return deleted
+    except redis.RedisError as e:
+        print(f"[Cache] Delete error for keys {keys[:3]}...: {e}")
+
+    return 0
+
+
+def invalidate_match(match_id: int) -> int:
+    """Invalidate the cached views of a single match (detail, upcoming list, list pages)."""
+    return delete_keys(f"matches:detail:{match_id}", "matches:upcoming") + invalidate_family("matchlist")
+
+
 def invalidate_matches_cache():
     """Invalidate all matches-related cache."""
-    deleted = delete_cache("matches:*")
+    deleted = invalidate_family("matches") + invalidate_family("matchlist")
     print(f"[Cache] Invalidated {deleted} matches cache entries")
     return deleted
 
 
 def invalidate_table_cache():
     """Invalidate all table-related cache."""
-    deleted = delete_cache("table:*")
+    deleted = invalidate_family("table")
     print(f"[Cache] Invalidated {deleted} table cache entries")
     return deleted
 
 
 def invalidate_all_cache():
-    """Invalidate all cache."""
-    deleted = delete_cache("*")
+    """Invalidate all cache entries of this app (other namespaces are untouched)."""
+    client = get_redis_client()
+    if client is None:
+        return 0
+
+    try:
+        families = client.smembers(FAMILIES_KEY)
+    except redis.RedisError as e:
+        print(f"[Cache] Invalidate error for all families: {e}")
+        return 0
+
+    deleted = sum(invalidate_family(family) for family in families)
+    _publish_invalidation("*")
     print(f"[Cache] Invalidated {deleted} total cache entries")
     return deleted
 
 
-def cached(prefix: str, ttl: int = None):
+def _call_with_own_session(func: Callable, args, kwargs):
+    """Calls func with a fresh DB session in place of a request-scoped one."""
+    if args and isinstance(args[0], Session):
+        db = Session(bind=args[0].get_bind())
+        try:
+            return func(db, *args[1:], **kwargs)
+        finally:
+            db.close()
+    return func(*args, **kwargs)
+
+
+def cached(prefix: str, ttl: int = None, stale_ttl: int = None):
     """
-    Decorator to cache function results.
+    Decorator to cache function results (single-flight on misses,
+    stale-while-revalidate within `stale_ttl`).
     
     Usage:
         @cached("matches", ttl=300)
-        def get_matches():
+        def get_matches(db):
             return db.query(...)
     """
     def decorator(func: Callable) -> Callable:
@@ -139,21 +982,15 @@ def cached(prefix: str, ttl: int = None):
             # Skip db argument for cache key
             cache_args = args[1:] if args and hasattr(args[0], 'query') else args
             key = cache_key(prefix, *cache_args, **kwargs)
-            
-            # Try to get from cache
-            cached_value = get_cache(key)
-            if cached_value is not None:
-                print(f"[Cache] HIT for {key}")
-                return cached_value
-            
-            # Cache miss - execute function
-            print(f"[Cache] MISS for {key}")
-            result = func(*args, **kwargs)
-            
-            # Store in cache
-            set_cache(key, result, ttl)
-            
-            return result
+
+            def compute():
+                print(f"[Cache] MISS for {key}")
+                return func(*args, **kwargs)
+
+            return get_or_compute(
+                key, compute, ttl, stale_ttl,
+                refresh=lambda: _call_with_own_session(func, args, kwargs)
+            )
         return wrapper
     return decorator
 
@@ -173,7 +1010,12 @@ def get_cache_stats() -> dict:
             "hits": info.get("keyspace_hits", 0),
             "misses": info.get("keyspace_misses", 0),
             "memory_used": memory.get("used_memory_human", "unknown"),
-            "keys": client.dbsize()
+            "keys": client.dbsize(),
+            "namespace": CACHE_NAMESPACE,
+            "namespace_keys": {
+                family: client.scard(_tag_key(family)) for family in client.smembers(FAMILIES_KEY)
+            },
+            "l1": _l1.stats()
         }
     except redis.RedisError as e:
-        return {"status": "error", "connected": False, "error": str(e)}
+        return {"status": "error", "connected": False, "error": str(e), "l1": _l1.stats()}
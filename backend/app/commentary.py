@@ -0,0 +1,239 @@
+"""
+Content-addressed cache and bulk pre-generation for AI commentary.
+
+Generated commentary is stored in the commentary_cache table under a hash of
+the model name, the prompt template and the prediction's analysis_content, so
+an unchanged prompt never reaches the model again (e.g. after /run-algo
+recreates predictions with the same data).
+
+pregenerate_upcoming() fills the commentary of all upcoming fixtures right
+after predictions are computed (AI_PREGENERATE, off by default): cache hits
+are applied in bulk, misses are generated against Ollama with bounded
+concurrency. Each generation takes the matches' claims first (the ones
+/analyze jobs and streams take, see jobs.py), so it never calls the model
+for a match that a user request is already generating.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy import bindparam, func, or_, update
+from sqlalchemy.orm import Session
+
+from . import ai, cache, database, leagues, models, profiler
+
+PREGENERATE_ENABLED = os.getenv("AI_PREGENERATE", "false").lower() == "true"
+PREGENERATE_CONCURRENCY = int(os.getenv("AI_PREGENERATE_CONCURRENCY", "2"))
+
+# Counters for this process; totals across replicas come from the table
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "seconds_saved": 0.0, "generation_seconds": 0.0}
+
+
+def content_key(analysis_content: str, league: str = leagues.DEFAULT_LEAGUE) -> str:
+    """Cache key for a prompt: model name + prompt template (and version) + league + analysis content."""
+    digest = hashlib.sha256()
+    for part in (ai.MODEL_NAME, f"v{ai.PROMPT_VERSION}", ai.PROMPT_TEMPLATE, league, analysis_content or ""):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _count(hits: int = 0, misses: int = 0, seconds_saved: float = 0.0, generation_seconds: float = 0.0):
+    with _stats_lock:
+        _stats["hits"] += hits
+        _stats["misses"] += misses
+        _stats["seconds_saved"] += seconds_saved
+        _stats["generation_seconds"] += generation_seconds
+
+
+def lookup(db: Session, keys) -> dict:
+    """Returns {key: CommentaryCache} for the keys present in the cache (one query)."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    rows = db.query(models.CommentaryCache).filter(models.CommentaryCache.key.in_(keys)).all()
+    return {row.key: row for row in rows}
+
+
+def _record_hits(db: Session, entries):
+    """Increments the persistent hit counters (one per entry occurrence) and the process counters."""
+    entries = list(entries)
+    if not entries:
+        return
+    per_key = Counter(e.key for e in entries)
+    table = models.CommentaryCache.__table__
+    db.execute(
+        table.update()
+        .where(table.c.key == bindparam("hit_key"))
+        .values(hits=table.c.hits + bindparam("hit_count")),
+        [{"hit_key": key, "hit_count": n} for key, n in per_key.items()]
+    )
+    _count(hits=len(entries), seconds_saved=sum(e.generation_seconds or 0.0 for e in entries))
+
+
+def store(db: Session, key: str, text: str, seconds: float):
+    """Stores generated commentary (first writer wins if two replicas race)."""
+    insert_fn = database.dialect_insert(db)
+    db.execute(
+        insert_fn(models.CommentaryCache).values(
+            key=key, model=ai.MODEL_NAME, text=text, generation_seconds=seconds, hits=0
+        ).on_conflict_do_nothing(index_elements=["key"])
+    )
+    _count(misses=1, generation_seconds=seconds)
+
+
+def cached_commentary(db: Session, analysis_content: str, league: str = leagues.DEFAULT_LEAGUE) -> Optional[str]:
+    """Returns cached commentary for the prompt (and counts the hit), or None."""
+    key = content_key(analysis_content, league)
+    entry = lookup(db, [key]).get(key)
+    if entry is None:
+        return None
+    _record_hits(db, [entry])
+    return entry.text
+
+
+def generate(db: Session, analysis_content: str, league: str = leagues.DEFAULT_LEAGUE) -> Optional[str]:
+    """Cache-aware commentary generation. Returns None if the model failed."""
+    text = cached_commentary(db, analysis_content, league)
+    if text is not None:
+        return text
+
+    started = time.perf_counter()
+    text = ai.generate_match_commentary(analysis_content, league)
+    if text:
+        store(db, content_key(analysis_content, league), text, time.perf_counter() - started)
+    return text
+
+
+def _generate_and_store(key: str, analysis_content: str, league: str, match_ids) -> Optional[bool]:
+    """
+    Worker: one model call, then stores the result for every match sharing
+    the prompt. Returns None when every match is being generated elsewhere.
+    """
+    # jobs imports this module
+    from . import jobs
+
+    claimed = [job for job, owner in (jobs.begin_stream(m) for m in match_ids) if owner]
+    if not claimed:
+        return None
+    match_ids = [job["match_id"] for job in claimed]
+
+    text = None
+    db = database.SessionLocal()
+    try:
+        # A request may have generated the same prompt before we claimed
+        text = cached_commentary(db, analysis_content, league)
+        if text is None:
+            started = time.perf_counter()
+            text = ai.generate_match_commentary(analysis_content, league)
+            if not text:
+                return False
+            store(db, key, text, time.perf_counter() - started)
+        db.query(models.Prediction).filter(
+            models.Prediction.match_id.in_(match_ids)
+        ).update({"ai_generated_commentary": text}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+        for job in claimed:
+            jobs.finish_stream(job, text)
+
+    for match_id in match_ids:
+        cache.invalidate_match(match_id)
+    return True
+
+
+@profiler.profiled("pregenerate_commentary")
+def pregenerate_upcoming(concurrency: int = None) -> dict:
+    """
+    Fills AI commentary for every upcoming fixture that has a prediction but no
+    commentary. Cache hits are applied in one bulk update; misses are generated
+    with `concurrency` parallel Ollama calls (one call per distinct prompt).
+    """
+    concurrency = max(concurrency or PREGENERATE_CONCURRENCY, 1)
+    started = time.perf_counter()
+
+    db = database.SessionLocal()
+    try:
+        pending = db.query(
+            models.Prediction.id, models.Prediction.match_id, models.Prediction.analysis_content, models.Match.league
+        ).join(
+            models.Match, models.Match.id == models.Prediction.match_id
+        ).filter(
+            or_(models.Match.status == 'SCHEDULED', models.Match.status == 'TIMED'),
+            models.Prediction.ai_generated_commentary.is_(None)
+        ).all()
+
+        keys = {p.id: content_key(p.analysis_content, p.league) for p in pending}
+        entries = lookup(db, set(keys.values()))
+
+        hits = [
+            {"id": p.id, "ai_generated_commentary": entries[keys[p.id]].text}
+            for p in pending if keys[p.id] in entries
+        ]
+        if hits:
+            db.execute(update(models.Prediction), hits)
+            _record_hits(db, [entries[keys[p.id]] for p in pending if keys[p.id] in entries])
+        db.commit()
+    finally:
+        db.close()
+
+    misses = {}
+    for p in pending:
+        if keys[p.id] not in entries:
+            misses.setdefault(keys[p.id], (p.analysis_content, p.league, []))[2].append(p.match_id)
+
+    print(
+        f">>> [AI] Pre-generating commentary: {len(pending)} pending, {len(hits)} cache hits, "
+        f"{len(misses)} prompts to generate (concurrency {concurrency})"
+    )
+
+    generated = skipped = 0
+    if misses:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ai-pregen") as pool:
+            results = pool.map(
+                lambda item: _generate_and_store(item[0], *item[1]), list(misses.items())
+            )
+            results = list(results)
+            generated = sum(1 for ok in results if ok)
+            skipped = sum(1 for ok in results if ok is None)
+
+    if hits:
+        cache.invalidate_matches_cache()
+
+    return {
+        "status": "success",
+        "pending": len(pending),
+        "cache_hits": len(hits),
+        "generated": generated,
+        "skipped": skipped,
+        "failed": len(misses) - generated - skipped,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def get_stats(db: Session) -> dict:
+    """Hit/miss counters and model time saved by the commentary cache."""
+    entries, total_hits, saved = db.query(
+        func.count(models.CommentaryCache.key),
+        func.coalesce(func.sum(models.CommentaryCache.hits), 0),
+        func.coalesce(func.sum(models.CommentaryCache.hits * models.CommentaryCache.generation_seconds), 0.0)
+    ).one()
+    with _stats_lock:
+        process = dict(_stats)
+    lookups = process["hits"] + process["misses"]
+    return {
+        "entries": entries,
+        "total_hits": int(total_hits),
+        "total_seconds_saved": round(float(saved), 2),
+        "process": {
+            **{k: round(v, 2) if isinstance(v, float) else v for k, v in process.items()},
+            "hit_rate": round(process["hits"] / lookups, 3) if lookups else None,
+        },
+    }
@@ -1,8 +1,14 @@
 import os
+import uuid
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from . import metrics, profiler
+
 # Get DB URL from .env (Docker passes this automatically)
 # Connection goes through PgBouncer for connection pooling
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -21,9 +27,57 @@ engine = create_engine(
     echo=os.getenv("SQL_DEBUG", "false").lower() == "true"
 )
 
+metrics.instrument_pool(engine.pool, "sync")
+profiler.instrument_engine(engine)
+
 # Create a SessionLocal class. Each instance will be a database session.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_url(url: str) -> str:
+    """Same database through an asyncio driver (asyncpg / aiosqlite)."""
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+_async_connect_args = {}
+if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg://"):
+    # PgBouncer runs in transaction mode: no server-side prepared statement
+    # caches, and unique statement names so pooled backends never clash
+    _async_connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+# The async engine is created on first use, so the asyncio driver is only
+# required when an async endpoint actually runs
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        options = {"echo": os.getenv("SQL_DEBUG", "false").lower() == "true", "connect_args": _async_connect_args}
+        if not ASYNC_DATABASE_URL.startswith("sqlite"):
+            options.update(pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True)
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **options)
+        metrics.instrument_pool(_async_engine.sync_engine.pool, "async")
+        profiler.instrument_engine(_async_engine.sync_engine)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, class_=AsyncSession, expire_on_commit=False)
+    return _async_engine
+
+def AsyncSessionLocal() -> AsyncSession:
+    get_async_engine()
+    return _AsyncSessionLocal()
+
 # Base class for our models
 Base = declarative_base()
 
@@ -33,4 +87,26 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async dependency for `async def` endpoints
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pools() -> dict:
+    """Connection pools by name (the async one only once it exists)."""
+    found = {"sync": engine.pool}
+    if _async_engine is not None:
+        found["async"] = _async_engine.sync_engine.pool
+    return found
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+def dialect_insert(db):
+    """Returns the dialect-specific insert() that supports ON CONFLICT clauses."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert
+    return pg_insert
@@ -0,0 +1,88 @@
+"""
+Head-to-head matrix: outcome probabilities of every home/away team pair.
+
+rebuild() scores all N x N pairs of a league season in one NumPy pass with
+the season simulator's Poisson model (simulation.strengths): a pair's goal
+means are
+    home: league_avg * attack[home] * defense[away] * sqrt(home_advantage)
+    away: league_avg * attack[away] * defense[home] / sqrt(home_advantage)
+and the home win / draw / away win probabilities are the sums of the
+joint score grid (0..HEAD_TO_HEAD_MAX_GOALS goals per side, renormalized)
+below, on and above its diagonal.
+
+The matrix is stored in table `head_to_head` and rebuilt inside the sync
+transaction (services.sync_league) whenever the league season's table
+changes, so GET /predict and single-fixture predictions are one indexed
+row read instead of a league-wide recomputation.
+"""
+
+import os
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from . import models, simulation
+
+# Goals per side in the score grid; the mass above it is negligible for league means
+MAX_GOALS = int(os.getenv("HEAD_TO_HEAD_MAX_GOALS", "10"))
+
+Team = models.Team
+HeadToHead = models.HeadToHead
+
+
+def _pmf(lam: np.ndarray) -> np.ndarray:
+    """Poisson probabilities of 0..MAX_GOALS goals, on a new last axis."""
+    goals = np.arange(MAX_GOALS + 1)
+    factorials = np.cumprod(np.r_[1.0, np.arange(1, MAX_GOALS + 1)])
+    return np.exp(-lam)[..., None] * lam[..., None] ** goals / factorials
+
+
+def matrix(attack, defense, league_avg) -> dict:
+    """
+    [home, away] arrays of home_win, draw, away_win, home_xg and away_xg for
+    every ordered pair of teams (the diagonal is meaningless).
+    """
+    advantage = np.sqrt(simulation.HOME_ADVANTAGE)
+    home_xg = league_avg * attack[:, None] * defense[None, :] * advantage
+    away_xg = league_avg * attack[None, :] * defense[:, None] / advantage
+
+    # Joint score grid [home, away, home goals, away goals]
+    grid = _pmf(home_xg)[..., :, None] * _pmf(away_xg)[..., None, :]
+    total = grid.sum(axis=(-2, -1))
+    size = MAX_GOALS + 1
+    return {
+        "home_win": (grid * np.tri(size, size, -1)).sum(axis=(-2, -1)) / total,
+        "draw": np.trace(grid, axis1=-2, axis2=-1) / total,
+        "away_win": (grid * np.tri(size, size, -1).T).sum(axis=(-2, -1)) / total,
+        "home_xg": home_xg,
+        "away_xg": away_xg,
+    }
+
+
+def rebuild(db: Session, league: str, season: int) -> int:
+    """Rewrites a league season's matrix from its teams' records (caller commits). Returns rows written."""
+    teams = db.execute(
+        select(
+            Team.id, Team.matches_played, Team.goals_scored, Team.goals_conceded, Team.xg_for, Team.xg_against
+        ).filter(Team.league == league, Team.season == season).order_by(Team.id)
+    ).all()
+    db.query(HeadToHead).filter(
+        HeadToHead.league == league, HeadToHead.season == season
+    ).delete(synchronize_session=False)
+    if len(teams) < 2:
+        return 0
+
+    m = matrix(*simulation.strengths(teams))
+    ids = [t.id for t in teams]
+    home, away = np.nonzero(~np.eye(len(ids), dtype=bool))
+    columns = {name: values[home, away].tolist() for name, values in m.items()}
+    rows = [
+        {
+            "league": league, "season": season, "home_team_id": ids[h], "away_team_id": ids[a],
+            **{name: values[i] for name, values in columns.items()},
+        }
+        for i, (h, a) in enumerate(zip(home.tolist(), away.tolist()))
+    ]
+    db.execute(insert(HeadToHead), rows)
+    return len(rows)
@@ -0,0 +1,177 @@
+"""
+Multi-league, multi-season ingestion (POST /sync-data).
+
+run() fetches every configured league season (leagues.targets()) from
+Understat concurrently, with at most INGEST_CONCURRENCY requests in flight,
+over one keep-alive httpx client: gzip, connect/read timeouts, and retries
+with jittered exponential backoff on timeouts, connection errors, 429 and
+5xx. The payloads are then written in parallel, each league season in its
+own session and transaction (services.sync_league), on up to
+INGEST_DB_WORKERS threads. SQLite has a single writer, so there they are
+written one after another.
+
+The client lives for one run: runs are hours apart, long after any idle
+keep-alive connection would have been closed, and within a run all
+requests go to the same host and share its connections.
+
+INGEST_PAYLOAD_DIR replaces Understat with recorded payloads
+({dir}/{league}_{season}.json), for local runs and benchmarks.
+"""
+
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import orjson
+
+from . import database, leagues, metrics, services
+
+CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+DB_WORKERS = int(os.getenv("INGEST_DB_WORKERS", "4"))
+# (connect, read) timeouts in seconds
+TIMEOUT = (
+    float(os.getenv("INGEST_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("INGEST_READ_TIMEOUT", "20"))
+)
+RETRIES = int(os.getenv("INGEST_RETRIES", "3"))
+# Retry n waits a random time in [0, INGEST_BACKOFF * 2^n) seconds
+BACKOFF = float(os.getenv("INGEST_BACKOFF", "0.5"))
+PAYLOAD_DIR = os.getenv("INGEST_PAYLOAD_DIR")
+API_URL = os.getenv("UNDERSTAT_API_URL", services.JSON_API_URL)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def scope_name(league: str, season: int) -> str:
+    return f"{league}:{season}"
+
+
+def _client() -> httpx.AsyncClient:
+    connect, read = TIMEOUT
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read, connect=connect),
+        limits=httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY),
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+
+def _read_recorded(league: str, season: int):
+    path = os.path.join(PAYLOAD_DIR, f"{league}_{season}.json")
+    try:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read()), None
+    except (OSError, orjson.JSONDecodeError) as e:
+        return None, f"Recorded payload {path}: {e}"
+
+
+async def _fetch(client: httpx.AsyncClient, limit: asyncio.Semaphore, league: str, season: int):
+    """Returns (data, error) for one league season; the semaphore is released while backing off."""
+    if PAYLOAD_DIR:
+        return await asyncio.to_thread(_read_recorded, league, season)
+
+    url = API_URL.format(league=league, season=season)
+    error = None
+    for attempt in range(RETRIES + 1):
+        if attempt:
+            delay = random.uniform(0, BACKOFF * 2 ** (attempt - 1))
+            print(f">>> [INGEST] {league}/{season}: {error}, retry {attempt}/{RETRIES} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        async with limit:
+            print(f">>> [UNDERSTAT API] Fetching: {url}")
+            try:
+                response = await client.get(url, headers=services.get_headers(league, season))
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+                continue
+
+        if response.status_code == 200:
+            try:
+                return orjson.loads(response.content), None
+            except orjson.JSONDecodeError:
+                print(f"!!! Error: {league}/{season} response is not valid JSON. Probably a WAF block.")
+                return None, "Invalid JSON response"
+        error = f"API returned {response.status_code}"
+        if response.status_code not in RETRY_STATUSES:
+            print(f"!!! HTTP Error {response.status_code}: {response.text[:200]}")
+            return None, error
+    return None, error
+
+
+async def fetch_all(targets) -> dict:
+    """Fetches all (league, season) targets concurrently: {(league, season): (data, error)}."""
+    limit = asyncio.Semaphore(CONCURRENCY)
+    async with _client() as client:
+        results = await asyncio.gather(*(_fetch(client, limit, league, season) for league, season in targets))
+    return dict(zip(targets, results))
+
+
+def fetch_one(league: str, season: int):
+    """Blocking fetch of one league season: (data, error)."""
+    return asyncio.run(fetch_all([(league, season)]))[(league, season)]
+
+
+def _persist(league: str, season: int, data: dict, force: bool) -> dict:
+    db = database.SessionLocal()
+    try:
+        return services.sync_league(db, league, season, data, force=force)
+    finally:
+        db.close()
+
+
+def _merge_changes(results) -> dict:
+    changes = {"teams": [], "matches": [], "players": [], "tables": [], "renamed": []}
+    for result in results:
+        for kind, ids in result.get("changes", {}).items():
+            changes[kind].extend(ids)
+    return {kind: sorted(ids) for kind, ids in changes.items()}
+
+
+def run(force: bool = False, targets=None) -> dict:
+    """
+    Fetches and writes every configured league season. Returns per-target
+    results (keyed "league:season") and the merged change set. The status is
+    "partial" when some targets failed and "error" when all of them did.
+    """
+    targets = list(targets or leagues.targets())
+    started = time.perf_counter()
+    fetched = asyncio.run(fetch_all(targets))
+    fetch_seconds = time.perf_counter() - started
+    metrics.observe_stage("sync", "fetch", fetch_seconds)
+    print(f">>> [INGEST] Fetched {len(targets)} league seasons in {fetch_seconds:.3f}s")
+
+    results = {
+        scope_name(league, season): {"status": "error", "league": league, "season": season, "message": error}
+        for (league, season), (data, error) in fetched.items() if error
+    }
+    ready = [(league, season, data) for (league, season), (data, error) in fetched.items() if not error]
+    workers = 1 if database.engine.dialect.name == "sqlite" else max(min(DB_WORKERS, len(ready)), 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+        futures = {
+            scope_name(league, season): pool.submit(_persist, league, season, data, force)
+            for league, season, data in ready
+        }
+        results.update({name: future.result() for name, future in futures.items()})
+
+    ok = [r for r in results.values() if r["status"] == "success"]
+    status = "success" if len(ok) == len(results) else ("partial" if ok else "error")
+    summary = {
+        "status": status,
+        "processed": sum(r.get("processed", 0) for r in ok),
+        "new_matches": sum(r.get("new_matches", 0) for r in ok),
+        "new_players": sum(r.get("new_players", 0) for r in ok),
+        "changes": _merge_changes(ok),
+        "targets": {name: results[name] for name in sorted(results)},
+        "fetch_seconds": round(fetch_seconds, 4),
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+    if not ok:
+        summary["message"] = "; ".join(f"{name}: {r.get('message')}" for name, r in sorted(results.items()))
+    print(
+        f">>> [INGEST] {status}: {len(ok)}/{len(results)} league seasons, "
+        f"{summary['processed']} matches written in {summary['seconds']}s"
+    )
+    return summary
@@ -0,0 +1,432 @@
+"""
+Background Job Queue for AI Commentary
+
+Commentary generation takes tens of seconds on CPU-only Ollama pods, so
+POST /analyze/{match_id} only enqueues a job and returns its id. A bounded
+pool of worker threads per replica runs the generations.
+
+Redis is the broker, so queued jobs survive API replica restarts and HPA
+scale-in (keys below are under the cache namespace prefix):
+    jobs:commentary:queue           list of queued job ids
+    jobs:commentary:processing      job ids taken by a worker (BLMOVE)
+    jobs:commentary:leases          sorted set: job id -> lease deadline of a
+                                    taken job, renewed while it runs
+    jobs:commentary:{job_id}        hash with the job state
+    jobs:commentary:match:{id}      in-flight job id for a match (dedupe), held
+                                    from enqueue until the job finishes
+    jobs:commentary:{job_id}:tokens tokens of a streamed job, for its followers
+
+Jobs left in the processing list by a replica that died are moved back to
+the queue once their lease runs out: a worker leases a job for the visibility
+timeout when it takes it and renews the lease until the job finishes, so a
+job that waited long in the queue or a slow model call is never requeued.
+
+GET /analyze/{id}/stream takes the same per-match claim (begin_stream), so
+concurrent streams and queued jobs for one match share a single LLM call:
+the stream that holds the claim calls the model and publishes its tokens,
+the others follow it (follow_stream) until it finishes. Without Redis, jobs run
+in an in-process thread pool (fine for local development only).
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import redis
+
+from . import cache, commentary, database, metrics, models, profiler
+
+JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "2"))
+JOB_TTL = int(os.getenv("AI_JOB_TTL", "86400"))  # keep finished job state for a day
+# A taken job whose lease was not renewed for this long is considered lost and is requeued
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("AI_JOB_VISIBILITY_TIMEOUT", "600"))
+# Must stay below the Redis client's socket_timeout
+POLL_TIMEOUT = 2
+
+QUEUE_KEY = cache.ns_key("jobs:commentary:queue")
+PROCESSING_KEY = cache.ns_key("jobs:commentary:processing")
+LEASES_KEY = cache.ns_key("jobs:commentary:leases")
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_stop = threading.Event()
+_workers = []
+
+# In-process fallback when Redis is unavailable
+_local_lock = threading.Lock()
+_local_jobs = {}
+_local_inflight = {}
+_local_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _job_key(job_id: str) -> str:
+    return cache.ns_key(f"jobs:commentary:{job_id}")
+
+
+def _inflight_key(match_id: int) -> str:
+    return cache.ns_key(f"jobs:commentary:match:{match_id}")
+
+
+def _tokens_key(job_id: str) -> str:
+    return cache.ns_key(f"jobs:commentary:{job_id}:tokens")
+
+
+def _decode(job: dict) -> Optional[dict]:
+    """Converts a Redis job hash into the API representation."""
+    if not job:
+        return None
+    result = {
+        "id": job["id"],
+        "match_id": int(job["match_id"]),
+        "status": job["status"],
+        "attempts": int(job.get("attempts", 0)),
+    }
+    for field in ("created_at", "started_at", "finished_at"):
+        if job.get(field):
+            result[field] = float(job[field])
+    if job.get("text"):
+        result["text"] = job["text"]
+    if job.get("error"):
+        result["error"] = job["error"]
+    return result
+
+
+def _update(job_id: str, **fields):
+    client = cache.get_redis_client()
+    if client is None:
+        with _local_lock:
+            if job_id in _local_jobs:
+                _local_jobs[job_id].update({k: str(v) for k, v in fields.items()})
+        return
+    pipe = client.pipeline()
+    pipe.hset(_job_key(job_id), mapping={k: str(v) for k, v in fields.items()})
+    pipe.expire(_job_key(job_id), JOB_TTL)
+    pipe.execute()
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Returns the job state or None if it is unknown (or expired)."""
+    client = cache.get_redis_client()
+    if client is None:
+        with _local_lock:
+            return _decode(dict(_local_jobs.get(job_id, {})))
+    try:
+        return _decode(client.hgetall(_job_key(job_id)))
+    except redis.RedisError as e:
+        print(f"[Jobs] Get error for {job_id}: {e}")
+        return None
+
+
+def enqueue_commentary(match_id: int) -> dict:
+    """
+    Queues commentary generation for a match and returns the job.
+    If a job for the same match is already queued or running, that job is
+    returned instead of starting a second LLM run.
+    """
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id, "match_id": str(match_id), "status": QUEUED,
+        "attempts": "0", "created_at": str(time.time())
+    }
+
+    client = cache.get_redis_client()
+    if client is None:
+        return _enqueue_local(match_id, job)
+
+    # The claim lives as long as the job state, however long the job waits in
+    # the queue; _run releases it when the job finishes
+    existing = _claim(client, match_id, job_id, JOB_TTL)
+    if existing:
+        return existing
+
+    pipe = client.pipeline()
+    pipe.hset(_job_key(job_id), mapping=job)
+    pipe.expire(_job_key(job_id), JOB_TTL)
+    pipe.lpush(QUEUE_KEY, job_id)
+    pipe.execute()
+    print(f"[Jobs] Queued commentary job {job_id} for match {match_id}")
+    return _decode(job)
+
+
+# Compare-and-set, so two requests never both take over the same stale claim
+_TAKE_OVER = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    redis.call("set", KEYS[1], ARGV[2], "EX", ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+def _claim(client, match_id: int, job_id: str, ttl: int) -> Optional[dict]:
+    """Claims a match for a new job. Returns the in-flight job instead if there is one."""
+    key = _inflight_key(match_id)
+    while True:
+        if client.set(key, job_id, nx=True, ex=ttl):
+            return None
+        existing_id = client.get(key)
+        if not existing_id:
+            # Released meanwhile
+            continue
+        existing = get_job(existing_id)
+        if existing and existing["status"] not in (DONE, FAILED):
+            return existing
+        if not existing:
+            # The other request is between claiming the match and writing its job
+            return {"id": existing_id, "match_id": match_id, "status": QUEUED, "attempts": 0}
+        # Not released by a finished job: take it over unless another request already did
+        if client.eval(_TAKE_OVER, 1, key, existing_id, job_id, ttl):
+            return None
+
+
+def _release(match_id: int, job_id: str):
+    client = cache.get_redis_client()
+    if client is None:
+        with _local_lock:
+            if _local_inflight.get(match_id) == job_id:
+                _local_inflight.pop(match_id, None)
+    # Only release the dedupe claim if it still belongs to this job
+    elif client.get(_inflight_key(match_id)) == job_id:
+        client.delete(_inflight_key(match_id))
+
+
+def begin_stream(match_id: int) -> tuple:
+    """
+    Claims a match for a generation the caller runs itself (a stream, or
+    pre-generation). Returns (job, True) when the caller should call the
+    model (and publish_tokens / finish_stream), or (the in-flight job, False)
+    when it should follow that job (or leave the match) instead.
+    """
+    now = str(time.time())
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id, "match_id": str(match_id), "status": RUNNING,
+        "attempts": "1", "created_at": now, "started_at": now
+    }
+
+    client = cache.get_redis_client()
+    if client is None:
+        with _local_lock:
+            existing_id = _local_inflight.get(match_id)
+            if existing_id:
+                return _decode(dict(_local_jobs[existing_id])), False
+            _local_jobs[job_id] = job
+            _local_inflight[match_id] = job_id
+        return _decode(job), True
+
+    # Not in the processing list, so nothing requeues a stream whose replica
+    # died: its claim expires unless publish_tokens keeps extending it
+    existing = _claim(client, match_id, job_id, JOB_VISIBILITY_TIMEOUT)
+    if existing:
+        return existing, False
+    pipe = client.pipeline()
+    pipe.hset(_job_key(job_id), mapping=job)
+    pipe.expire(_job_key(job_id), JOB_TTL)
+    pipe.execute()
+    print(f"[Jobs] Streaming commentary job {job_id} for match {match_id}")
+    return _decode(job), True
+
+
+def publish_tokens(job: dict, tokens):
+    """Appends tokens of a streamed job for its followers and extends its claim."""
+    client = cache.get_redis_client()
+    if client is None or not tokens:
+        return
+    pipe = client.pipeline()
+    pipe.rpush(_tokens_key(job["id"]), *tokens)
+    pipe.expire(_tokens_key(job["id"]), JOB_VISIBILITY_TIMEOUT)
+    pipe.expire(_inflight_key(job["match_id"]), JOB_VISIBILITY_TIMEOUT)
+    pipe.execute()
+
+
+def finish_stream(job: dict, text: str = None, error: str = None):
+    """Records the outcome of a streamed job and releases the match."""
+    if text is not None:
+        _update(job["id"], status=DONE, finished_at=time.time(), text=text)
+    else:
+        _update(job["id"], status=FAILED, finished_at=time.time(), error=error or "AI generation failed")
+    _release(job["match_id"], job["id"])
+
+
+def follow_stream(job_id: str, offset: int) -> tuple:
+    """Returns (tokens published from `offset` on, job state) of an in-flight job."""
+    client = cache.get_redis_client()
+    if client is None:
+        return [], get_job(job_id)
+    try:
+        return client.lrange(_tokens_key(job_id), offset, -1), get_job(job_id)
+    except redis.RedisError as e:
+        print(f"[Jobs] Follow error for {job_id}: {e}")
+        return [], None
+
+
+def _enqueue_local(match_id: int, job: dict) -> dict:
+    global _local_executor
+    with _local_lock:
+        existing_id = _local_inflight.get(match_id)
+        if existing_id:
+            return _decode(dict(_local_jobs[existing_id]))
+        _local_jobs[job["id"]] = job
+        _local_inflight[match_id] = job["id"]
+        if _local_executor is None:
+            _local_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="ai-job")
+    _local_executor.submit(_run, job["id"])
+    return _decode(dict(job))
+
+
+@profiler.profiled("commentary_job")
+def _generate(match_id: int) -> str:
+    """Generates and stores the commentary for a match. Returns the text."""
+    db = database.SessionLocal()
+    try:
+        found = db.query(models.Prediction, models.Match.league).join(
+            models.Match, models.Match.id == models.Prediction.match_id
+        ).filter(models.Prediction.match_id == match_id).first()
+        if not found:
+            raise RuntimeError("Prediction not found")
+        pred, league = found
+        if pred.ai_generated_commentary:
+            return pred.ai_generated_commentary
+
+        text = commentary.generate(db, pred.analysis_content, league)
+        if not text:
+            raise RuntimeError("AI model returned no commentary")
+
+        pred.ai_generated_commentary = text
+        db.commit()
+    finally:
+        db.close()
+
+    # Invalidate cache for this match
+    cache.invalidate_match(match_id)
+    return text
+
+
+def _run(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        print(f"[Jobs] Job {job_id} expired before it could run")
+        return
+    if job["status"] in (DONE, FAILED):
+        return
+
+    match_id = job["match_id"]
+    _update(job_id, status=RUNNING, started_at=time.time(), attempts=job["attempts"] + 1)
+    client = cache.get_redis_client()
+    if client is not None:
+        # Claimed by this worker: the match stays deduped until the job finishes
+        client.set(_inflight_key(match_id), job_id, ex=JOB_TTL)
+    print(f"[Jobs] Running commentary job {job_id} for match {match_id}")
+    try:
+        with metrics.stage("commentary", "job"):
+            text = _generate(match_id)
+        _update(job_id, status=DONE, finished_at=time.time(), text=text)
+    except Exception as e:
+        print(f"[Jobs] Job {job_id} failed: {e}")
+        _update(job_id, status=FAILED, finished_at=time.time(), error=str(e))
+    finally:
+        _release(match_id, job_id)
+
+
+def _hold_lease(client, job_id: str, done: threading.Event):
+    """Leases a taken job and renews the lease until `done` is set."""
+    while True:
+        try:
+            client.zadd(LEASES_KEY, {job_id: time.time() + JOB_VISIBILITY_TIMEOUT})
+        except redis.RedisError as e:
+            print(f"[Jobs] Lease error for {job_id}: {e}")
+        if done.wait(JOB_VISIBILITY_TIMEOUT / 3):
+            break
+    try:
+        client.zrem(LEASES_KEY, job_id)
+    except redis.RedisError as e:
+        print(f"[Jobs] Lease error for {job_id}: {e}")
+
+
+def requeue_stale_jobs() -> int:
+    """Moves jobs stuck in the processing list (dead replica) back to the queue."""
+    client = cache.get_redis_client()
+    if client is None:
+        return 0
+
+    requeued = 0
+    now = time.time()
+    for job_id in client.lrange(PROCESSING_KEY, 0, -1):
+        job = get_job(job_id)
+        if job and job["status"] in (DONE, FAILED):
+            client.lrem(PROCESSING_KEY, 1, job_id)
+            continue
+        deadline = client.zscore(LEASES_KEY, job_id)
+        if deadline is None:
+            # Just taken, before its worker leased it (or taken by an older
+            # release): give it a full lease before calling it lost
+            client.zadd(LEASES_KEY, {job_id: now + JOB_VISIBILITY_TIMEOUT}, nx=True)
+            continue
+        if job and deadline > now:
+            continue
+        # LREM decides which replica owns the requeue
+        if client.lrem(PROCESSING_KEY, 1, job_id):
+            client.zrem(LEASES_KEY, job_id)
+            if job:
+                _update(job_id, status=QUEUED)
+                client.set(_inflight_key(job["match_id"]), job_id, ex=JOB_TTL)
+                client.rpush(QUEUE_KEY, job_id)
+                requeued += 1
+    if requeued:
+        print(f"[Jobs] Requeued {requeued} stale commentary jobs")
+    return requeued
+
+
+def _worker_loop(worker_id: int):
+    last_reap = 0.0
+    while not _stop.is_set():
+        client = cache.get_redis_client()
+        if client is None:
+            _stop.wait(POLL_TIMEOUT)
+            continue
+        try:
+            if time.time() - last_reap > JOB_VISIBILITY_TIMEOUT / 2:
+                requeue_stale_jobs()
+                last_reap = time.time()
+
+            job_id = client.blmove(QUEUE_KEY, PROCESSING_KEY, POLL_TIMEOUT, "RIGHT", "LEFT")
+            if not job_id:
+                continue
+            done = threading.Event()
+            lease = threading.Thread(
+                target=_hold_lease, args=(client, job_id, done), name=f"ai-job-lease-{worker_id}", daemon=True
+            )
+            lease.start()
+            try:
+                _run(job_id)
+            finally:
+                done.set()
+                lease.join()
+                client.lrem(PROCESSING_KEY, 1, job_id)
+        except redis.RedisError as e:
+            print(f"[Jobs] Worker {worker_id} Redis error: {e}")
+            _stop.wait(POLL_TIMEOUT)
+
+
+def start_workers():
+    """Starts the bounded worker pool (no-op without Redis; see _enqueue_local)."""
+    if _workers or cache.get_redis_client() is None:
+        return
+    _stop.clear()
+    for i in range(JOB_WORKERS):
+        t = threading.Thread(target=_worker_loop, args=(i,), name=f"ai-job-worker-{i}", daemon=True)
+        t.start()
+        _workers.append(t)
+    print(f"[Jobs] Started {JOB_WORKERS} commentary workers")
+
+
+def stop_workers():
+    _stop.set()
+    for t in _workers:
+        t.join(timeout=POLL_TIMEOUT + 1)
+    _workers.clear()
+    if _local_executor is not None:
+        _local_executor.shutdown(wait=False)
@@ -0,0 +1,97 @@
+"""
+Player leaderboards: top-k players per metric, league-wide and per team.
+
+rebuild() recomputes one league season's rankings with a single
+INSERT ... SELECT: for every metric, ROW_NUMBER() over the league season and
+over each team, keeping the players inside either top LEADERBOARD_TOP_K. It
+runs inside the sync transaction (services.sync_league) whenever players
+changed, so readers see either the old or the new index, never a partial
+one. /players/top, /teams/{id}/players and the squads in the prediction
+prompts read the stored ranks through an index instead of sorting squads.
+
+Per-90 metrics only rank players with at least LEADERBOARD_MIN_MINUTES
+minutes, so a substitute's one goal in ten minutes does not top the list.
+"""
+
+import os
+
+from sqlalchemy import Integer, String, case, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+
+# The squad listed in prediction prompts: top scorers (ties broken by xG)
+SQUAD_METRIC = "goals"
+SQUAD_SIZE = 4
+
+TOP_K = max(int(os.getenv("LEADERBOARD_TOP_K", "10")), SQUAD_SIZE)
+MIN_MINUTES = int(os.getenv("LEADERBOARD_MIN_MINUTES", "450"))
+
+Player = models.Player
+Ranking = models.PlayerRanking
+
+
+def _per90(value):
+    return case((Player.minutes >= MIN_MINUTES, value * 90.0 / Player.minutes), else_=None)
+
+
+# metric -> (value, tie-breaker); both sorted descending, then by player id
+METRICS = {
+    "goals": (Player.goals, Player.xg),
+    "assists": (Player.assists, Player.xa),
+    "xg": (Player.xg, Player.goals),
+    "xa": (Player.xa, Player.assists),
+    "shots": (Player.shots, Player.goals),
+    "goals_per90": (_per90(Player.goals), Player.xg),
+    "xg_per90": (_per90(Player.xg), Player.goals),
+    "xa_per90": (_per90(Player.xa), Player.assists),
+    "goal_contributions_per90": (_per90(Player.goals + Player.assists), Player.xg + Player.xa),
+}
+
+
+def _ranked(metric: str, league: str, season: int):
+    """Players of a league season inside either top k of one metric, with both ranks."""
+    value, tiebreak = METRICS[metric]
+    order = (value.desc(), tiebreak.desc(), Player.id)
+    ranked = select(
+        Player.id.label("player_id"),
+        Player.team_id,
+        value.label("value"),
+        func.row_number().over(order_by=order).label("league_rank"),
+        func.row_number().over(partition_by=Player.team_id, order_by=order).label("team_rank"),
+    ).filter(
+        Player.league == league, Player.season == season, value.isnot(None)
+    ).subquery()
+    return select(
+        literal(league, String), literal(season, Integer), literal(metric, String),
+        ranked.c.player_id, ranked.c.team_id, ranked.c.value,
+        case((ranked.c.league_rank <= TOP_K, ranked.c.league_rank), else_=None),
+        case((ranked.c.team_rank <= TOP_K, ranked.c.team_rank), else_=None),
+    ).filter(or_(ranked.c.league_rank <= TOP_K, ranked.c.team_rank <= TOP_K))
+
+
+def rebuild(db: Session, league: str, season: int) -> int:
+    """Replaces a league season's rankings (caller commits). Returns the rows stored."""
+    db.query(Ranking).filter(Ranking.league == league, Ranking.season == season).delete(synchronize_session=False)
+    columns = ["league", "season", "metric", "player_id", "team_id", "value", "league_rank", "team_rank"]
+    stmt = models.PlayerRanking.__table__.insert().from_select(
+        columns, union_all(*(_ranked(metric, league, season) for metric in METRICS))
+    )
+    return db.execute(stmt).rowcount
+
+
+def squads(db: Session, team_ids) -> dict:
+    """{team_id: [rows with name, goals, assists, xg]}: each team's top SQUAD_SIZE scorers, one query."""
+    rows = db.query(
+        Ranking.team_id, Player.name, Player.goals, Player.assists, Player.xg
+    ).join(
+        Player, Player.id == Ranking.player_id
+    ).filter(
+        Ranking.team_id.in_(list(team_ids)),
+        Ranking.metric == SQUAD_METRIC,
+        Ranking.team_rank <= SQUAD_SIZE,
+    ).order_by(Ranking.team_id, Ranking.team_rank).all()
+    squads = {}
+    for row in rows:
+        squads.setdefault(row.team_id, []).append(row)
+    return squads
@@ -0,0 +1,39 @@
+"""
+Leagues and seasons the app ingests (Understat league codes and season years).
+
+INGEST_LEAGUES and INGEST_SEASONS are comma separated; every league is
+synced for every season (see ingest.py). Teams, matches and players are
+stored per league and season. The first league and the latest season are
+the default scope of /table and /matches; /table and /matches/list take
+`league` and `season` parameters for the others.
+"""
+
+import os
+
+LEAGUE_NAMES = {
+    "EPL": "Premier League",
+    "La_liga": "La Liga",
+    "Bundesliga": "Bundesliga",
+    "Serie_A": "Serie A",
+    "Ligue_1": "Ligue 1",
+    "RFPL": "Russian Premier League",
+}
+
+LEAGUES = [code.strip() for code in os.getenv("INGEST_LEAGUES", "EPL").split(",") if code.strip()]
+SEASONS = sorted({int(year) for year in os.getenv("INGEST_SEASONS", "2025").split(",") if year.strip()})
+
+DEFAULT_LEAGUE = LEAGUES[0]
+CURRENT_SEASON = SEASONS[-1]
+
+for _code in LEAGUES:
+    if _code not in LEAGUE_NAMES:
+        print(f"[Leagues] Unknown Understat league code {_code!r}, syncing it anyway")
+
+
+def targets() -> list:
+    """Every (league, season) pair to ingest, current season first."""
+    return [(league, season) for season in reversed(SEASONS) for league in LEAGUES]
+
+
+def display_name(league: str) -> str:
+    return LEAGUE_NAMES.get(league, league.replace("_", " "))
@@ -1,13 +1,37 @@
-from fastapi import FastAPI, Depends, HTTPException
+import asyncio
+import base64
+import json
+import time
+from datetime import date, datetime, timezone
+from typing import Literal, Optional
+import anyio
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import desc
-from . import models, database, services, analysis, ai, cache
+from . import startup
+from . import models, database, services, analysis, ai, cache, ingest, jobs, commentary, leaderboards, leagues, metrics, profiler, queries, schema, simulation, views, warmer
 
-models.Base.metadata.create_all(bind=database.engine)
+startup.mark("imports")
+if startup.SCHEMA_BOOTSTRAP:
+    schema.upgrade_schema()
+startup.mark("schema")
 
 import os
 ROOT_PATH = os.getenv("ROOT_PATH", "/api")
+# Browsers may reuse cached reads this long, then revalidate with If-None-Match
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+CACHE_CONTROL = f"public, max-age={HTTP_CACHE_MAX_AGE}, must-revalidate"
+# Read endpoints run as async handlers (AsyncSession + redis.asyncio); false
+# keeps the threadpool handlers with the sync engine and client
+ASYNC_READS = os.getenv("ASYNC_READS", "true").lower() == "true"
+# Largest page /matches/list serves
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+# How often a commentary stream publishes its tokens, and its followers poll them (seconds)
+STREAM_FOLLOW_INTERVAL = float(os.getenv("AI_STREAM_FOLLOW_INTERVAL", "0.25"))
+# Seconds a client should wait before asking again for a simulation that is still running
+SIMULATION_RETRY_AFTER = int(os.getenv("SIMULATION_RETRY_AFTER", "5"))
 
 app = FastAPI(
     title="Football AI API",
@@ -22,7 +46,36 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Queries", "X-DB-Time", "X-DB-Repeated"],
 )
+if profiler.ENABLED:
+    app.add_middleware(profiler.ProfilerMiddleware)
+# Added last, so it is the outermost layer and also times the CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event("startup")
+async def warm_connections():
+    # Uvicorn accepts requests only after the startup handlers, so the first
+    # requests find open connections instead of paying for the handshakes
+    sync_pools = await run_in_threadpool(startup.warm_pools)
+    async_pools = await startup.awarm_pools() if ASYNC_READS else None
+    print(f"[Boot] Pools warmed: sync {sync_pools}, async {async_pools}")
+    startup.mark("pools")
+
+@app.on_event("startup")
+def start_background_workers():
+    cache.start_invalidation_listener()
+    jobs.start_workers()
+    warmer.start(on_done=lambda: startup.mark("cache_warm"))
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    jobs.stop_workers()
+    simulation.shutdown_pool()
+    cache.stop_invalidation_listener()
+    await ai.close_clients()
+    await cache.close_async_redis()
+    await database.dispose_async_engine()
 
 @app.get("/")
 def read_root():
@@ -30,179 +83,551 @@ def read_root():
 
 @app.get("/health")
 def health_check():
+    """Liveness: the process is up (dependencies are checked by /ready)"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+def readiness_check(response: Response):
+    """Readiness: database and Redis reachable, pools opened, cache warmed"""
+    ready, report = startup.check_ready()
+    if not ready:
+        response.status_code = 503
+    return report
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus metrics (see metrics.py)"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/cache-stats")
-def get_cache_stats():
-    """Returns cache statistics"""
-    return cache.get_cache_stats()
-
-
-@app.get("/table")
-def get_league_table(db: Session = Depends(database.get_db)):
-    """Returns the league table sorted by points (cached for 5 min)"""
-    # Try to get from cache first
-    cache_key = "table:all"
-    cached_data = cache.get_cache(cache_key)
-    if cached_data is not None:
-        return cached_data
-    
-    # Cache miss - query database
-    teams = db.query(models.Team).order_by(
-        desc(models.Team.points), 
-        desc(models.Team.goals_scored - models.Team.goals_conceded)
-    ).all()
-    
-    # Convert to dict for JSON serialization
-    result = []
-    for team in teams:
-        result.append({
-            "id": team.id,
-            "name": team.name,
-            "logo_url": team.logo_url,
-            "matches_played": team.matches_played,
-            "wins": team.wins,
-            "draws": team.draws,
-            "loses": team.loses,
-            "goals_scored": team.goals_scored,
-            "goals_conceded": team.goals_conceded,
-            "points": team.points
-        })
-    
-    # Store in cache
-    cache.set_cache(cache_key, result)
-    
-    return result
+def get_cache_stats(db: Session = Depends(database.get_db)):
+    """Returns cache statistics (Redis and the AI commentary cache)"""
+    stats = cache.get_cache_stats()
+    stats["commentary"] = commentary.get_stats(db)
+    stats["warmer"] = warmer.get_report()
+    return stats
 
-@app.get("/matches")
-def get_matches(db: Session = Depends(database.get_db)):
-    """Returns upcoming matches with predictions (cached for 5 min)"""
-    # Try to get from cache first
-    cache_key = "matches:upcoming"
-    cached_data = cache.get_cache(cache_key)
-    if cached_data is not None:
-        return cached_data
-    
-    # Cache miss - query database
-    matches = db.query(models.Match).filter(
-        models.Match.status != "FINISHED"
-    ).order_by(models.Match.date).limit(10).all()
-    
-    # Format data nicely for React
-    result = []
-    for m in matches:
-        pred = m.prediction
-        result.append({
-            "id": m.id,
-            "date": m.date,
-            "home_team": m.home_team.name,
-            "away_team": m.away_team.name,
-            "logo_home": m.home_team.logo_url,
-            "logo_away": m.away_team.logo_url,
-            "prediction": {
-                "winner": "Draw" if pred and pred.is_draw_prediction else (
-                    m.home_team.name if pred and pred.predicted_winner_id == m.home_team_id else m.away_team.name
-                ),
-                "confidence": int(pred.confidence_score * 100) if pred else 0,
-                "ai_text": pred.ai_generated_commentary if pred else None,
-                "analysis_content": pred.analysis_content if pred else None
-            } if pred else None
-        })
-    
-    # Store in cache
-    cache.set_cache(cache_key, result)
-    
-    return result
 
-@app.get("/matches/{match_id}")
-def get_match(match_id: int, db: Session = Depends(database.get_db)):
-    """Returns detailed data for a single match (cached for 5 min)"""
-    # Try to get from cache first
-    cache_key = f"matches:detail:{match_id}"
-    cached_data = cache.get_cache(cache_key)
-    if cached_data is not None:
-        return cached_data
-    
-    # Cache miss - query database
-    m = db.query(models.Match).filter(models.Match.id == match_id).first()
-    
-    if not m:
-        raise HTTPException(404, "Match not found")
-    
-    pred = m.prediction
-    result = {
-        "id": m.id,
-        "date": m.date,
-        "home_team": m.home_team.name,
-        "away_team": m.away_team.name,
-        "logo_home": m.home_team.logo_url,
-        "logo_away": m.away_team.logo_url,
-        "prediction": {
-            "winner": "Draw" if pred and pred.is_draw_prediction else (
-                m.home_team.name if pred and pred.predicted_winner_id == m.home_team_id else m.away_team.name
-            ),
-            "confidence": int(pred.confidence_score * 100) if pred else 0,
-            "ai_text": pred.ai_generated_commentary if pred else None,
-            "analysis_content": pred.analysis_content if pred else None
-        } if pred else None
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110), so the gzip variant's tag matches too
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags or _gzip_etag(etag) in tags
+
+def _gzip_etag(etag: str) -> str:
+    # Each content-encoding is a separate representation with its own strong tag
+    return etag[:-1] + '-gzip"'
+
+def _accepts_gzip(header: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip: listed (or `*`) with q > 0."""
+    weights = {}
+    for part in header.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    return weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0))) > 0
+
+def _entry_response(request: Request, entry: cache.CacheEntry) -> Response:
+    """
+    Serves a cached JSON body as-is (no parse / re-encode on hits), gzipped
+    when the client accepts it and a compressed copy is stored. Requests with
+    a matching If-None-Match get 304 without a body.
+    """
+    use_gzip = entry.gzip is not None and _accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": _gzip_etag(entry.etag) if use_gzip else entry.etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
     }
-    
-    # Store in cache
-    cache.set_cache(cache_key, result)
-    
-    return result
+    if _etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(entry.gzip, media_type="application/json", headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+def _cached_json(request: Request, key: str, build) -> Response:
+    return _entry_response(request, cache.get_or_build(key, lambda: cache.dumps(build())))
+
+LIST_STATUSES = {"upcoming": "upcoming", "finished": "FINISHED", "scheduled": "SCHEDULED", "timed": "TIMED"}
+
+def _encode_cursor(date, match_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{date.isoformat()}|{match_id}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date, match_id = raw.split("|")
+        return datetime.fromisoformat(date), int(match_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Match dates are stored without a timezone
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _check_scope(league: Optional[str], season: Optional[int]):
+    # Only configured league seasons are synced (and may be cached)
+    if league is not None and league not in leagues.LEAGUES:
+        raise HTTPException(404, f"Unknown league, available: {', '.join(leagues.LEAGUES)}")
+    if season is not None and season not in leagues.SEASONS:
+        raise HTTPException(404, f"Unknown season, available: {', '.join(map(str, leagues.SEASONS))}")
+
+def _parse_as_of(as_of: str):
+    """`as_of` is a matchday number or a date (YYYY-MM-DD); returns (matchday, day)."""
+    if as_of.isdigit():
+        return int(as_of), None
+    try:
+        return None, date.fromisoformat(as_of)
+    except ValueError:
+        raise HTTPException(400, "as_of must be a matchday number or a date (YYYY-MM-DD)")
+
+def _match_list_params(team_id, status, date_from, date_to, order, limit, cursor, league=None, season=None):
+    """Validates the listing filters; returns (normalized cache key, query kwargs)."""
+    if status is not None and status.lower() not in LIST_STATUSES:
+        raise HTTPException(400, f"status must be one of: {', '.join(LIST_STATUSES)}")
+    _check_scope(league, season)
+    params = {
+        "league": league,
+        "season": season,
+        "status": LIST_STATUSES[status.lower()] if status else None,
+        "team_id": team_id,
+        "date_from": _naive_utc(date_from),
+        "date_to": _naive_utc(date_to),
+        "after": _decode_cursor(cursor) if cursor else None,
+        "descending": order == "desc",
+        "limit": limit,
+    }
+    key = cache.cache_key(
+        "matchlist", league or "all", season or "all", params["status"] or "all", team_id or "all",
+        params["date_from"].isoformat() if params["date_from"] else "-",
+        params["date_to"].isoformat() if params["date_to"] else "-",
+        order, limit, cursor or "first"
+    )
+    return key, params
+
+def _match_page(rows, limit: int) -> dict:
+    # One extra row is fetched to know whether there is a next page
+    items = rows[:limit]
+    next_cursor = _encode_cursor(items[-1].date, items[-1].id) if len(rows) > limit and items else None
+    return {"items": [queries.match_list_item(r) for r in items], "next_cursor": next_cursor, "limit": limit}
+
+def _build_match_list(params: dict) -> dict:
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(queries.match_list(**{**params, "limit": params["limit"] + 1})).all()
+        return _match_page(rows, params["limit"])
+    finally:
+        db.close()
+
+async def _abuild_match_list(params: dict) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        rows = (await db.execute(queries.match_list(**{**params, "limit": params["limit"] + 1}))).all()
+        return cache.dumps(_match_page(rows, params["limit"]))
+
+# Registered before /matches/{match_id} so "list" is not parsed as an id
+@app.get("/matches/list")
+async def list_matches(
+    request: Request,
+    team_id: Optional[int] = None,
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    league: Optional[str] = None,
+    season: Optional[int] = None,
+):
+    """
+    Lists matches ordered by date with keyset pagination. Filters: league,
+    season, team_id (home or away), status (upcoming, finished, scheduled,
+    timed) and a [date_from, date_to) window. Pass `next_cursor` from a page
+    as `cursor` to get the next one; every page costs the same however deep
+    it is.
+    """
+    key, params = _match_list_params(team_id, status, date_from, date_to, order, limit, cursor, league, season)
+    if ASYNC_READS:
+        entry = await cache.aget_or_build(key, lambda: _abuild_match_list(params))
+    else:
+        entry = await run_in_threadpool(cache.get_or_build, key, lambda: cache.dumps(_build_match_list(params)))
+    return _entry_response(request, entry)
+
+if ASYNC_READS:
+    @app.get("/table")
+    async def get_league_table(
+        request: Request, league: Optional[str] = None, season: Optional[int] = None, as_of: Optional[str] = None
+    ):
+        """
+        Returns the league table sorted by points, or as it stood after a
+        matchday / on a date (`as_of`) from the standings snapshots (cached for
+        5 min, stale-while-revalidate)
+        """
+        _check_scope(league, season)
+        league, season = league or leagues.DEFAULT_LEAGUE, season or leagues.CURRENT_SEASON
+        if as_of is not None:
+            matchday, day = _parse_as_of(as_of)
+            entry = await cache.aget_or_build(
+                views.table_as_of_key(league, season, matchday, day),
+                lambda: views.abuild_table_as_of(league, season, matchday, day)
+            )
+        else:
+            entry = await cache.aget_or_build(views.table_key(league, season), lambda: views.abuild_table(league, season))
+        return _entry_response(request, entry)
+
+    @app.get("/matches")
+    async def get_matches(request: Request):
+        """Returns upcoming matches with predictions (cached for 5 min, stale-while-revalidate)"""
+        return _entry_response(request, await cache.aget_or_build(views.UPCOMING_KEY, views.abuild_upcoming))
+
+    @app.get("/matches/{match_id}")
+    async def get_match(match_id: int, request: Request):
+        """Returns detailed data for a single match (cached for 5 min, stale-while-revalidate)"""
+        entry = await cache.aget_or_build(views.detail_key(match_id), lambda: views.abuild_match(match_id))
+        return _entry_response(request, entry)
+else:
+    @app.get("/table")
+    def get_league_table(
+        request: Request, league: Optional[str] = None, season: Optional[int] = None, as_of: Optional[str] = None
+    ):
+        """
+        Returns the league table sorted by points, or as it stood after a
+        matchday / on a date (`as_of`) from the standings snapshots (cached for
+        5 min, stale-while-revalidate)
+        """
+        _check_scope(league, season)
+        league, season = league or leagues.DEFAULT_LEAGUE, season or leagues.CURRENT_SEASON
+        if as_of is not None:
+            matchday, day = _parse_as_of(as_of)
+            return _cached_json(
+                request, views.table_as_of_key(league, season, matchday, day),
+                lambda: views.build_table_as_of(league, season, matchday, day)
+            )
+        return _cached_json(request, views.table_key(league, season), lambda: views.build_table(league, season))
+
+    @app.get("/matches")
+    def get_matches(request: Request):
+        """Returns upcoming matches with predictions (cached for 5 min, stale-while-revalidate)"""
+        return _cached_json(request, views.UPCOMING_KEY, views.build_upcoming)
+
+    @app.get("/matches/{match_id}")
+    def get_match(match_id: int, request: Request):
+        """Returns detailed data for a single match (cached for 5 min, stale-while-revalidate)"""
+        return _cached_json(request, views.detail_key(match_id), lambda: views.build_match(match_id))
+
+def _check_metric(metric: str):
+    if metric not in leaderboards.METRICS:
+        raise HTTPException(400, f"metric must be one of: {', '.join(leaderboards.METRICS)}")
+
+@app.get("/players/top")
+async def get_top_players(
+    request: Request,
+    metric: str = "goals",
+    league: Optional[str] = None,
+    season: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=leaderboards.TOP_K),
+):
+    """
+    Top players of a league season by a metric (goals, assists, xg, xa, shots
+    or a *_per90 ratio), served from the leaderboard index built on sync.
+    """
+    _check_metric(metric)
+    _check_scope(league, season)
+    league, season = league or leagues.DEFAULT_LEAGUE, season or leagues.CURRENT_SEASON
+    key = views.top_players_key(league, season, metric, limit)
+    if ASYNC_READS:
+        entry = await cache.aget_or_build(key, lambda: views.abuild_top_players(league, season, metric, limit))
+    else:
+        entry = await run_in_threadpool(
+            cache.get_or_build, key, lambda: cache.dumps(views.build_top_players(league, season, metric, limit))
+        )
+    return _entry_response(request, entry)
+
+@app.get("/teams/{team_id}/players")
+async def get_team_players(
+    team_id: int,
+    request: Request,
+    metric: str = "goals",
+    limit: int = Query(10, ge=1, le=leaderboards.TOP_K),
+):
+    """A team's top players by a metric, served from the leaderboard index built on sync"""
+    _check_metric(metric)
+    key = views.team_players_key(team_id, metric, limit)
+    if ASYNC_READS:
+        entry = await cache.aget_or_build(key, lambda: views.abuild_team_players(team_id, metric, limit))
+    else:
+        entry = await run_in_threadpool(
+            cache.get_or_build, key, lambda: cache.dumps(views.build_team_players(team_id, metric, limit))
+        )
+    return _entry_response(request, entry)
+
+@app.get("/teams/{team_id}/positions")
+async def get_team_positions(team_id: int, request: Request):
+    """A team's league position and points after each of its matches, from the standings snapshots"""
+    key = views.positions_key(team_id)
+    if ASYNC_READS:
+        entry = await cache.aget_or_build(key, lambda: views.abuild_positions(team_id))
+    else:
+        entry = await run_in_threadpool(cache.get_or_build, key, lambda: cache.dumps(views.build_positions(team_id)))
+    return _entry_response(request, entry)
+
+@app.get("/simulation")
+async def get_simulation(request: Request, response: Response, league: Optional[str] = None, season: Optional[int] = None):
+    """
+    Monte Carlo projection of a league season's remaining fixtures: expected
+    points and the probability of every final position (title, top 4,
+    relegation). Runs in the background (warmer.simulate_in_background);
+    until the first result is cached the response is 202 and should be retried.
+    """
+    _check_scope(league, season)
+    league, season = league or leagues.DEFAULT_LEAGUE, season or leagues.CURRENT_SEASON
+    key = views.simulation_key(league, season)
+    if cache.get_redis_client() is None:
+        # Nowhere to keep a background result: build it here
+        entry = await run_in_threadpool(
+            cache.get_or_build, key, lambda: cache.dumps(views.build_simulation(league, season)), views.SIMULATION_TTL
+        )
+        return _entry_response(request, entry)
+
+    entry = await run_in_threadpool(cache.get_entry, key)
+    if entry is None or not entry.fresh:
+        await run_in_threadpool(warmer.simulate_in_background, league, season)
+    if entry is None:
+        response.status_code = 202
+        response.headers["Retry-After"] = str(SIMULATION_RETRY_AFTER)
+        return {"status": "running", "league": league, "season": season}
+    return _entry_response(request, entry)
+
+@app.get("/predict")
+async def predict(request: Request, home: int, away: int):
+    """
+    Home win / draw / away win probabilities and expected goals of any
+    fixture between two teams of a league season, read from the head-to-head
+    matrix rebuilt on sync
+    """
+    if home == away:
+        raise HTTPException(400, "home and away must be different teams")
+    key = views.predict_key(home, away)
+    if ASYNC_READS:
+        entry = await cache.aget_or_build(key, lambda: views.abuild_prediction(home, away))
+    else:
+        entry = await run_in_threadpool(cache.get_or_build, key, lambda: cache.dumps(views.build_prediction(home, away)))
+    return _entry_response(request, entry)
 
 @app.post("/analyze/{match_id}")
-def analyze_match(match_id: int, db: Session = Depends(database.get_db)):
-    """Forces AI analysis for a specific match"""
+def analyze_match(match_id: int, response: Response, db: Session = Depends(database.get_db)):
+    """
+    Requests AI analysis for a specific match.
+    Returns the stored commentary, or queues a generation job (202) that can be
+    polled at /analyze/jobs/{job_id}.
+    """
     # 1. Check if there is an algorithmic prediction
     pred = db.query(models.Prediction).filter(models.Prediction.match_id == match_id).first()
     if not pred:
-        # If not, generate it (simplified call)
-        analysis.generate_predictions(db)
+        # If not, generate it (this fixture only)
+        if analysis.predict_match(db, match_id):
+            cache.invalidate_match(match_id)
         pred = db.query(models.Prediction).filter(models.Prediction.match_id == match_id).first()
     
     if not pred:
         raise HTTPException(404, "Failed to generate prediction")
 
-    # 2. Generate AI text
-    if not pred.ai_generated_commentary:
-        commentary = ai.generate_match_commentary(pred.analysis_content)
-        pred.ai_generated_commentary = commentary
+    if pred.ai_generated_commentary:
+        return {"status": "cached", "text": pred.ai_generated_commentary}
+
+    # 2. Queue AI text generation (duplicate requests share the in-flight job)
+    job = jobs.enqueue_commentary(match_id)
+    response.status_code = 202
+    return {"status": job["status"], "job_id": job["id"], "match_id": match_id}
+
+@app.get("/analyze/jobs/{job_id}")
+def get_analysis_job(job_id: str):
+    """Returns the state of a commentary job: queued, running, done or failed"""
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
+
+def _load_analysis(match_id: int):
+    """Returns (analysis_content, ai_commentary, league) for a match, creating its prediction if needed."""
+    db = database.SessionLocal()
+    try:
+        pred = db.query(models.Prediction).filter(models.Prediction.match_id == match_id).first()
+        if not pred:
+            if analysis.predict_match(db, match_id):
+                cache.invalidate_match(match_id)
+            pred = db.query(models.Prediction).filter(models.Prediction.match_id == match_id).first()
+        if not pred:
+            return None
+        league = db.query(models.Match.league).filter(models.Match.id == match_id).scalar()
+        if not pred.ai_generated_commentary:
+            # Same prompt generated before (e.g. before the last /run-algo)
+            text = commentary.cached_commentary(db, pred.analysis_content, league)
+            if text:
+                pred.ai_generated_commentary = text
+                db.commit()
+                cache.invalidate_match(match_id)
+        return pred.analysis_content, pred.ai_generated_commentary, league
+    finally:
+        db.close()
+
+def _store_commentary(match_id: int, analysis_content: str, league: str, text: str, seconds: float):
+    db = database.SessionLocal()
+    try:
+        commentary.store(db, commentary.content_key(analysis_content, league), text, seconds)
+        db.query(models.Prediction).filter(
+            models.Prediction.match_id == match_id
+        ).update({"ai_generated_commentary": text})
         db.commit()
-        
-        # Invalidate cache for this match
-        cache.delete_cache(f"matches:detail:{match_id}")
-        cache.delete_cache("matches:upcoming")
-        
-        return {"status": "generated", "text": commentary}
-    
-    return {"status": "cached", "text": pred.ai_generated_commentary}
+    finally:
+        db.close()
+    cache.invalidate_match(match_id)
+
+def _sse(data: dict, event: str = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def _follow_job(job_id: str):
+    """SSE events of a commentary job started elsewhere: its streamed tokens, then done or error."""
+    offset, status, last_change = 0, None, time.monotonic()
+    while True:
+        tokens, job = await run_in_threadpool(jobs.follow_stream, job_id, offset)
+        if job is None:
+            yield _sse({"error": "AI generation failed"}, event="error")
+            return
+        for token in tokens:
+            yield _sse({"token": token})
+        offset += len(tokens)
+        if tokens or job["status"] != status:
+            status, last_change = job["status"], time.monotonic()
+        if status == jobs.DONE:
+            yield _sse({"text": job.get("text", ""), "cached": False}, event="done")
+            return
+        if status == jobs.FAILED or time.monotonic() - last_change > jobs.JOB_VISIBILITY_TIMEOUT:
+            yield _sse({"error": "AI generation failed"}, event="error")
+            return
+        await asyncio.sleep(STREAM_FOLLOW_INTERVAL)
+
+@app.get("/analyze/{match_id}/stream")
+async def stream_analysis(match_id: int):
+    """
+    Streams AI analysis as Server-Sent Events while Ollama generates it.
+    Emits `data: {"token": ...}` events, then `event: done` with the full text
+    (which is stored on the prediction), or `event: error`. Only one model
+    call runs per match: concurrent streams (and queued jobs) are followed.
+    """
+    loaded = await run_in_threadpool(_load_analysis, match_id)
+    if loaded is None:
+        raise HTTPException(404, "Failed to generate prediction")
+    analysis_content, stored_text, league = loaded
+
+    async def events():
+        if stored_text:
+            yield _sse({"text": stored_text, "cached": True}, event="done")
+            return
+
+        job, owner = await run_in_threadpool(jobs.begin_stream, match_id)
+        if not owner:
+            async for event in _follow_job(job["id"]):
+                yield event
+            return
+
+        text = None
+        try:
+            # Another stream may have finished between the lookup and the claim
+            text = (await run_in_threadpool(_load_analysis, match_id))[1]
+            if text:
+                yield _sse({"text": text, "cached": True}, event="done")
+                return
+
+            started = time.perf_counter()
+            parts, pending, published = [], [], time.monotonic()
+            try:
+                async for token in ai.stream_match_commentary(analysis_content, league):
+                    parts.append(token)
+                    pending.append(token)
+                    yield _sse({"token": token})
+                    if time.monotonic() - published >= STREAM_FOLLOW_INTERVAL:
+                        await run_in_threadpool(jobs.publish_tokens, job, pending)
+                        pending, published = [], time.monotonic()
+            except Exception as e:
+                print(f"Ollama Stream Error: {e}")
+                yield _sse({"error": "AI generation failed"}, event="error")
+                return
+
+            await run_in_threadpool(jobs.publish_tokens, job, pending)
+            if not "".join(parts).strip():
+                yield _sse({"error": "AI generation failed"}, event="error")
+                return
+            text = "".join(parts)
+            await run_in_threadpool(
+                _store_commentary, match_id, analysis_content, league, text, time.perf_counter() - started
+            )
+            yield _sse({"text": text, "cached": False}, event="done")
+        finally:
+            # Also when the client went away mid-stream: followers get an error.
+            # The task is being cancelled then, so the cleanup must be shielded.
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(jobs.finish_stream, job, text)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # --- ADMIN ENDPOINTS ---
 @app.post("/sync-data")
-def sync_data(db: Session = Depends(database.get_db)):
-    result = services.sync_fbref_data(db)
-    # Invalidate all caches after data sync
-    cache.invalidate_all_cache()
+def sync_data(force: bool = False):
+    """Syncs every configured league season (fetched concurrently, written in parallel)"""
+    result = ingest.run(force=force)
+    # Rebuild (or invalidate) only the cache entries touched by the sync
+    if result.get("status") in ("success", "partial"):
+        result["cache_warm"] = warmer.after_sync(result["changes"])
     return result
 
 @app.post("/run-algo")
-def run_algo(db: Session = Depends(database.get_db)):
+def run_algo(background_tasks: BackgroundTasks, db: Session = Depends(database.get_db)):
     result = analysis.generate_predictions(db)
-    # Invalidate matches cache after predictions update
-    cache.invalidate_matches_cache()
+    # Rebuild the fixture views with the new predictions
+    result["cache_warm"] = warmer.after_predictions()
+    # Fill AI commentary for the new predictions (cache hits first, then Ollama)
+    if commentary.PREGENERATE_ENABLED:
+        background_tasks.add_task(commentary.pregenerate_upcoming)
+        result["commentary_pregeneration"] = "scheduled"
     return result
 
+@app.post("/pregenerate-commentary", status_code=202)
+def pregenerate_commentary(background_tasks: BackgroundTasks, concurrency: int = None):
+    """Generates AI commentary for all upcoming fixtures in the background"""
+    background_tasks.add_task(commentary.pregenerate_upcoming, concurrency)
+    return {"status": "scheduled", "concurrency": concurrency or commentary.PREGENERATE_CONCURRENCY}
+
 @app.post("/update-logos")
 def update_logos_endpoint(db: Session = Depends(database.get_db)):
     result = services.update_team_logos(db)
-    # Invalidate table cache after logos update
-    cache.invalidate_table_cache()
+    # Rebuild the table and fixture views with the new logos
+    result["cache_warm"] = warmer.after_logos()
     return result
 
 @app.post("/invalidate-cache")
 def invalidate_cache():
     """Admin endpoint to manually invalidate all cache"""
     deleted = cache.invalidate_all_cache()
-    return {"status": "success", "deleted_keys": deleted}
\ No newline at end of file
+    return {"status": "success", "deleted_keys": deleted}
+
+startup.mark("app")
@@ -0,0 +1,169 @@
+"""
+Prometheus metrics, served as text by GET /metrics.
+
+    http_request_duration_seconds     per route template, method and status
+    http_requests_in_progress         in-flight requests (autoscaling signal)
+    cache_requests_total              get_or_build results per key prefix: fresh / stale / miss
+    cache_lookups_total               L1 and Redis lookups per key prefix: hit / miss
+    cache_sets_total                  entries written per key prefix
+    db_pool_*                         SQLAlchemy pool size, checked out, overflow (sync / async)
+    db_pool_checkout_seconds          time to get a pooled connection (wait + connect)
+    job_stage_duration_seconds        sync, prediction and commentary stages
+    ollama_request_duration_seconds   Ollama calls (generate / stream) and outcome
+    ollama_first_token_seconds        time to the first streamed token
+
+Key prefixes are the key families below (ids and query parameters are cut
+off), so label cardinality stays fixed. The metrics are per process; each
+pod runs one uvicorn worker and is scraped on its own.
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Longest first: "matches:detail:12" -> "matches:detail", "table:EPL:2025" -> "table"
+KEY_PREFIXES = (
+    "matches:upcoming", "matches:detail", "table", "matchlist",
+    "players:top", "players:team", "standings:team", "standings", "simulation", "predict",
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being served")
+
+CACHE_REQUESTS = Counter("cache_requests_total", "Cached reads by outcome", ["prefix", "result"])
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache tier lookups", ["prefix", "tier", "result"])
+CACHE_SETS = Counter("cache_sets_total", "Cache entries written", ["prefix"])
+
+POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds", "Time to get a connection from the pool",
+    ["pool"], buckets=LATENCY_BUCKETS
+)
+
+STAGE_DURATION = Histogram(
+    "job_stage_duration_seconds", "Duration of sync / prediction / commentary stages",
+    ["job", "stage"], buckets=STAGE_BUCKETS
+)
+OLLAMA_DURATION = Histogram(
+    "ollama_request_duration_seconds", "Ollama call duration",
+    ["mode", "outcome"], buckets=STAGE_BUCKETS
+)
+OLLAMA_FIRST_TOKEN = Histogram(
+    "ollama_first_token_seconds", "Time to the first streamed Ollama token", buckets=STAGE_BUCKETS
+)
+
+
+def key_prefix(key: str) -> str:
+    for prefix in KEY_PREFIXES:
+        if key.startswith(prefix):
+            return prefix
+    return key.split(":", 1)[0]
+
+
+def cache_request(key: str, result: str):
+    CACHE_REQUESTS.labels(key_prefix(key), result).inc()
+
+
+def cache_lookup(key: str, tier: str, hit: bool):
+    CACHE_LOOKUPS.labels(key_prefix(key), tier, "hit" if hit else "miss").inc()
+
+
+def cache_set(key: str):
+    CACHE_SETS.labels(key_prefix(key)).inc()
+
+
+def observe_stage(job: str, stage: str, seconds: float):
+    STAGE_DURATION.labels(job, stage).observe(seconds)
+
+
+@contextmanager
+def stage(job: str, name: str):
+    """Times the block as one job stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(job, name, time.perf_counter() - started)
+
+
+def instrument_pool(pool, name: str):
+    """Times every connection checkout of a SQLAlchemy pool."""
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_CHECKOUT.labels(name).observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+class _PoolCollector:
+    """Reads the pool counters at scrape time."""
+
+    def describe(self):
+        # Without it, register() calls collect() while database.py may still be importing
+        return []
+
+    def collect(self):
+        from . import database
+
+        size = GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["pool"])
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["pool"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections above pool_size", labels=["pool"])
+        for name, pool in database.pools().items():
+            if not hasattr(pool, "checkedout"):
+                continue  # NullPool / StaticPool (e.g. in-memory SQLite)
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+        return [size, checked_out, overflow]
+
+
+REGISTRY.register(_PoolCollector())
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template (not per URL)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status["code"])
+            ).observe(time.perf_counter() - started)
+
+
+def render() -> bytes:
+    return generate_latest(REGISTRY)
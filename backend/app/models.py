@@ -1,11 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Boolean, UniqueConstraint, Index, text
+from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
 
 class Team(Base):
+    """One team in one league season (the row holds that season's table)."""
     __tablename__ = "teams"
+    __table_args__ = (
+        Index("uq_teams_league_season_external_id", "league", "season", "external_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    external_id = Column(Integer, unique=True)
+    external_id = Column(Integer)
+    league = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
     name = Column(String, index=True)
     short_name = Column(String)
     logo_url = Column(String, nullable=True)
@@ -29,14 +36,22 @@ class Team(Base):
 
 class Player(Base):
     __tablename__ = "players"
+    __table_args__ = (
+        # Squad lookups by team; Postgres can answer them from the index alone
+        Index("ix_players_team_id", "team_id", postgresql_include=["name", "goals", "assists", "xg"]),
+        Index("uq_players_league_season_external_id", "league", "season", "external_id", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    external_id = Column(Integer, unique=True)
+    external_id = Column(Integer)
+    league = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
     name = Column(String)
     position = Column(String) 
     team_id = Column(Integer, ForeignKey("teams.id"))
     
     # --- REDUCED STATS ---
     games = Column(Integer, default=0)
+    minutes = Column(Integer, default=0)
     goals = Column(Integer, default=0)
     assists = Column(Integer, default=0)
     shots = Column(Integer, default=0)
@@ -45,10 +60,98 @@ class Player(Base):
     
     team = relationship("Team", back_populates="players")
 
+class PlayerRanking(Base):
+    """A player's place in a metric's top-k leaderboards (league season and team), see leaderboards.py."""
+    __tablename__ = "player_rankings"
+    __table_args__ = (
+        # /players/top: a league season's top k of a metric
+        Index("ix_player_rankings_league_rank", "league", "season", "metric", "league_rank"),
+        # /teams/{id}/players and the squads in prediction prompts
+        Index("ix_player_rankings_team_rank", "team_id", "metric", "team_rank"),
+    )
+    id = Column(Integer, primary_key=True)
+    league = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
+    metric = Column(String, nullable=False)
+    player_id = Column(Integer, ForeignKey("players.id"), nullable=False)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
+    value = Column(Float)
+    # Null when the player is outside that top k
+    league_rank = Column(Integer, nullable=True)
+    team_rank = Column(Integer, nullable=True)
+
+class Standing(Base):
+    """A team's cumulative league record after its N-th finished match (matchday N), see standings.py."""
+    __tablename__ = "standings"
+    __table_args__ = (
+        # Position-over-time of one team; also the lookup of a team's row at a matchday
+        Index("uq_standings_team_matchday", "team_id", "matchday", unique=True),
+        # /table?as_of=<matchday>
+        Index("ix_standings_league_season_matchday", "league", "season", "matchday"),
+        # /table?as_of=<date> and the incremental update (rows on or after a date)
+        Index("ix_standings_league_season_date", "league", "season", "date"),
+    )
+    id = Column(Integer, primary_key=True)
+    league = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
+    matchday = Column(Integer, nullable=False)
+    match_id = Column(Integer, ForeignKey("matches.id"), nullable=False)
+    date = Column(DateTime)
+    wins = Column(Integer, default=0)
+    draws = Column(Integer, default=0)
+    loses = Column(Integer, default=0)
+    goals_scored = Column(Integer, default=0)
+    goals_conceded = Column(Integer, default=0)
+    points = Column(Integer, default=0)
+    xg_for = Column(Float, default=0.0)
+    xg_against = Column(Float, default=0.0)
+    # Place in the table as of this matchday (every team's latest row up to it)
+    position = Column(Integer)
+
+class HeadToHead(Base):
+    """Outcome probabilities and expected goals of one home/away team pair, see headtohead.py."""
+    __tablename__ = "head_to_head"
+    __table_args__ = (
+        # GET /predict: one pair
+        Index("uq_head_to_head_home_away", "home_team_id", "away_team_id", unique=True),
+        # The rebuild of a league season's matrix
+        Index("ix_head_to_head_league_season", "league", "season"),
+    )
+    id = Column(Integer, primary_key=True)
+    league = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
+    home_team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
+    away_team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
+    home_win = Column(Float)
+    draw = Column(Float)
+    away_win = Column(Float)
+    home_xg = Column(Float)
+    away_xg = Column(Float)
+
 class Match(Base):
     __tablename__ = "matches"
+    __table_args__ = (
+        # status IN (...) / status = 'FINISHED' ORDER BY date
+        Index("ix_matches_status_date", "status", "date"),
+        # /matches/list keyset pagination on (date, id)
+        Index("ix_matches_date_id", "date", "id"),
+        # The same, within one league / season
+        Index("ix_matches_league_season_date_id", "league", "season", "date", "id"),
+        # /matches: a league's next fixtures by date (partial, shrinks as matches finish)
+        Index(
+            "ix_matches_upcoming_league_date", "league", "date",
+            postgresql_where=text("status <> 'FINISHED'"),
+            sqlite_where=text("status <> 'FINISHED'")
+        ),
+        # get_team_form: a team's last finished matches, newest first
+        Index("ix_matches_home_team_status_date", "home_team_id", "status", text("date DESC")),
+        Index("ix_matches_away_team_status_date", "away_team_id", "status", text("date DESC")),
+    )
     id = Column(Integer, primary_key=True, index=True)
     external_id = Column(Integer, unique=True, index=True)
+    league = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
     date = Column(DateTime)
     home_team_id = Column(Integer, ForeignKey("teams.id"))
     away_team_id = Column(Integer, ForeignKey("teams.id"))
@@ -64,6 +167,7 @@ class Match(Base):
 
 class MatchStat(Base):
     __tablename__ = "match_stats"
+    __table_args__ = (Index("uq_match_stats_match_id", "match_id", unique=True),)
     id = Column(Integer, primary_key=True, index=True)
     match_id = Column(Integer, ForeignKey("matches.id"))
     
@@ -75,6 +179,7 @@ class MatchStat(Base):
 
 class Prediction(Base):
     __tablename__ = "predictions"
+    __table_args__ = (Index("uq_predictions_match_id", "match_id", unique=True),)
     id = Column(Integer, primary_key=True, index=True)
     match_id = Column(Integer, ForeignKey("matches.id"))
     predicted_winner_id = Column(Integer, ForeignKey("teams.id"), nullable=True)
@@ -83,4 +188,27 @@ class Prediction(Base):
     analysis_content = Column(Text)
     ai_generated_commentary = Column(Text, nullable=True)
     
-    match = relationship("Match", back_populates="prediction")
\ No newline at end of file
+    match = relationship("Match", back_populates="prediction")
+
+class SyncFingerprint(Base):
+    """Content hash of the last synced payload and of each synced record, per league season."""
+    __tablename__ = "sync_fingerprints"
+    __table_args__ = (
+        UniqueConstraint("league", "season", "kind", "external_id", name="uq_sync_fingerprints_scope_kind_external_id"),
+    )
+    id = Column(Integer, primary_key=True, index=True)
+    league = Column(String, nullable=False)
+    season = Column(Integer, nullable=False)
+    kind = Column(String)  # payload | team | match | player
+    external_id = Column(Integer)
+    digest = Column(String(32))
+
+class CommentaryCache(Base):
+    """LLM output keyed by a hash of model name, prompt template and analysis content."""
+    __tablename__ = "commentary_cache"
+    key = Column(String(64), primary_key=True)
+    model = Column(String)
+    text = Column(Text)
+    generation_seconds = Column(Float, default=0.0)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, server_default=func.now())
@@ -0,0 +1,179 @@
+"""
+Per-request SQL profiling (opt-in, SQL_PROFILE=true).
+
+SQLAlchemy engine events count and time every statement executed while a
+profile is active. Statements are grouped by shape: whitespace collapsed,
+literals and parameter lists replaced by "?". So the same lazy load for 20
+different ids shows up as one fingerprint run 20 times, which is the N+1
+pattern.
+
+With profiling enabled:
+    - every request gets X-DB-Queries (count) and X-DB-Time (ms) headers and
+      one "[SQL] {json}" log line;
+    - a request that runs one statement shape more than
+      SQL_PROFILE_REPEAT_THRESHOLD times is flagged ("n_plus_one" in the log,
+      X-DB-Repeated header);
+    - functions decorated with @profiled (sync, predictions, commentary jobs)
+      are profiled the same way when they run outside a request.
+
+profile() can also be used directly, e.g. in benchmarks:
+
+    with profiler.profile("generate_predictions") as p:
+        analysis.generate_predictions(db)
+    print(p.count, p.seconds)
+"""
+
+import functools
+import json
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+ENABLED = os.getenv("SQL_PROFILE", "false").lower() == "true"
+# More runs of one statement shape than this in a request is flagged
+REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5"))
+# Fingerprints listed per log line
+TOP_STATEMENTS = 5
+
+_current: ContextVar[Optional["QueryProfile"]] = ContextVar("sql_profile", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*\)")
+_PARAM = re.compile(r"%\(\w+\)s|\$\d+|:\w+")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape: literals and parameter lists replaced by "?"."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _PARAM.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _PARAM_LIST.sub("(?...)", shape)
+
+
+class QueryProfile:
+    """Queries executed in one request or job."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self.started = time.perf_counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[fingerprint(statement)] += 1
+
+    def repeated(self) -> list:
+        """Statement shapes run more than REPEAT_THRESHOLD times."""
+        return [(s, n) for s, n in self.statements.most_common() if n > REPEAT_THRESHOLD]
+
+    def report(self) -> dict:
+        return {
+            "name": self.name,
+            "queries": self.count,
+            "db_ms": round(self.seconds * 1000, 2),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "distinct_statements": len(self.statements),
+            "top_statements": [
+                {"count": n, "statement": s} for s, n in self.statements.most_common(TOP_STATEMENTS)
+            ],
+            "n_plus_one": [{"count": n, "statement": s} for s, n in self.repeated()],
+        }
+
+    def log(self, **extra):
+        report = {**self.report(), **extra}
+        if report["n_plus_one"]:
+            report["level"] = "warning"
+        print(f"[SQL] {json.dumps(report)}")
+
+
+@contextmanager
+def profile(name: str):
+    """Profiles the queries run in this context (and the threads it starts via run_in_threadpool)."""
+    current = QueryProfile(name)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+def profiled(name: str):
+    """
+    Decorator for background jobs: when profiling is enabled and the function
+    is not already running inside a profiled request, its queries are
+    profiled and logged under `name`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED or _current.get() is not None:
+                return func(*args, **kwargs)
+            with profile(name) as current:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    current.log()
+        return wrapper
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current.get()
+    started = conn.info.get("profile_started")
+    if current is not None and started:
+        current.record(statement, time.perf_counter() - started.pop())
+
+
+def instrument_engine(engine):
+    """Registers the profiling hooks on a (sync) engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class ProfilerMiddleware:
+    """ASGI middleware adding X-DB-Queries / X-DB-Time and logging each request's profile."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile(f"{scope['method']} {scope['path']}") as current:
+            status = {"code": 500}
+
+            async def send_with_headers(message):
+                if message["type"] == "http.response.start":
+                    status["code"] = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-queries", str(current.count).encode()))
+                    headers.append((b"x-db-time", f"{current.seconds * 1000:.2f}".encode()))
+                    if current.repeated():
+                        headers.append((b"x-db-repeated", str(len(current.repeated())).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                route = scope.get("route")
+                current.log(route=getattr(route, "path", None), status=status["code"])
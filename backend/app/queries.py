@@ -0,0 +1,274 @@
+"""
+Read-model queries for the API views.
+
+Each view is fetched in a single statement that joins both team aliases and
+the prediction and selects only the columns the response needs (rows, not
+ORM entities). The statements work with both the sync Session and the
+AsyncSession; the *_dict helpers turn the rows into response payloads.
+"""
+
+from datetime import timedelta
+
+from sqlalchemy import and_, desc, func, literal_column, or_, select, tuple_
+from sqlalchemy.orm import aliased
+
+from . import leagues, models
+
+HomeTeam = aliased(models.Team, name="home")
+AwayTeam = aliased(models.Team, name="away")
+
+UPCOMING_LIMIT = 10
+
+# Rendered as a literal (not a bind parameter) so the planner can match it
+# against the partial index ix_matches_upcoming_league_date
+NOT_FINISHED = models.Match.status != literal_column("'FINISHED'")
+
+TABLE_COLUMNS = (
+    models.Team.id,
+    models.Team.name,
+    models.Team.logo_url,
+    models.Team.matches_played,
+    models.Team.wins,
+    models.Team.draws,
+    models.Team.loses,
+    models.Team.goals_scored,
+    models.Team.goals_conceded,
+    models.Team.points,
+)
+
+
+def table(league: str = leagues.DEFAULT_LEAGUE, season: int = leagues.CURRENT_SEASON):
+    """League table of one league season sorted by points, then goal difference and goals scored."""
+    return select(*TABLE_COLUMNS).filter(
+        models.Team.league == league, models.Team.season == season
+    ).order_by(
+        desc(models.Team.points),
+        desc(models.Team.goals_scored - models.Team.goals_conceded),
+        desc(models.Team.goals_scored),
+        models.Team.id
+    )
+
+
+def table_as_of(league: str, season: int, matchday: int = None, day=None):
+    """
+    League table after `matchday` (each team's first N matches) or at the end
+    of `day` (a date), from the standings snapshots. Positions are ranked
+    here, as teams may have played a different number of matches by then.
+    """
+    s = models.Standing
+    played_by = s.matchday <= matchday if matchday is not None else s.date < day + timedelta(days=1)
+    latest = select(
+        s.team_id, func.max(s.matchday).label("matchday")
+    ).filter(s.league == league, s.season == season, played_by).group_by(s.team_id).subquery()
+    snapshot = select(s).join(
+        latest, and_(s.team_id == latest.c.team_id, s.matchday == latest.c.matchday)
+    ).subquery()
+
+    def counter(name):
+        return func.coalesce(snapshot.c[name], 0)
+
+    order = (
+        desc(counter("points")),
+        desc(counter("goals_scored") - counter("goals_conceded")),
+        desc(counter("goals_scored")),
+        models.Team.id,
+    )
+    return select(
+        func.row_number().over(order_by=order).label("position"),
+        models.Team.id,
+        models.Team.name,
+        models.Team.logo_url,
+        counter("matchday").label("matches_played"),
+        *(counter(name).label(name) for name in ("wins", "draws", "loses", "goals_scored", "goals_conceded", "points")),
+    ).outerjoin(
+        snapshot, snapshot.c.team_id == models.Team.id
+    ).filter(
+        models.Team.league == league, models.Team.season == season
+    ).order_by(*order)
+
+
+def team_positions(team_id: int):
+    """A team's place and points after each of its matches (position over time)."""
+    s = models.Standing
+    return select(s.matchday, s.date, s.match_id, s.position, s.points).filter(
+        s.team_id == team_id
+    ).order_by(s.matchday)
+
+
+def head_to_head(home_team_id: int, away_team_id: int):
+    """The precomputed outcome probabilities of one home/away pair (headtohead.py)."""
+    h = models.HeadToHead
+    return select(
+        h.league, h.season,
+        h.home_team_id, HomeTeam.name.label("home_team"),
+        h.away_team_id, AwayTeam.name.label("away_team"),
+        h.home_win, h.draw, h.away_win, h.home_xg, h.away_xg,
+    ).select_from(h).join(
+        HomeTeam, HomeTeam.id == h.home_team_id
+    ).join(
+        AwayTeam, AwayTeam.id == h.away_team_id
+    ).filter(h.home_team_id == home_team_id, h.away_team_id == away_team_id)
+
+
+def _match_view():
+    return select(
+        models.Match.id,
+        models.Match.date,
+        models.Match.home_team_id,
+        models.Match.status,
+        models.Match.home_score,
+        models.Match.away_score,
+        HomeTeam.name.label("home_name"),
+        HomeTeam.logo_url.label("home_logo"),
+        AwayTeam.name.label("away_name"),
+        AwayTeam.logo_url.label("away_logo"),
+        models.Prediction.id.label("prediction_id"),
+        models.Prediction.predicted_winner_id,
+        models.Prediction.is_draw_prediction,
+        models.Prediction.confidence_score,
+        models.Prediction.ai_generated_commentary,
+        models.Prediction.analysis_content,
+    ).join(
+        HomeTeam, HomeTeam.id == models.Match.home_team_id
+    ).join(
+        AwayTeam, AwayTeam.id == models.Match.away_team_id
+    ).outerjoin(
+        models.Prediction, models.Prediction.match_id == models.Match.id
+    )
+
+
+def upcoming_matches(limit: int = UPCOMING_LIMIT, league: str = leagues.DEFAULT_LEAGUE):
+    """Next fixtures (not finished) of a league with teams and prediction."""
+    return _match_view().filter(NOT_FINISHED, models.Match.league == league).order_by(models.Match.date).limit(limit)
+
+
+def match_detail(match_id: int):
+    """One match with teams and prediction."""
+    return _match_view().filter(models.Match.id == match_id)
+
+
+def match_list(status: str = None, team_id: int = None, date_from=None, date_to=None,
+               after=None, descending: bool = False, limit: int = 20,
+               league: str = None, season: int = None):
+    """
+    One page of matches ordered by (date, id), keyset-paginated: `after` is the
+    (date, id) of the last row of the previous page, so every page is an index
+    range read no matter how deep it is (no OFFSET). `league` and `season`
+    narrow it to one league / season.
+    """
+    stmt = _match_view()
+    if league is not None:
+        stmt = stmt.filter(models.Match.league == league)
+    if season is not None:
+        stmt = stmt.filter(models.Match.season == season)
+    if status == "upcoming":
+        stmt = stmt.filter(NOT_FINISHED)
+    elif status:
+        stmt = stmt.filter(models.Match.status == status)
+    if team_id is not None:
+        stmt = stmt.filter(or_(models.Match.home_team_id == team_id, models.Match.away_team_id == team_id))
+    if date_from is not None:
+        stmt = stmt.filter(models.Match.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.filter(models.Match.date < date_to)
+
+    key = tuple_(models.Match.date, models.Match.id)
+    if after is not None:
+        stmt = stmt.filter(key < tuple_(*after) if descending else key > tuple_(*after))
+    if descending:
+        return stmt.order_by(desc(models.Match.date), desc(models.Match.id)).limit(limit)
+    return stmt.order_by(models.Match.date, models.Match.id).limit(limit)
+
+
+def _leaders(rank):
+    return select(
+        rank.label("rank"),
+        models.PlayerRanking.value,
+        models.Player.id.label("player_id"),
+        models.Player.name,
+        models.Player.position,
+        models.Team.id.label("team_id"),
+        models.Team.name.label("team"),
+        models.Player.games,
+        models.Player.minutes,
+        models.Player.goals,
+        models.Player.assists,
+        models.Player.xg,
+        models.Player.xa,
+    ).join(
+        models.Player, models.Player.id == models.PlayerRanking.player_id
+    ).join(
+        models.Team, models.Team.id == models.PlayerRanking.team_id
+    )
+
+
+def top_players(league: str, season: int, metric: str, limit: int):
+    """A league season's top `limit` players by a metric (from the leaderboard index)."""
+    rank = models.PlayerRanking.league_rank
+    return _leaders(rank).filter(
+        models.PlayerRanking.league == league,
+        models.PlayerRanking.season == season,
+        models.PlayerRanking.metric == metric,
+        rank <= limit,
+    ).order_by(rank)
+
+
+def team_players(team_id: int, metric: str, limit: int):
+    """A team's top `limit` players by a metric (from the leaderboard index)."""
+    rank = models.PlayerRanking.team_rank
+    return _leaders(rank).filter(
+        models.PlayerRanking.team_id == team_id,
+        models.PlayerRanking.metric == metric,
+        rank <= limit,
+    ).order_by(rank)
+
+
+def team_dict(row) -> dict:
+    return dict(row._mapping)
+
+
+def player_dict(row) -> dict:
+    return dict(row._mapping)
+
+
+def position_dict(row) -> dict:
+    return {**row._mapping, "date": row.date.isoformat() if row.date else None}
+
+
+def prediction_dict(row) -> dict:
+    return {
+        **row._mapping,
+        **{name: round(getattr(row, name), 4) for name in ("home_win", "draw", "away_win")},
+        "home_xg": round(row.home_xg, 2),
+        "away_xg": round(row.away_xg, 2),
+    }
+
+
+def match_dict(row) -> dict:
+    """Response payload of a match row (same shape the React pages expect)."""
+    return {
+        "id": row.id,
+        "date": row.date.isoformat() if row.date else None,
+        "home_team": row.home_name,
+        "away_team": row.away_name,
+        "logo_home": row.home_logo,
+        "logo_away": row.away_logo,
+        "prediction": {
+            "winner": "Draw" if row.is_draw_prediction else (
+                row.home_name if row.predicted_winner_id == row.home_team_id else row.away_name
+            ),
+            "confidence": int(row.confidence_score * 100),
+            "ai_text": row.ai_generated_commentary,
+            "analysis_content": row.analysis_content
+        } if row.prediction_id is not None else None
+    }
+
+
+def match_list_item(row) -> dict:
+    """Listing entry: the match payload plus status and score."""
+    return {
+        **match_dict(row),
+        "status": row.status,
+        "home_score": row.home_score,
+        "away_score": row.away_score,
+    }
@@ -0,0 +1,48 @@
+"""
+Schema migrations (Alembic, see backend/migrations/).
+
+upgrade_schema() replaces the old create_all() call: it brings the database
+to the latest revision. Databases created by create_all() before migrations
+existed have no alembic_version table; they are stamped at the baseline
+revision first, so only the newer revisions run against them.
+
+In Kubernetes the migrations run in an init container (`python -m app.schema`)
+and the API process starts with SCHEMA_BOOTSTRAP=false, so it neither waits
+on the migration lock nor imports Alembic.
+"""
+
+import os
+
+from sqlalchemy import inspect
+
+from . import database
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_REVISION = "0001"
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    cfg = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    # Keep the app's logging setup (uvicorn) instead of alembic.ini's
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def upgrade_schema():
+    """Runs pending migrations (idempotent; safe on every start)."""
+    from alembic import command
+
+    cfg = alembic_config()
+    tables = inspect(database.engine).get_table_names()
+    if "teams" in tables and "alembic_version" not in tables:
+        print(">>> [DB] Schema created before migrations, stamping baseline revision")
+        command.stamp(cfg, BASELINE_REVISION)
+    command.upgrade(cfg, "head")
+
+
+if __name__ == "__main__":
+    upgrade_schema()
+    print(">>> [DB] Schema is up to date")
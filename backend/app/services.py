@@ -1,17 +1,18 @@
-import requests
 import json
 import random
+import hashlib
+from contextlib import contextmanager
 from sqlalchemy.orm import Session
-from . import models
+from . import models, database, headtohead, leaderboards, leagues, metrics, profiler, standings
 from datetime import datetime
 import time
 
 # --- CONFIGURATION ---
-SEASON_YEAR = "2025"
-JSON_API_URL = f"https://understat.com/getLeagueData/EPL/{SEASON_YEAR}"
-REFERER_URL = f"https://understat.com/league/EPL/{SEASON_YEAR}"
+# Understat endpoints; {league} is an Understat code (see leagues.py)
+JSON_API_URL = "https://understat.com/getLeagueData/{league}/{season}"
+REFERER_URL = "https://understat.com/league/{league}/{season}"
 
-def get_headers():
+def get_headers(league: str = leagues.DEFAULT_LEAGUE, season: int = leagues.CURRENT_SEASON):
     """
     Headers pretending to be user.
     """
@@ -23,188 +24,370 @@ def get_headers():
         "User-Agent": random.choice(user_agents),
         "Accept": "application/json, text/javascript, */*; q=0.01",
         "Accept-Language": "en-US,en;q=0.9",
-        "Connection": "keep-alive",
-        "Referer": REFERER_URL,
+        "Referer": REFERER_URL.format(league=league, season=season),
         "X-Requested-With": "XMLHttpRequest",
         "Sec-Fetch-Dest": "empty",
         "Sec-Fetch-Mode": "cors",
         "Sec-Fetch-Site": "same-origin"
     }
 
-def sync_fbref_data(db: Session):
+# Rows per INSERT statement; keeps bind parameters well below driver limits
+UPSERT_BATCH_SIZE = 500
+
+
+def _upsert(db: Session, model, rows, conflict_cols, update_cols, returning=None):
     """
-    Fetches data from Understat using a hidden JSON API.
+    Writes rows with batched INSERT ... ON CONFLICT DO UPDATE.
+    Returns the RETURNING rows (if requested) from all batches.
     """
-    print(f">>> [UNDERSTAT API] Fetching: {JSON_API_URL}")
-    
-    try:
-        response = requests.get(JSON_API_URL, headers=get_headers(), timeout=20)
-        
-        if response.status_code != 200:
-            print(f"!!! HTTP Error {response.status_code}")
-            print(f"Error content: {response.text[:200]}")
-            return {"status": "error", "message": f"API returned {response.status_code}"}
-        
+    insert_fn = database.dialect_insert(db)
+    returned = []
+    for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+        stmt = insert_fn(model).values(rows[i:i + UPSERT_BATCH_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_cols,
+            set_={col: stmt.excluded[col] for col in update_cols}
+        )
+        if returning is not None:
+            returned.extend(db.execute(stmt.returning(*returning)).all())
+        else:
+            db.execute(stmt)
+    return returned
+
+
+class _StageTimer:
+    """Collects wall-clock timings and row counts for each sync stage."""
+
+    def __init__(self, label: str = ""):
+        self.stages = {}
+        self.label = label
+
+    @contextmanager
+    def stage(self, name: str):
+        entry = {"rows": 0}
+        started = time.perf_counter()
         try:
-            data = response.json()
-        except json.JSONDecodeError:
-            print("!!! Error: Response is not valid JSON. Probably a WAF block.")
-            return {"status": "error", "message": "Invalid JSON response"}
-
-        matches_data = data.get("dates", [])
-        teams_data = data.get("teams", {})
-        players_data = data.get("players", [])
-
-        if not matches_data:
-            return {"status": "error", "message": "JSON fetched, but 'dates' list is empty."}
-
-        print(f">>> Success! Fetched {len(matches_data)} matches and {len(players_data)} players.")
-
-        team_cache = {} 
-
-        for u_id, t_info in teams_data.items():
-            u_id = int(u_id)
-            name = t_info['title']
-            
-            team = db.query(models.Team).filter(models.Team.external_id == u_id).first()
-            if not team:
-                team = models.Team(
-                    external_id=u_id,
-                    name=name,
-                    short_name=name[:3].upper()
+            yield entry
+        finally:
+            elapsed = time.perf_counter() - started
+            entry["seconds"] = round(elapsed, 4)
+            self.stages[name] = entry
+            metrics.observe_stage("sync", name, elapsed)
+            print(f">>> [SYNC] {self.label}{name}: {entry['rows']} rows in {entry['seconds']:.3f}s")
+
+
+def _parse_payload(data: dict):
+    """
+    Converts the raw Understat payload into plain row dicts keyed by external id.
+    The league table is derived from the stored matches (see standings.py).
+    """
+    teams = {}
+    for u_id, t_info in data.get("teams", {}).items():
+        teams[int(u_id)] = t_info['title']
+
+    matches = {}
+    for m in data.get("dates", []):
+        try:
+            is_finished = m.get('isResult', False)
+            h_id = int(m['h']['id'])
+            a_id = int(m['a']['id'])
+            teams.setdefault(h_id, m['h']['title'])
+            teams.setdefault(a_id, m['a']['title'])
+
+            matches[int(m['id'])] = {
+                "date": datetime.strptime(m['datetime'], "%Y-%m-%d %H:%M:%S"),
+                "home_ext": h_id,
+                "away_ext": a_id,
+                "home_score": int(m['goals']['h']) if is_finished else None,
+                "away_score": int(m['goals']['a']) if is_finished else None,
+                "status": "FINISHED" if is_finished else "SCHEDULED",
+                "home_xg": float(m['xG']['h']) if is_finished and m['xG']['h'] is not None else 0.0,
+                "away_xg": float(m['xG']['a']) if is_finished and m['xG']['a'] is not None else 0.0,
+            }
+        except Exception as e:
+            print(f"Skipping match {m.get('id')}: {e}")
+
+    players = {}
+    for p in data.get("players", []):
+        try:
+            players[int(p['id'])] = {
+                "name": p['player_name'],
+                "team_title": p['team_title'],
+                "position": p.get('position', 'Unknown'),
+                "games": int(p['games']),
+                "minutes": int(p.get('time', 0)),
+                "goals": int(p['goals']),
+                "assists": int(p['assists']),
+                "shots": int(p['shots']),
+                "xg": float(p['xG']),
+                "xa": float(p['xA']),
+            }
+        except Exception:
+            continue
+
+    return teams, matches, players
+
+
+def fetch_understat_payload(league: str = leagues.DEFAULT_LEAGUE, season: int = leagues.CURRENT_SEASON):
+    """
+    Downloads one league season from Understat (see ingest.fetch_one).
+    Returns (data, error_message); exactly one of them is None.
+    """
+    from . import ingest
+
+    return ingest.fetch_one(league, season)
+
+
+def fingerprint(obj) -> str:
+    """Stable content hash of a JSON-serializable object."""
+    raw = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _changed(stored: dict, kind: str, records: dict) -> dict:
+    """Returns {external_id: digest} for records whose digest differs from the stored one."""
+    known = stored.get(kind, {})
+    digests = {ext_id: fingerprint(record) for ext_id, record in records.items()}
+    return {ext_id: d for ext_id, d in digests.items() if known.get(ext_id) != d}
+
+
+def _empty_changes():
+    return {"teams": [], "matches": [], "players": [], "tables": [], "renamed": []}
+
+
+@profiler.profiled("sync_fbref_data")
+def sync_fbref_data(db: Session, force: bool = False):
+    """
+    Fetches and syncs the default league's current season (ingest.run syncs
+    every configured league and season concurrently).
+    """
+    started = time.perf_counter()
+    data, error = fetch_understat_payload()
+    metrics.observe_stage("sync", "fetch", time.perf_counter() - started)
+    if error:
+        return {"status": "error", "message": error}
+    result = sync_league(db, leagues.DEFAULT_LEAGUE, leagues.CURRENT_SEASON, data, force=force)
+    result["fetch_seconds"] = round(time.perf_counter() - started - result.get("seconds", 0.0), 4)
+    return result
+
+
+@profiler.profiled("sync_league")
+def sync_league(db: Session, league: str, season: int, data: dict, force: bool = False):
+    """
+    Writes one league season's Understat payload (fetched by the caller).
+
+    The payload is fingerprinted as a whole and per record (team, match,
+    player). An unchanged payload ends the sync after one hash comparison;
+    otherwise only records whose digest changed are written, as a staged,
+    set-based pipeline inside a single transaction (batched
+    INSERT ... ON CONFLICT DO UPDATE). Every row and fingerprint is keyed by
+    (league, season), so league seasons can be written in parallel, each in
+    its own session. Returns the change set as internal ids.
+    Pass force=True to ignore stored fingerprints and rewrite everything.
+    """
+    timer = _StageTimer(f"{league}/{season} ")
+    started = time.perf_counter()
+    scope = {"league": league, "season": season}
+    fp_scope = (models.SyncFingerprint.league == league, models.SyncFingerprint.season == season)
+
+    try:
+        if not data.get("dates"):
+            return {"status": "error", "message": "JSON fetched, but 'dates' list is empty.", **scope}
+
+        with timer.stage("fingerprint") as st:
+            payload_digest = fingerprint(data)
+            stored_payload = db.query(models.SyncFingerprint.digest).filter(
+                *fp_scope,
+                models.SyncFingerprint.kind == "payload",
+                models.SyncFingerprint.external_id == 0
+            ).scalar()
+            st["rows"] = 1
+
+        if not force and stored_payload == payload_digest:
+            print(f">>> [SYNC] {league}/{season} payload unchanged since last sync, nothing to do.")
+            return {
+                "status": "success", **scope, "processed": 0, "unchanged": True,
+                "changes": _empty_changes(), "stages": timer.stages,
+                "seconds": round(time.perf_counter() - started, 4),
+            }
+
+        with timer.stage("parse") as st:
+            teams, matches, players = _parse_payload(data)
+            st["rows"] = len(teams) + len(matches) + len(players)
+
+        print(f">>> Success! {league}/{season}: {len(matches)} matches and {len(players)} players.")
+
+        with timer.stage("diff") as st:
+            stored = {}
+            if not force:
+                for kind, ext_id, digest in db.query(
+                    models.SyncFingerprint.kind,
+                    models.SyncFingerprint.external_id,
+                    models.SyncFingerprint.digest
+                ).filter(*fp_scope, models.SyncFingerprint.kind != "payload").all():
+                    stored.setdefault(kind, {})[ext_id] = digest
+
+            team_records = {u_id: {"name": name} for u_id, name in teams.items()}
+            changed_teams = _changed(stored, "team", team_records)
+            changed_matches = _changed(stored, "match", matches)
+            changed_players = _changed(stored, "player", players)
+            st["rows"] = len(changed_teams) + len(changed_matches) + len(changed_players)
+
+        print(
+            f">>> [SYNC] {league}/{season} changed: {len(changed_teams)} teams, "
+            f"{len(changed_matches)} matches, {len(changed_players)} players"
+        )
+
+        with timer.stage("preload") as st:
+            team_ids = dict(db.query(models.Team.external_id, models.Team.id).filter_by(**scope).all())
+            existing_matches = dict(db.query(models.Match.external_id, models.Match.id).filter_by(**scope).all())
+            existing_players = {pid for (pid,) in db.query(models.Player.external_id).filter_by(**scope).all()}
+            st["rows"] = len(team_ids) + len(existing_matches) + len(existing_players)
+
+        with timer.stage("teams") as st:
+            team_rows = [
+                {
+                    "external_id": u_id, **scope,
+                    "name": teams[u_id], "short_name": teams[u_id][:3].upper()
+                }
+                for u_id in changed_teams
+            ]
+            returned = _upsert(
+                db, models.Team, team_rows, ["league", "season", "external_id"],
+                ["name"],
+                returning=(models.Team.external_id, models.Team.id)
+            ) if team_rows else []
+            # Cached views embedding the old names go stale
+            renamed = [team_ids[u_id] for u_id in changed_teams if u_id in team_ids]
+            team_ids.update(returned)
+            st["rows"] = len(team_rows)
+
+        with timer.stage("matches") as st:
+            match_rows = [
+                {
+                    "external_id": u_match_id, **scope,
+                    "date": matches[u_match_id]["date"],
+                    "home_team_id": team_ids[matches[u_match_id]["home_ext"]],
+                    "away_team_id": team_ids[matches[u_match_id]["away_ext"]],
+                    "home_score": matches[u_match_id]["home_score"],
+                    "away_score": matches[u_match_id]["away_score"],
+                    "status": matches[u_match_id]["status"],
+                }
+                for u_match_id in changed_matches
+            ]
+            returned = _upsert(
+                db, models.Match, match_rows, ["external_id"],
+                ["date", "home_score", "away_score", "status"],
+                returning=(models.Match.external_id, models.Match.id)
+            ) if match_rows else []
+            match_ids = dict(returned)
+            st["rows"] = len(match_rows)
+
+        with timer.stage("match_stats") as st:
+            stat_rows = [
+                {
+                    "match_id": match_ids[u_match_id],
+                    "home_xg": matches[u_match_id]["home_xg"],
+                    "away_xg": matches[u_match_id]["away_xg"],
+                }
+                for u_match_id in changed_matches
+                if matches[u_match_id]["status"] == "FINISHED"
+            ]
+            if stat_rows:
+                _upsert(db, models.MatchStat, stat_rows, ["match_id"], ["home_xg", "away_xg"])
+            st["rows"] = len(stat_rows)
+
+        with timer.stage("standings") as st:
+            st["rows"], standing_teams = standings.update_snapshots(db, league, season, match_ids.values())
+            if standing_teams or changed_teams:
+                standings.refresh_table(db, league, season)
+
+        with timer.stage("head_to_head") as st:
+            if standing_teams or changed_teams:
+                st["rows"] = headtohead.rebuild(db, league, season)
+
+        with timer.stage("players") as st:
+            team_ids_by_name = {name: team_ids[u_id] for u_id, name in teams.items()}
+            player_rows = [
+                {
+                    "external_id": ext_pid, **scope,
+                    "name": players[ext_pid]["name"],
+                    "team_id": team_ids_by_name[players[ext_pid]["team_title"]],
+                    "position": players[ext_pid]["position"],
+                    "games": players[ext_pid]["games"], "minutes": players[ext_pid]["minutes"],
+                    "goals": players[ext_pid]["goals"],
+                    "assists": players[ext_pid]["assists"], "shots": players[ext_pid]["shots"],
+                    "xg": players[ext_pid]["xg"], "xa": players[ext_pid]["xa"],
+                }
+                for ext_pid in changed_players
+                if players[ext_pid]["team_title"] in team_ids_by_name
+            ]
+            returned = []
+            if player_rows:
+                print(f">>> Updating {len(player_rows)} players ({league}/{season})...")
+                returned = _upsert(
+                    db, models.Player, player_rows, ["league", "season", "external_id"],
+                    # A transfer or a corrected name moves the row too
+                    ["name", "team_id", "position", "games", "minutes", "goals", "assists", "shots", "xg", "xa"],
+                    returning=(models.Player.id,)
                 )
-                db.add(team)
-                db.commit()
-                db.refresh(team)
-            
-            team.matches_played = 0
-            team.wins = 0; team.draws = 0; team.loses = 0
-            team.goals_scored = 0; team.goals_conceded = 0
-            team.points = 0
-            
-            team_cache[u_id] = team
-
-        count_new = 0
-        count_updated = 0
-        
-        for m in matches_data:
-            try:
-                
-                u_match_id = int(m['id'])
-                date_str = m['datetime']
-                match_date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                is_finished = m.get('isResult', False)
-                status = "FINISHED" if is_finished else "SCHEDULED"
-
-                h_id = int(m['h']['id'])
-                a_id = int(m['a']['id'])
-                
-                home_team = team_cache.get(h_id)
-                away_team = team_cache.get(a_id)
-                
-                if not home_team:
-                    ht_name = m['h']['title']
-                    home_team = models.Team(external_id=h_id, name=ht_name, short_name=ht_name[:3].upper())
-                    db.add(home_team); db.commit(); db.refresh(home_team)
-                    team_cache[h_id] = home_team
-                    
-                if not away_team:
-                    at_name = m['a']['title']
-                    away_team = models.Team(external_id=a_id, name=at_name, short_name=at_name[:3].upper())
-                    db.add(away_team); db.commit(); db.refresh(away_team)
-                    team_cache[a_id] = away_team
-
-                goals_h = int(m['goals']['h']) if is_finished else None
-                goals_a = int(m['goals']['a']) if is_finished else None
-                xg_h = float(m['xG']['h']) if is_finished and m['xG']['h'] is not None else 0.0
-                xg_a = float(m['xG']['a']) if is_finished and m['xG']['a'] is not None else 0.0
-
-                if is_finished:
-                    home_team.matches_played += 1; away_team.matches_played += 1
-                    home_team.goals_scored += goals_h; home_team.goals_conceded += goals_a
-                    away_team.goals_scored += goals_a; away_team.goals_conceded += goals_h
-                    home_team.xg_for += xg_h; home_team.xg_against += xg_a
-                    away_team.xg_for += xg_a; away_team.xg_against += xg_h
-                    
-                    if goals_h > goals_a:
-                        home_team.wins += 1; home_team.points += 3; away_team.loses += 1
-                    elif goals_a > goals_h:
-                        away_team.wins += 1; away_team.points += 3; home_team.loses += 1
-                    else:
-                        home_team.draws += 1; home_team.points += 1; away_team.draws += 1; away_team.points += 1
-
-                existing = db.query(models.Match).filter(models.Match.external_id == u_match_id).first()
-                
-                if not existing:
-                    new_match = models.Match(
-                        external_id=u_match_id, date=match_date,
-                        home_team_id=home_team.id, away_team_id=away_team.id,
-                        home_score=goals_h, away_score=goals_a, status=status
-                    )
-                    db.add(new_match)
-                    db.commit()
-                    if is_finished:
-                        db.add(models.MatchStat(match_id=new_match.id, home_xg=xg_h, away_xg=xg_a))
-                    count_new += 1
-                else:
-                    if is_finished:
-                        existing.home_score = goals_h
-                        existing.away_score = goals_a
-                        existing.status = status
-                        stat = db.query(models.MatchStat).filter(models.MatchStat.match_id == existing.id).first()
-                        if not stat:
-                            db.add(models.MatchStat(match_id=existing.id, home_xg=xg_h, away_xg=xg_a))
-                        else:
-                            stat.home_xg = xg_h; stat.away_xg = xg_a
-                        count_updated += 1
-            
-            except Exception as e:
-                print(f"Skipping match {m.get('id')}: {e}")
-                continue
-        
-        db.commit()
-
-        if players_data:
-            print(f">>> Updating {len(players_data)} players...")
-            for p in players_data:
-                try:
-                    t_title = p['team_title']
-                    team_id = None
-                    
-                    for tid, tobj in team_cache.items():
-                        if tobj.name == t_title:
-                            team_id = tobj.id
-                            break
-                    
-                    if not team_id: continue
-
-                    ext_pid = int(p['id'])
-                    player = db.query(models.Player).filter(models.Player.external_id == ext_pid).first()
-                    
-                    if not player:
-                        player = models.Player(
-                            external_id=ext_pid, 
-                            name=p['player_name'], 
-                            team_id=team_id, 
-                            position=p.get('position', 'Unknown')
-                        )
-                        db.add(player)
-                    
-                    player.games = int(p['games'])
-                    player.goals = int(p['goals'])
-                    player.assists = int(p['assists'])
-                    player.shots = int(p['shots'])
-                    player.xg = float(p['xG'])
-                    player.xa = float(p['xA'])
-                    
-                except Exception: continue
+            player_ids = [pid for (pid,) in returned]
+            st["rows"] = len(player_rows)
+
+        with timer.stage("rankings") as st:
+            if player_rows:
+                st["rows"] = leaderboards.rebuild(db, league, season)
+
+        with timer.stage("fingerprints") as st:
+            written_players = {r["external_id"] for r in player_rows}
+            fingerprint_rows = [
+                {**scope, **row} for row in (
+                    [{"kind": "payload", "external_id": 0, "digest": payload_digest}]
+                    + [{"kind": "team", "external_id": k, "digest": d} for k, d in changed_teams.items()]
+                    + [{"kind": "match", "external_id": k, "digest": d} for k, d in changed_matches.items()]
+                    + [
+                        {"kind": "player", "external_id": k, "digest": d}
+                        for k, d in changed_players.items() if k in written_players
+                    ]
+                )
+            ]
+            _upsert(
+                db, models.SyncFingerprint, fingerprint_rows,
+                ["league", "season", "kind", "external_id"], ["digest"]
+            )
+            st["rows"] = len(fingerprint_rows)
+
+        with timer.stage("commit"):
             db.commit()
 
-        return {"status": "success", "processed": count_new + count_updated}
+        count_new = sum(1 for u_match_id in changed_matches if u_match_id not in existing_matches)
+
+        return {
+            "status": "success",
+            **scope,
+            "processed": len(match_rows),
+            "unchanged": False,
+            "new_matches": count_new,
+            "new_players": sum(1 for r in player_rows if r["external_id"] not in existing_players),
+            "changes": {
+                "teams": sorted(standing_teams | {team_ids[u_id] for u_id in changed_teams}),
+                "matches": sorted(match_ids.values()),
+                "players": sorted(player_ids),
+                # League seasons whose table changed
+                "tables": [[league, season]] if standing_teams or changed_teams else [],
+                "renamed": sorted(renamed),
+            },
+            "stages": timer.stages,
+            "seconds": round(time.perf_counter() - started, 4),
+            "db_seconds": round(sum(
+                s["seconds"] for name, s in timer.stages.items() if name not in ("parse", "diff")
+            ), 4),
+        }
 
     except Exception as e:
-        print(f"!!! CRITICAL: {e}")
-        return {"status": "error", "message": str(e)}
+        db.rollback()
+        print(f"!!! CRITICAL ({league}/{season}): {e}")
+        return {"status": "error", "message": str(e), **scope}
 
 def update_team_logos(db):
     print(">>> Updating logos...")
@@ -0,0 +1,214 @@
+"""
+Monte Carlo season simulator (GET /simulation).
+
+The remaining fixtures of a league season are played SIMULATION_SEASONS
+times. Each team's attack and defense strength is the blend analysis.py
+scores fixtures with, (goals + xG) / 2 per match for and against, over the
+whole season and shrunk towards the league average by SIMULATION_PRIOR_MATCHES
+average matches, so a team with three games played is not an outlier. A
+fixture's goals are Poisson draws with means
+    home: league_avg * attack[home] * defense[away] * sqrt(home_advantage)
+    away: league_avg * attack[away] * defense[home] / sqrt(home_advantage)
+
+A run is vectorized per chunk of SIMULATION_CHUNK seasons: one
+(seasons x fixtures) Poisson draw per side, points / goal difference / goals
+per team through fixture-team incidence matrices, and one argsort for the final
+tables (points, goal difference, goals scored, then a random draw). Runs of
+at least SIMULATION_POOL_MIN seasons are split across SIMULATION_PROCESSES
+worker processes (one pool, kept for the life of the API process), each
+chunk with its own seed, so results do not depend on how the chunks were
+scheduled.
+
+run() stores the expected points as Team.xpts. Its result is cached in the
+"simulation" family until the next sync changes the table (views.py).
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import metrics, models, queries
+
+SEASONS = int(os.getenv("SIMULATION_SEASONS", "100000"))
+CHUNK = int(os.getenv("SIMULATION_CHUNK", "5000"))
+PROCESSES = int(os.getenv("SIMULATION_PROCESSES", "0")) or min(os.cpu_count() or 1, 4)
+POOL_MIN = int(os.getenv("SIMULATION_POOL_MIN", "20000"))
+# Optional, for reproducible runs
+SEED = int(os.getenv("SIMULATION_SEED")) if os.getenv("SIMULATION_SEED") else None
+
+HOME_ADVANTAGE = float(os.getenv("SIMULATION_HOME_ADVANTAGE", "1.2"))
+PRIOR_MATCHES = float(os.getenv("SIMULATION_PRIOR_MATCHES", "5"))
+# Goals per team per match before anything is played
+DEFAULT_GOALS = 1.35
+
+TOP_SPOTS = 4
+RELEGATION_SPOTS = int(os.getenv("SIMULATION_RELEGATION_SPOTS", "3"))
+
+# Started on the first large run and kept, so later runs skip the worker start-up
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the API process has threads (Redis listener, job workers)
+            _pool = ProcessPoolExecutor(max_workers=PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def strengths(teams) -> tuple:
+    """
+    (attack, defense, league_avg) of a league season's teams: (goals + xG) / 2
+    per match, relative to the league average, shrunk by PRIOR_MATCHES.
+    """
+    played = np.array([t.matches_played for t in teams], dtype=np.float64)
+    scored = np.array([(t.goals_scored + t.xg_for) / 2 for t in teams], dtype=np.float64)
+    conceded = np.array([(t.goals_conceded + t.xg_against) / 2 for t in teams], dtype=np.float64)
+    league_avg = scored.sum() / played.sum() if played.sum() else DEFAULT_GOALS
+    prior = PRIOR_MATCHES * league_avg
+    attack = (scored + prior) / (played + PRIOR_MATCHES) / league_avg
+    defense = (conceded + prior) / (played + PRIOR_MATCHES) / league_avg
+    return attack, defense, league_avg
+
+
+def _simulate_chunk(args) -> tuple:
+    """Plays `seasons` seasons; returns (sum of final points, final position counts [team, position])."""
+    lam_home, lam_away, home, away, points, goal_diff, goals, seasons, seed = args
+    rng = np.random.default_rng(seed)
+    n_teams, n_fixtures = len(points), len(home)
+
+    # Float incidence matrices: exact for these counts and the products run on BLAS
+    home_matrix = np.zeros((n_fixtures, n_teams))
+    home_matrix[np.arange(n_fixtures), home] = 1
+    away_matrix = np.zeros((n_fixtures, n_teams))
+    away_matrix[np.arange(n_fixtures), away] = 1
+
+    home_goals = rng.poisson(lam_home, size=(seasons, n_fixtures)).astype(np.float64)
+    away_goals = rng.poisson(lam_away, size=(seasons, n_fixtures)).astype(np.float64)
+    margin = home_goals - away_goals
+    draw = margin == 0
+
+    final_points = points + (3.0 * (margin > 0) + draw) @ home_matrix + (3.0 * (margin < 0) + draw) @ away_matrix
+    final_goals = goals + home_goals @ home_matrix + away_goals @ away_matrix
+    final_diff = goal_diff + margin @ (home_matrix - away_matrix)
+
+    # One sortable number per team and season; the random part breaks exact ties
+    key = (final_points * 4096 + final_diff + 2048) * 4096 + final_goals
+    order = np.argsort(-(key + rng.random(key.shape)), axis=1)
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.broadcast_to(np.arange(n_teams), order.shape), axis=1)
+
+    counts = np.bincount(
+        (np.arange(n_teams) * n_teams + positions).ravel(), minlength=n_teams * n_teams
+    ).reshape(n_teams, n_teams)
+    return final_points.sum(axis=0), counts
+
+
+def simulate(attack, defense, league_avg, home, away, points, goal_diff, goals, seasons: int, seed=None) -> tuple:
+    """
+    Simulates the remaining fixtures (`home` / `away`: team positions) from
+    the current points, goal difference and goals. Returns (expected points,
+    position probabilities [team, position], processes used).
+    """
+    advantage = np.sqrt(HOME_ADVANTAGE)
+    lam_home = league_avg * attack[home] * defense[away] * advantage
+    lam_away = league_avg * attack[away] * defense[home] / advantage
+
+    sizes = [CHUNK] * (seasons // CHUNK) + ([seasons % CHUNK] if seasons % CHUNK else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(lam_home, lam_away, home, away, points, goal_diff, goals, size, s) for size, s in zip(sizes, seeds)]
+
+    processes = min(PROCESSES, len(tasks)) if seasons >= POOL_MIN else 1
+    if processes > 1:
+        results = list(_get_pool().map(_simulate_chunk, tasks))
+    else:
+        results = [_simulate_chunk(task) for task in tasks]
+
+    total_points = sum(r[0] for r in results)
+    counts = sum(r[1] for r in results)
+    return total_points / seasons, counts / seasons, processes
+
+
+def run(db: Session, league: str, season: int, seasons: int = SEASONS) -> dict:
+    """Simulates a league season's remaining fixtures and stores Team.xpts. Returns the projections."""
+    started = time.perf_counter()
+    teams = db.execute(
+        select(
+            models.Team.id, models.Team.name, models.Team.position, models.Team.matches_played,
+            models.Team.points, models.Team.goals_scored, models.Team.goals_conceded,
+            models.Team.xg_for, models.Team.xg_against,
+        ).filter(models.Team.league == league, models.Team.season == season).order_by(models.Team.id)
+    ).all()
+    if not teams:
+        return {"league": league, "season": season, "seasons": 0, "remaining_fixtures": 0, "teams": []}
+
+    index = {t.id: i for i, t in enumerate(teams)}
+    fixtures = db.execute(
+        select(models.Match.home_team_id, models.Match.away_team_id).filter(
+            queries.NOT_FINISHED, models.Match.league == league, models.Match.season == season
+        )
+    ).all()
+    home = np.array([index[f.home_team_id] for f in fixtures], dtype=np.int64)
+    away = np.array([index[f.away_team_id] for f in fixtures], dtype=np.int64)
+    points = np.array([t.points for t in teams], dtype=np.int64)
+    goals = np.array([t.goals_scored for t in teams], dtype=np.int64)
+    goal_diff = goals - np.array([t.goals_conceded for t in teams], dtype=np.int64)
+
+    attack, defense, league_avg = strengths(teams)
+    with metrics.stage("simulation", "simulate"):
+        xpts, probabilities, processes = simulate(
+            attack, defense, league_avg, home, away, points, goal_diff, goals, seasons, SEED
+        )
+
+    with metrics.stage("simulation", "write"):
+        db.execute(update(models.Team), [{"id": t.id, "xpts": float(xpts[i])} for i, t in enumerate(teams)])
+        db.commit()
+
+    n_teams = len(teams)
+    places = np.arange(1, n_teams + 1)
+    projections = [
+        {
+            "team_id": t.id,
+            "name": t.name,
+            "points": t.points,
+            "position": t.position,
+            "xpts": round(float(xpts[i]), 2),
+            "expected_position": round(float(probabilities[i] @ places), 2),
+            "title": round(float(probabilities[i, 0]), 4),
+            "top4": round(float(probabilities[i, :TOP_SPOTS].sum()), 4),
+            "relegation": round(float(probabilities[i, n_teams - RELEGATION_SPOTS:].sum()), 4),
+            "positions": [round(float(p), 4) for p in probabilities[i]],
+        }
+        for i, t in enumerate(teams)
+    ]
+    projections.sort(key=lambda p: (-p["xpts"], p["expected_position"]))
+    seconds = round(time.perf_counter() - started, 4)
+    print(
+        f">>> [SIM] {league}/{season}: {seasons} seasons of {len(fixtures)} fixtures "
+        f"on {processes} processes in {seconds}s"
+    )
+    return {
+        "league": league,
+        "season": season,
+        "seasons": seasons,
+        "remaining_fixtures": len(fixtures),
+        "processes": processes,
+        "seconds": seconds,
+        "teams": projections,
+    }
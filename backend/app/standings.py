@@ -0,0 +1,179 @@
+"""
+League standings derived from match results.
+
+refresh_table() recomputes a league season's table (the counters and
+position on the teams rows, which /table reads) from its finished matches
+with one aggregate UPDATE ... FROM.
+
+Snapshots (table `standings`) hold each team's cumulative record after each
+of its finished matches: matchday N is a team's N-th match. The table as of
+matchday N takes every team's latest row up to N, as of a date the latest
+row played by the end of that day (queries.table_as_of). Each row also
+stores the team's position in the table as of its matchday, which is what
+/teams/{id}/positions charts.
+
+update_snapshots() keeps the snapshots current incrementally: the rows
+dated on or after the earliest result a sync wrote are dropped, those
+matches are replayed from each team's last kept row, and positions are
+re-ranked from the first affected matchday on. Both run inside the sync
+transaction (services.sync_league).
+"""
+
+from sqlalchemy import case, func, insert, select, union_all, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+Match = models.Match
+MatchStat = models.MatchStat
+Team = models.Team
+Standing = models.Standing
+
+# Cumulative counters of a snapshot row (named as on the teams rows)
+COUNTERS = ("wins", "draws", "loses", "goals_scored", "goals_conceded", "points", "xg_for", "xg_against")
+EMPTY = {"matchday": 0, "position": None, **{c: 0 for c in COUNTERS}}
+
+
+def _finished(league: str, season: int):
+    return select(
+        Match.id, Match.date, Match.home_team_id, Match.away_team_id, Match.home_score, Match.away_score,
+        func.coalesce(MatchStat.home_xg, 0.0).label("home_xg"),
+        func.coalesce(MatchStat.away_xg, 0.0).label("away_xg"),
+    ).outerjoin(
+        MatchStat, MatchStat.match_id == Match.id
+    ).filter(Match.league == league, Match.season == season, Match.status == "FINISHED")
+
+
+def refresh_table(db: Session, league: str, season: int) -> int:
+    """Rewrites the table of a league season's teams from its finished matches (caller commits)."""
+    m = _finished(league, season).subquery().c
+    # One row per team per match: goals and xG for and against
+    games = union_all(
+        select(m.home_team_id.label("team_id"), m.home_score.label("gf"), m.away_score.label("ga"),
+               m.home_xg.label("xgf"), m.away_xg.label("xga")),
+        select(m.away_team_id, m.away_score, m.home_score, m.away_xg, m.home_xg),
+    ).subquery()
+    g = games.c
+
+    def total(value, default=0):
+        return func.coalesce(func.sum(value), default)
+
+    goals_for, goals_against = total(g.gf), total(g.ga)
+    points = total(case((g.gf > g.ga, 3), (g.gf == g.ga, 1), else_=0))
+    totals = select(
+        Team.id.label("team_id"),
+        func.count(g.team_id).label("matches_played"),
+        total(case((g.gf > g.ga, 1), else_=0)).label("wins"),
+        total(case((g.gf == g.ga, 1), else_=0)).label("draws"),
+        total(case((g.gf < g.ga, 1), else_=0)).label("loses"),
+        goals_for.label("goals_scored"),
+        goals_against.label("goals_conceded"),
+        points.label("points"),
+        total(g.xgf, 0.0).label("xg_for"),
+        total(g.xga, 0.0).label("xg_against"),
+        func.row_number().over(
+            order_by=(points.desc(), (goals_for - goals_against).desc(), goals_for.desc(), Team.id)
+        ).label("position"),
+    ).select_from(Team).outerjoin(
+        games, g.team_id == Team.id
+    ).filter(Team.league == league, Team.season == season).group_by(Team.id).subquery()
+
+    columns = ("matches_played",) + COUNTERS + ("position",)
+    stmt = update(Team).where(Team.id == totals.c.team_id).values({c: totals.c[c] for c in columns})
+    return db.execute(stmt, execution_options={"synchronize_session": False}).rowcount
+
+
+def _sort_key(row) -> tuple:
+    # Points, goal difference, goals scored; team id keeps the order stable
+    return (-row["points"], row["goals_conceded"] - row["goals_scored"], -row["goals_scored"], row["team_id"])
+
+
+def _rank(rows, team_ids, first: int) -> list:
+    """
+    Sets the position of the rows from matchday `first` on and returns the
+    rows whose position changed. Teams that have played fewer matches count
+    with their latest row.
+    """
+    by_matchday = {}
+    for row in rows:
+        by_matchday.setdefault(row["matchday"], []).append(row)
+    current = {team_id: {**EMPTY, "team_id": team_id} for team_id in team_ids}
+    changed = []
+    for matchday in sorted(by_matchday):
+        for row in by_matchday[matchday]:
+            current[row["team_id"]] = row
+        if matchday < first:
+            continue
+        places = {r["team_id"]: place for place, r in enumerate(sorted(current.values(), key=_sort_key), 1)}
+        for row in by_matchday[matchday]:
+            if row["position"] != places[row["team_id"]]:
+                row["position"] = places[row["team_id"]]
+                changed.append(row)
+    return changed
+
+
+def update_snapshots(db: Session, league: str, season: int, match_ids) -> tuple:
+    """
+    Brings a league season's snapshots up to date after the sync wrote
+    `match_ids` (caller commits). Returns (rows written, ids of the teams
+    whose snapshots were replayed).
+    """
+    match_ids = list(match_ids)
+    if not match_ids:
+        return 0, set()
+    scope = (Standing.league == league, Standing.season == season)
+    # The earliest affected result: a written finished match, or the old
+    # date of one that is already in the snapshots (moved or no longer finished)
+    since = [
+        db.scalar(select(func.min(Match.date)).filter(Match.id.in_(match_ids), Match.status == "FINISHED")),
+        db.scalar(select(func.min(Standing.date)).filter(Standing.match_id.in_(match_ids))),
+    ]
+    since = min((d for d in since if d is not None), default=None)
+    if since is None:
+        return 0, set()
+
+    dropped = dict(db.execute(
+        select(Standing.team_id, func.min(Standing.matchday)).filter(*scope, Standing.date >= since).group_by(Standing.team_id)
+    ).all())
+    db.query(Standing).filter(*scope, Standing.date >= since).delete(synchronize_session=False)
+    kept = [dict(row._mapping) for row in db.execute(
+        select(Standing.id, Standing.team_id, Standing.matchday, Standing.position, *(getattr(Standing, c) for c in COUNTERS))
+        .filter(*scope).order_by(Standing.matchday)
+    )]
+
+    latest = {row["team_id"]: row for row in kept}
+    added = []
+    for m in db.execute(_finished(league, season).filter(Match.date >= since).order_by(Match.date, Match.id)):
+        for team_id, gf, ga, xgf, xga in (
+            (m.home_team_id, m.home_score, m.away_score, m.home_xg, m.away_xg),
+            (m.away_team_id, m.away_score, m.home_score, m.away_xg, m.home_xg),
+        ):
+            prev = latest.get(team_id, EMPTY)
+            row = {
+                "league": league, "season": season, "team_id": team_id, "match_id": m.id, "date": m.date,
+                "matchday": prev["matchday"] + 1, "position": None,
+                "wins": prev["wins"] + (gf > ga),
+                "draws": prev["draws"] + (gf == ga),
+                "loses": prev["loses"] + (gf < ga),
+                "goals_scored": prev["goals_scored"] + gf,
+                "goals_conceded": prev["goals_conceded"] + ga,
+                "points": prev["points"] + (3 if gf > ga else int(gf == ga)),
+                "xg_for": prev["xg_for"] + xgf,
+                "xg_against": prev["xg_against"] + xga,
+            }
+            latest[team_id] = row
+            added.append(row)
+
+    firsts = list(dropped.values()) + [row["matchday"] for row in added]
+    if not firsts:
+        return 0, set()
+    team_ids = db.scalars(select(Team.id).filter(Team.league == league, Team.season == season)).all()
+    moved = [
+        {"id": row["id"], "position": row["position"]}
+        for row in _rank(kept + added, team_ids, min(firsts)) if "id" in row
+    ]
+    if added:
+        db.execute(insert(Standing), added)
+    if moved:
+        db.execute(update(Standing), moved)
+    return len(added) + len(moved), set(dropped) | {row["team_id"] for row in added}
@@ -0,0 +1,160 @@
+"""
+Boot phases, connection pre-warming and the readiness check.
+
+A pod added by HPA / KEDA during a spike should only get traffic once it can
+answer fast: the database and Redis are reachable, their pools hold open
+connections and the hot views are in the cache. /health only says that the
+process is alive (liveness probe); /ready runs these checks (readiness).
+
+Boot phases are seconds since the process started (interpreter and uvicorn
+startup included). They are printed as [Boot] lines and returned by /ready:
+    imports      app modules imported
+    schema       migrations run, or skipped with SCHEMA_BOOTSTRAP=false
+    app          routes registered (end of the app.main import)
+    pools        database and Redis connections opened (startup event)
+    cache_warm   startup cache warm finished (see warmer.py)
+    ready        first successful readiness check
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+from . import cache, database, warmer
+
+PHASES = ("imports", "schema", "app", "pools", "cache_warm", "ready")
+
+
+def _process_started() -> float:
+    """perf_counter() value at process start (from /proc on Linux; else now)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.perf_counter() - max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter()
+
+
+BOOT_STARTED = _process_started()
+
+# Run the migrations on import of app.main; the Helm chart sets this to false
+# and runs `python -m app.schema` in an init container instead
+SCHEMA_BOOTSTRAP = os.getenv("SCHEMA_BOOTSTRAP", "true").lower() == "true"
+# Connections opened per database pool before the pod takes traffic
+POOL_WARM_SIZE = int(os.getenv("DB_POOL_WARM_SIZE", "5"))
+# Without Redis the API still works (uncached), so this can be relaxed
+READY_REQUIRE_REDIS = os.getenv("READY_REQUIRE_REDIS", "true").lower() == "true"
+# Report ready without a finished cache warm after this many seconds of boot
+READY_WARM_TIMEOUT = float(os.getenv("READY_WARM_TIMEOUT", "30"))
+
+_lock = threading.Lock()
+_phases = {}
+
+
+def mark(phase: str):
+    """Records the first time a boot phase is reached."""
+    with _lock:
+        if phase in _phases:
+            return
+        _phases[phase] = round(time.perf_counter() - BOOT_STARTED, 4)
+    print(f"[Boot] {phase} after {_phases[phase]}s")
+
+
+def phases() -> dict:
+    with _lock:
+        return dict(_phases)
+
+
+def _warm_size(pool) -> int:
+    # Connections above the pool size would be closed again on return
+    size = getattr(pool, "size", None)
+    return min(POOL_WARM_SIZE, size()) if callable(size) else min(POOL_WARM_SIZE, 1)
+
+
+def warm_pools() -> dict:
+    """Opens the sync engine's pool connections and the Redis clients."""
+    connections = []
+    try:
+        for _ in range(_warm_size(database.engine.pool)):
+            conn = database.engine.connect()
+            connections.append(conn)
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"[Boot] Database pool warm failed: {e}")
+    finally:
+        for conn in connections:
+            conn.close()
+
+    redis_ok = False
+    try:
+        binary = cache.get_binary_client()
+        redis_ok = binary is not None and binary.ping()
+    except Exception as e:
+        print(f"[Boot] Redis warm failed: {e}")
+    return {"db_connections": len(connections), "redis": bool(redis_ok)}
+
+
+async def awarm_pools() -> dict:
+    """Same for the async engine and the redis.asyncio pool."""
+    engine = database.get_async_engine()
+    connections = []
+    try:
+        for _ in range(_warm_size(engine.sync_engine.pool)):
+            conn = await engine.connect()
+            connections.append(conn)
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"[Boot] Async database pool warm failed: {e}")
+    finally:
+        for conn in connections:
+            await conn.close()
+
+    redis_ok = False
+    client = cache.get_async_redis()
+    if client is not None:
+        try:
+            redis_ok = await client.ping()
+        except Exception as e:
+            print(f"[Boot] Async Redis warm failed: {e}")
+    return {"db_connections": len(connections), "redis": bool(redis_ok)}
+
+
+def check_ready():
+    """Returns (ready, report) for the readiness probe."""
+    checks = {}
+    try:
+        with database.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
+
+    if not cache.CACHE_ENABLED:
+        checks["redis"] = "disabled"
+    else:
+        client = cache.get_redis_client()
+        try:
+            checks["redis"] = "ok" if client is not None and client.ping() else "unavailable"
+        except Exception as e:
+            checks["redis"] = f"error: {e}"
+
+    if warmer.startup_warmed():
+        checks["cache_warm"] = "ok"
+    elif time.perf_counter() - BOOT_STARTED > READY_WARM_TIMEOUT:
+        checks["cache_warm"] = "timeout"
+    else:
+        checks["cache_warm"] = "warming"
+
+    ready = (
+        checks["database"] == "ok"
+        and (checks["redis"] in ("ok", "disabled") or not READY_REQUIRE_REDIS)
+        and checks["cache_warm"] != "warming"
+        and "pools" in _phases
+    )
+    if ready:
+        mark("ready")
+    return ready, {"status": "ready" if ready else "not_ready", "checks": checks, "boot": phases()}
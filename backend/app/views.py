@@ -0,0 +1,210 @@
+"""
+Cached API views: their cache keys and the builders that produce them.
+
+Each builder opens its own session, so it can run on a request's cache miss,
+in a background stale-while-revalidate refresh or in the cache warmer. The
+async builders return the serialized body for cache.aget_or_build().
+"""
+
+import os
+
+from fastapi import HTTPException
+
+from . import cache, database, leagues, models, queries, simulation
+
+
+def table_key(league: str, season: int) -> str:
+    return f"table:{league}:{season}"
+
+
+# The default league season (see leagues.py)
+TABLE_KEY = table_key(leagues.DEFAULT_LEAGUE, leagues.CURRENT_SEASON)
+UPCOMING_KEY = "matches:upcoming"
+# Season simulations are only invalidated (or re-run) by a sync that changes the table
+SIMULATION_TTL = int(os.getenv("SIMULATION_CACHE_TTL", "86400"))
+
+
+def detail_key(match_id: int) -> str:
+    return f"matches:detail:{match_id}"
+
+
+def top_players_key(league: str, season: int, metric: str, limit: int) -> str:
+    return f"players:top:{league}:{season}:{metric}:{limit}"
+
+
+def team_players_key(team_id: int, metric: str, limit: int) -> str:
+    return f"players:team:{team_id}:{metric}:{limit}"
+
+
+def table_as_of_key(league: str, season: int, matchday: int = None, day=None) -> str:
+    as_of = f"md{matchday}" if matchday is not None else day.isoformat()
+    return f"standings:{league}:{season}:{as_of}"
+
+
+def positions_key(team_id: int) -> str:
+    return f"standings:team:{team_id}"
+
+
+def simulation_key(league: str, season: int) -> str:
+    return f"simulation:{league}:{season}"
+
+
+def predict_key(home_team_id: int, away_team_id: int) -> str:
+    return f"predict:{home_team_id}:{away_team_id}"
+
+
+def build_table(league: str = leagues.DEFAULT_LEAGUE, season: int = leagues.CURRENT_SEASON):
+    """League table rows sorted by points."""
+    db = database.SessionLocal()
+    try:
+        return [queries.team_dict(row) for row in db.execute(queries.table(league, season))]
+    finally:
+        db.close()
+
+
+def build_table_as_of(league: str, season: int, matchday: int = None, day=None):
+    """League table as of a matchday or a date, from the standings snapshots."""
+    db = database.SessionLocal()
+    try:
+        return [queries.team_dict(row) for row in db.execute(queries.table_as_of(league, season, matchday, day))]
+    finally:
+        db.close()
+
+
+def build_positions(team_id: int):
+    """A team's position after each matchday (raises 404 for an unknown team)."""
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(queries.team_positions(team_id)).all()
+        if not rows and db.get(models.Team, team_id) is None:
+            raise HTTPException(404, "Team not found")
+        return [queries.position_dict(row) for row in rows]
+    finally:
+        db.close()
+
+
+def build_simulation(league: str = leagues.DEFAULT_LEAGUE, season: int = leagues.CURRENT_SEASON):
+    """Monte Carlo projection of a league season (also stores Team.xpts)."""
+    db = database.SessionLocal()
+    try:
+        return simulation.run(db, league, season)
+    finally:
+        db.close()
+
+
+def _missing_pair(home_team, away_team):
+    """The error for a pair without a head-to-head row."""
+    if home_team is None or away_team is None:
+        return HTTPException(404, "Team not found")
+    if (home_team.league, home_team.season) != (away_team.league, away_team.season):
+        return HTTPException(400, "The teams are not in the same league season")
+    # Built by the next sync that changes the table
+    return HTTPException(404, "Head-to-head matrix not built yet")
+
+
+def build_prediction(home_team_id: int, away_team_id: int):
+    """Outcome probabilities of a (possibly hypothetical) fixture, from the head-to-head matrix."""
+    db = database.SessionLocal()
+    try:
+        row = db.execute(queries.head_to_head(home_team_id, away_team_id)).first()
+        if not row:
+            raise _missing_pair(db.get(models.Team, home_team_id), db.get(models.Team, away_team_id))
+        return queries.prediction_dict(row)
+    finally:
+        db.close()
+
+
+def build_upcoming():
+    """Next 10 fixtures with predictions, formatted for React (one query)."""
+    db = database.SessionLocal()
+    try:
+        return [queries.match_dict(row) for row in db.execute(queries.upcoming_matches())]
+    finally:
+        db.close()
+
+
+def build_match(match_id: int):
+    """Detail payload for one match (raises 404, which is never cached)."""
+    db = database.SessionLocal()
+    try:
+        row = db.execute(queries.match_detail(match_id)).first()
+        if not row:
+            raise HTTPException(404, "Match not found")
+        return queries.match_dict(row)
+    finally:
+        db.close()
+
+
+def build_top_players(league: str, season: int, metric: str, limit: int):
+    """League-wide leaderboard of one metric."""
+    db = database.SessionLocal()
+    try:
+        return [queries.player_dict(row) for row in db.execute(queries.top_players(league, season, metric, limit))]
+    finally:
+        db.close()
+
+
+def build_team_players(team_id: int, metric: str, limit: int):
+    """A team's leaderboard of one metric (raises 404 for an unknown team)."""
+    db = database.SessionLocal()
+    try:
+        rows = db.execute(queries.team_players(team_id, metric, limit)).all()
+        if not rows and db.get(models.Team, team_id) is None:
+            raise HTTPException(404, "Team not found")
+        return [queries.player_dict(row) for row in rows]
+    finally:
+        db.close()
+
+
+async def abuild_table(league: str = leagues.DEFAULT_LEAGUE, season: int = leagues.CURRENT_SEASON) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        return cache.dumps([queries.team_dict(row) for row in await db.execute(queries.table(league, season))])
+
+
+async def abuild_table_as_of(league: str, season: int, matchday: int = None, day=None) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        rows = await db.execute(queries.table_as_of(league, season, matchday, day))
+        return cache.dumps([queries.team_dict(row) for row in rows])
+
+
+async def abuild_positions(team_id: int) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        rows = (await db.execute(queries.team_positions(team_id))).all()
+        if not rows and await db.get(models.Team, team_id) is None:
+            raise HTTPException(404, "Team not found")
+        return cache.dumps([queries.position_dict(row) for row in rows])
+
+
+async def abuild_prediction(home_team_id: int, away_team_id: int) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        row = (await db.execute(queries.head_to_head(home_team_id, away_team_id))).first()
+        if not row:
+            raise _missing_pair(await db.get(models.Team, home_team_id), await db.get(models.Team, away_team_id))
+        return cache.dumps(queries.prediction_dict(row))
+
+
+async def abuild_upcoming() -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        return cache.dumps([queries.match_dict(row) for row in await db.execute(queries.upcoming_matches())])
+
+
+async def abuild_match(match_id: int) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        row = (await db.execute(queries.match_detail(match_id))).first()
+        if not row:
+            raise HTTPException(404, "Match not found")
+        return cache.dumps(queries.match_dict(row))
+
+
+async def abuild_top_players(league: str, season: int, metric: str, limit: int) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        rows = await db.execute(queries.top_players(league, season, metric, limit))
+        return cache.dumps([queries.player_dict(row) for row in rows])
+
+
+async def abuild_team_players(team_id: int, metric: str, limit: int) -> bytes:
+    async with database.AsyncSessionLocal() as db:
+        rows = (await db.execute(queries.team_players(team_id, metric, limit))).all()
+        if not rows and await db.get(models.Team, team_id) is None:
+            raise HTTPException(404, "Team not found")
+        return cache.dumps([queries.player_dict(row) for row in rows])
@@ -0,0 +1,304 @@
+"""
+Refresh-ahead cache warming.
+
+After /sync-data, /run-algo and /update-logos the affected views are rebuilt
+and written over the old entries (cache.replace), instead of being deleted
+and left for the next request to rebuild. Readers keep getting the old value
+until the new one lands, so no user pays for the cold query. On startup the
+same views are built if Redis does not already hold them.
+
+Warming is opt-in per key family (CACHE_WARM_FAMILIES, comma separated):
+    table       table:{league}:{season} (warmed on startup: the default one)
+    upcoming    matches:upcoming
+    detail      matches:detail:{id} of the next CACHE_WARM_DETAIL_LIMIT fixtures
+    simulation  simulation:{league}:{season} (re-run after syncs; also refreshes Team.xpts)
+Keys of families that are not enabled are invalidated as before.
+
+Simulations take too long to run inline (tens of seconds on a pod limited to
+half a CPU), so they are never built in a request or in the sync: they run
+on a background thread (simulate_in_background), one at a time per process
+and one per league season across replicas, and replace the cached result
+when done. GET /simulation serves the last result meanwhile, or 202.
+"""
+
+import os
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+from sqlalchemy import or_, select
+
+from . import cache, database, leagues, models, queries, views
+
+WARM_FAMILIES = {f.strip() for f in os.getenv("CACHE_WARM_FAMILIES", "").split(",") if f.strip()}
+WARM_ON_STARTUP = os.getenv("CACHE_WARM_ON_STARTUP", "true").lower() == "true"
+# Detail pages warmed per run (the fixtures listed by /matches by default)
+DETAIL_LIMIT = int(os.getenv("CACHE_WARM_DETAIL_LIMIT", str(queries.UPCOMING_LIMIT)))
+
+# How long a replica's claim on a simulation run lasts (longer than the slowest run)
+SIMULATION_TIMEOUT = int(os.getenv("SIMULATION_JOB_TIMEOUT", "600"))
+
+_report_lock = threading.Lock()
+_last_report = None
+# Set once the startup warm has run (or when there is nothing to warm)
+_startup_done = threading.Event()
+
+# Simulation keys with a run in flight in this process; runs take turns on the CPU
+_simulating = set()
+_simulating_lock = threading.Lock()
+_simulation_run_lock = threading.Lock()
+
+
+def _family(key: str) -> str:
+    if key.startswith("table:"):
+        return "table"
+    if key == views.UPCOMING_KEY:
+        return "upcoming"
+    return "detail"
+
+
+def _builder(key: str):
+    if key.startswith("table:"):
+        _, league, season = key.split(":")
+        return lambda: views.build_table(league, int(season))
+    if key == views.UPCOMING_KEY:
+        return views.build_upcoming
+    match_id = int(key.rsplit(":", 1)[1])
+    return lambda: views.build_match(match_id)
+
+
+def _upcoming_ids(league: str = None) -> list:
+    """Ids of all not-finished matches (of one league), next kickoff first."""
+    db = database.SessionLocal()
+    try:
+        stmt = select(models.Match.id).filter(queries.NOT_FINISHED)
+        if league is not None:
+            stmt = stmt.filter(models.Match.league == league)
+        return list(db.scalars(stmt.order_by(models.Match.date, models.Match.id)))
+    finally:
+        db.close()
+
+
+def _match_ids(team_ids=None) -> list:
+    """Ids of every match (of some teams)."""
+    db = database.SessionLocal()
+    try:
+        stmt = select(models.Match.id)
+        if team_ids is not None:
+            stmt = stmt.filter(or_(models.Match.home_team_id.in_(team_ids), models.Match.away_team_id.in_(team_ids)))
+        return list(db.scalars(stmt))
+    finally:
+        db.close()
+
+
+def _record(reason: str, timings: dict, skipped: int, started: float) -> dict:
+    global _last_report
+    report = {
+        "reason": reason,
+        "families": sorted(WARM_FAMILIES),
+        "keys": timings,
+        "warmed": sum(1 for t in timings.values() if t is not None),
+        "invalidated": skipped,
+        "seconds": round(time.perf_counter() - started, 4),
+        "finished_at": time.time(),
+    }
+    with _report_lock:
+        _last_report = report
+    print(
+        f"[Warm] {reason}: {report['warmed']} keys warmed, {skipped} invalidated "
+        f"in {report['seconds']}s"
+    )
+    return report
+
+
+def refresh(keys, reason: str, invalidate=()) -> dict:
+    """
+    Rebuilds the keys of enabled families and overwrites them in place;
+    keys of other families and `invalidate` are deleted. Returns per-key
+    warm times in seconds.
+    """
+    started = time.perf_counter()
+    keys = list(dict.fromkeys(keys))
+    warm = [k for k in keys if _family(k) in WARM_FAMILIES]
+    drop = [k for k in keys if _family(k) not in WARM_FAMILIES] + [k for k in invalidate if k not in keys]
+    if drop:
+        cache.delete_keys(*drop)
+
+    timings = {}
+    for key in warm:
+        key_started = time.perf_counter()
+        try:
+            cache.replace(key, _builder(key)())
+            timings[key] = round(time.perf_counter() - key_started, 4)
+        except HTTPException:
+            # The match no longer exists
+            cache.delete_keys(key)
+            timings[key] = None
+        except Exception as e:
+            print(f"[Warm] Failed to warm {key}: {e}")
+            cache.delete_keys(key)
+            timings[key] = None
+    return _record(reason, timings, len(drop), started)
+
+
+def _fixture_refresh(reason: str, keys=(), changed_ids=None) -> dict:
+    """
+    Refreshes `keys`, the upcoming list and the detail pages of the next
+    DETAIL_LIMIT fixtures it shows (default league); other detail pages (all
+    upcoming ones, or only `changed_ids` when given) are just invalidated.
+    """
+    listed = _upcoming_ids(leagues.DEFAULT_LEAGUE)[:DETAIL_LIMIT]
+    if changed_ids is None:
+        stale = _upcoming_ids()
+    else:
+        stale = list(changed_ids)
+        changed = set(stale)
+        listed = [i for i in listed if i in changed]
+    warmed = set(listed)
+    warm = list(keys) + [views.UPCOMING_KEY] + [views.detail_key(i) for i in listed]
+    return refresh(warm, reason, invalidate=[views.detail_key(i) for i in stale if i not in warmed])
+
+
+def after_sync(changes: dict) -> dict:
+    """Refreshes the views touched by a sync change set (see services.sync_league)."""
+    tables = changes.get("tables", [])
+    keys = [views.table_key(league, season) for league, season in tables]
+    if keys:
+        # Past tables and position charts (snapshots replayed by the sync)
+        cache.invalidate_family("standings")
+        # One key per team pair: rebuilt on the next request
+        cache.invalidate_family("predict")
+        for league, season in tables:
+            if "simulation" in WARM_FAMILIES:
+                # Readers keep the previous projection until the new run lands
+                simulate_in_background(league, season)
+            else:
+                cache.delete_keys(views.simulation_key(league, season))
+    renamed = changes.get("renamed", [])
+    if changes.get("players") or renamed:
+        # Leaderboards are small and read rarely: rebuilt on the next request
+        cache.invalidate_family("players")
+    # Changed matches (finished ones too) and every match of a renamed team
+    changed_ids = set(changes.get("matches", [])) | set(_match_ids(renamed) if renamed else ())
+    if not changed_ids:
+        return refresh(keys, "sync")
+    # Any page can contain a changed match (or shift because of one)
+    cache.invalidate_family("matchlist")
+    return _fixture_refresh("sync", keys, changed_ids=sorted(changed_ids))
+
+
+def _simulation_claim_key(key: str) -> str:
+    return cache.ns_key(f"jobs:{key}")
+
+
+def simulate_in_background(league: str, season: int) -> bool:
+    """
+    Starts a background run of a league season's simulation that replaces
+    its cached result when done. Returns False when a run is already in
+    flight (in this process or on another replica).
+    """
+    key = views.simulation_key(league, season)
+    with _simulating_lock:
+        if key in _simulating:
+            return False
+        _simulating.add(key)
+
+    client = cache.get_redis_client()
+    token = uuid.uuid4().hex
+    try:
+        claimed = client is None or client.set(_simulation_claim_key(key), token, nx=True, ex=SIMULATION_TIMEOUT)
+    except Exception as e:
+        print(f"[Warm] Claim error for {key}: {e}")
+        claimed = False
+    if not claimed:
+        with _simulating_lock:
+            _simulating.discard(key)
+        return False
+
+    def run():
+        try:
+            with _simulation_run_lock:
+                started = time.perf_counter()
+                cache.replace(key, views.build_simulation(league, season), ttl=views.SIMULATION_TTL)
+                print(f"[Warm] {key} simulated in {round(time.perf_counter() - started, 4)}s")
+        except Exception as e:
+            print(f"[Warm] Failed to simulate {key}: {e}")
+        finally:
+            try:
+                # Only release the claim if it is still this run's
+                if client is not None and client.get(_simulation_claim_key(key)) == token:
+                    client.delete(_simulation_claim_key(key))
+            except Exception as e:
+                print(f"[Warm] Claim release error for {key}: {e}")
+            with _simulating_lock:
+                _simulating.discard(key)
+
+    threading.Thread(target=run, name=f"simulation-{league}-{season}", daemon=True).start()
+    return True
+
+
+def after_predictions() -> dict:
+    """Refreshes the fixture views after /run-algo replaced the predictions."""
+    cache.invalidate_family("matchlist")
+    return _fixture_refresh("predictions")
+
+
+def after_logos() -> dict:
+    """Refreshes the table and fixture views after team logos changed."""
+    cache.invalidate_family("matchlist")
+    cache.invalidate_family("standings")
+    # Every detail page shows the logos, finished matches' included
+    return _fixture_refresh(
+        "logos", [views.table_key(league, season) for league, season in leagues.targets()], changed_ids=_match_ids()
+    )
+
+
+def warm_startup(on_done=None) -> dict:
+    """Builds the enabled views that Redis does not hold yet (single-flight across replicas)."""
+    started = time.perf_counter()
+    timings = {}
+    try:
+        keys = [views.TABLE_KEY, views.UPCOMING_KEY] + [views.detail_key(i) for i in _upcoming_ids(leagues.DEFAULT_LEAGUE)[:DETAIL_LIMIT]]
+        for key in keys:
+            if _family(key) not in WARM_FAMILIES:
+                continue
+            key_started = time.perf_counter()
+            builder = _builder(key)
+            try:
+                cache.get_or_build(key, lambda: cache.dumps(builder()))
+                timings[key] = round(time.perf_counter() - key_started, 4)
+            except Exception as e:
+                print(f"[Warm] Failed to warm {key}: {e}")
+                timings[key] = None
+    except Exception as e:
+        print(f"[Warm] Startup warm failed: {e}")
+    finally:
+        _startup_done.set()
+        if on_done:
+            on_done()
+    return _record("startup", timings, 0, started)
+
+
+def start(on_done=None):
+    """
+    Warms the cache in a background thread so startup is not delayed.
+    `on_done` is called once the warm has finished (or right away when
+    there is nothing to warm).
+    """
+    if not WARM_FAMILIES or not WARM_ON_STARTUP or cache.get_redis_client() is None:
+        _startup_done.set()
+        if on_done:
+            on_done()
+        return
+    threading.Thread(target=warm_startup, args=(on_done,), name="cache-warmer", daemon=True).start()
+
+
+def startup_warmed() -> bool:
+    """True once the startup warm has finished (successfully or not)."""
+    return _startup_done.is_set()
+
+
+def get_report() -> dict:
+    with _report_lock:
+        return {"families": sorted(WARM_FAMILIES), "last_run": _last_report}
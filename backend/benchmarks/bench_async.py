@@ -0,0 +1,139 @@
+"""
+Compares the read endpoints served by sync handlers (threadpool, sync engine
+and Redis client) with the async handlers (AsyncSession, redis.asyncio).
+
+Run from backend/:
+    python -m benchmarks.bench_async [--concurrency 100] [--duration 10] [--cache]
+
+Each mode runs in its own process (ASYNC_READS=true/false) with the same
+settings, and the app is driven in-process through httpx's ASGI transport
+with `--concurrency` clients requesting /table, /matches and /matches/{id}.
+Without --cache the cache is disabled, so every request reaches the
+database; with --cache, REDIS_URL must point at a Redis server. Uses
+DATABASE_URL when set (point it at Postgres for realistic I/O), otherwise a
+temporary SQLite database.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+
+def seed(teams: int):
+    from app import analysis, database, models, services
+    from benchmarks.synthetic import make_league_payload
+
+    models.Base.metadata.create_all(bind=database.engine)
+    payload = make_league_payload(n_teams=teams)
+    services.fetch_understat_payload = lambda: (payload, None)
+    db = database.SessionLocal()
+    try:
+        services.sync_fbref_data(db, force=True)
+        analysis.generate_predictions(db)
+        return [m.id for m in db.query(models.Match.id).filter(models.Match.status != "FINISHED").limit(20)]
+    finally:
+        db.close()
+
+
+async def run_load(concurrency: int, duration: float, match_ids):
+    import httpx
+    from app import database, main
+
+    paths = ["/table", "/matches"] + [f"/matches/{i}" for i in match_ids]
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client, n):
+        nonlocal errors
+        i = n
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(paths[i % len(paths)])
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            i += 1
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm-up: connection pools, first queries
+        for path in paths:
+            await client.get(path)
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await database.dispose_async_engine()
+
+    latencies.sort()
+    def pct(p):
+        return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+    }
+
+
+def worker(args):
+    match_ids = json.loads(args.match_ids)
+    print(json.dumps(asyncio.run(run_load(args.concurrency, args.duration, match_ids))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--cache", action="store_true", help="keep the Redis cache enabled")
+    parser.add_argument("--worker", choices=["sync", "async"], help=argparse.SUPPRESS)
+    parser.add_argument("--match-ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    match_ids = seed(args.teams)
+    results = {}
+    for mode in ("sync", "async"):
+        env = dict(
+            os.environ,
+            ASYNC_READS="true" if mode == "async" else "false",
+            CACHE_ENABLED="true" if args.cache else "false",
+            AI_PREGENERATE="false",
+        )
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_async", "--worker", mode,
+             "--concurrency", str(args.concurrency), "--duration", str(args.duration),
+             "--match-ids", json.dumps(match_ids)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        # The app prints its own log lines; the result is the last line
+        results[mode] = json.loads(out.strip().splitlines()[-1])
+
+    print(json.dumps({
+        "benchmark": "read_endpoints_sync_vs_async",
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "cache": args.cache,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "sync": results["sync"],
+        "async": results["async"],
+        "throughput_ratio": round(results["async"]["req_per_s"] / max(results["sync"]["req_per_s"], 1e-9), 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
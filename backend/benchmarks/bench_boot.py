@@ -0,0 +1,130 @@
+"""
+Measures how long a new API process takes to become useful: to listen
+(/health answers) and to be ready for traffic (/ready returns 200).
+
+Run from backend/:
+    python -m benchmarks.bench_boot [--runs 5] [--teams 20] [--cache]
+
+The schema is migrated and seeded once (`python -m app.schema`, as the init
+container does), then each run starts uvicorn in a fresh process, polls
+/health and /ready, and records the boot phases reported by /ready (see
+app/startup.py). Runs are done with SCHEMA_BOOTSTRAP=false (init container
+layout) and =true (migrations in the API process). Without --cache the
+cache is disabled; with it, REDIS_URL must point at a Redis server. Uses
+DATABASE_URL when set, otherwise a temporary SQLite database.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+POLL_INTERVAL = 0.01
+TIMEOUT = 60
+
+
+def seed(teams: int):
+    from app import analysis, database, schema, services
+    from benchmarks.synthetic import make_league_payload
+
+    schema.upgrade_schema()
+    payload = make_league_payload(n_teams=teams)
+    services.fetch_understat_payload = lambda: (payload, None)
+    db = database.SessionLocal()
+    try:
+        services.sync_fbref_data(db, force=True)
+        analysis.generate_predictions(db)
+    finally:
+        db.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def boot_once(env: dict) -> dict:
+    import httpx
+
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    result = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=2) as client:
+            while time.perf_counter() - started < TIMEOUT and proc.poll() is None:
+                try:
+                    if "listening_s" not in result and client.get("/health").status_code == 200:
+                        result["listening_s"] = round(time.perf_counter() - started, 4)
+                    if "listening_s" in result:
+                        response = client.get("/ready")
+                        if response.status_code == 200:
+                            result["ready_s"] = round(time.perf_counter() - started, 4)
+                            result["phases"] = response.json()["boot"]
+                            break
+                except httpx.TransportError:
+                    pass
+                time.sleep(POLL_INTERVAL)
+    finally:
+        proc.terminate()
+        proc.wait()
+    if "ready_s" not in result:
+        raise RuntimeError(f"API exited or did not become ready within {TIMEOUT}s")
+    return result
+
+
+def summarize(runs: list) -> dict:
+    from app.startup import PHASES
+
+    def median(values):
+        return round(statistics.median(values), 4)
+    phases = [p for p in PHASES if any(p in r["phases"] for r in runs)]
+    return {
+        "listening_s": median([r["listening_s"] for r in runs]),
+        "ready_s": median([r["ready_s"] for r in runs]),
+        "phases_s": {p: median([r["phases"][p] for r in runs if p in r["phases"]]) for p in phases},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--cache", action="store_true", help="keep the Redis cache enabled")
+    args = parser.parse_args()
+
+    seed(args.teams)
+    results = {}
+    for bootstrap in ("false", "true"):
+        env = dict(
+            os.environ,
+            SCHEMA_BOOTSTRAP=bootstrap,
+            CACHE_ENABLED="true" if args.cache else "false",
+            AI_PREGENERATE="false",
+        )
+        runs = [boot_once(env) for _ in range(args.runs)]
+        results[f"schema_bootstrap_{bootstrap}"] = summarize(runs)
+
+    print(json.dumps({
+        "benchmark": "api_boot",
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "cache": args.cache,
+        "runs": args.runs,
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
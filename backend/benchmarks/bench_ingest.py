@@ -0,0 +1,143 @@
+"""
+Measures /sync-data ingestion of several leagues and seasons.
+
+Run from backend/:
+    python -m benchmarks.bench_ingest [--leagues 4] [--seasons 3] [--latency 0.5]
+                                      [--fail-rate 0.2] [--concurrency 1,4,8]
+
+A local HTTP server stands in for Understat: it serves synthetic payloads
+(gzipped) at /getLeagueData/{league}/{season}, waits --latency seconds per
+request and answers a --fail-rate share of requests with 503, so retries are
+exercised. For each concurrency level the database is emptied and
+ingest.run(force=True) loads every league season; the report has the fetch
+and total time, retries and per-target status. Uses DATABASE_URL when set
+(payloads are written in parallel there), otherwise a temporary SQLite
+database (written one after another).
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+os.environ.setdefault("AI_PREGENERATE", "false")
+
+
+class FakeUnderstat(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payloads: dict, latency: float, fail_rate: float, seed: int):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.bodies = {path: gzip.compress(json.dumps(p).encode()) for path, p in payloads.items()}
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            fail = server.rnd.random() < server.fail_rate
+            server.failures += fail
+        body = server.bodies.get(self.path)
+        if fail or body is None:
+            self.send_response(503 if fail else 404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _reset_database():
+    from app import database, models
+
+    db = database.SessionLocal()
+    try:
+        for model in (
+            models.Prediction, models.Standing, models.HeadToHead, models.MatchStat, models.Match,
+            models.PlayerRanking, models.Player, models.Team, models.SyncFingerprint,
+        ):
+            db.query(model).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leagues", type=int, default=4)
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--players", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake Understat response")
+    parser.add_argument("--fail-rate", type=float, default=0.2, help="share of requests answered with 503")
+    parser.add_argument("--concurrency", default="1,4,8", help="comma separated INGEST_CONCURRENCY values")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    from app import database, ingest, schema
+    from benchmarks.synthetic import make_dataset
+
+    schema.upgrade_schema()
+    dataset = make_dataset(args.leagues, args.seasons, args.teams, args.players, args.seed)
+    payloads = {f"/getLeagueData/{item['league']}/{item['season']}": item["payload"] for item in dataset}
+    targets = [(item["league"], item["season"]) for item in dataset]
+
+    server = FakeUnderstat(payloads, args.latency, args.fail_rate, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    ingest.API_URL = f"http://127.0.0.1:{server.server_port}/getLeagueData/{{league}}/{{season}}"
+    ingest.BACKOFF = min(ingest.BACKOFF, 0.1)
+    ingest.RETRIES = max(ingest.RETRIES, 5)
+
+    results = {}
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            _reset_database()
+            ingest.CONCURRENCY = concurrency
+            server.requests = server.failures = 0
+            run = ingest.run(force=True, targets=targets)
+            results[f"concurrency_{concurrency}"] = {
+                "status": run["status"],
+                "fetch_s": run["fetch_seconds"],
+                "total_s": run["seconds"],
+                "requests": server.requests,
+                "retried_503": server.failures,
+                "matches_written": run["processed"],
+                "failed_targets": [name for name, r in run["targets"].items() if r["status"] != "success"],
+            }
+    finally:
+        server.shutdown()
+
+    print(json.dumps({
+        "benchmark": "ingest",
+        "database": database.engine.dialect.name,
+        "targets": len(targets),
+        "latency_s": args.latency,
+        "fail_rate": args.fail_rate,
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
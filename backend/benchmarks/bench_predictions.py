@@ -0,0 +1,117 @@
+"""
+Benchmarks analysis.generate_predictions against the previous per-fixture loop.
+
+Run from backend/:
+    python -m benchmarks.bench_predictions [--teams 20] [--repeat 5]
+
+Uses DATABASE_URL when set, otherwise a temporary SQLite database.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+from sqlalchemy import event, or_
+
+from app import analysis, database, models, services
+from benchmarks.synthetic import make_league_payload
+
+
+def legacy_generate_predictions(db):
+    """The original loop: two form queries and two squad queries per fixture."""
+    upcoming = db.query(models.Match).filter(
+        or_(models.Match.status == 'SCHEDULED', models.Match.status == 'TIMED')
+    ).all()
+    count = 0
+    for match in upcoming:
+        db.query(models.Prediction).filter(models.Prediction.match_id == match.id).delete()
+        home_stats = analysis.get_team_form(db, match.home_team_id)
+        away_stats = analysis.get_team_form(db, match.away_team_id)
+        if home_stats["matches"] == 0 or away_stats["matches"] == 0: continue
+
+        h_attack = (home_stats["goals_scored"] + home_stats["xg_created"]) / home_stats["matches"]
+        a_attack = (away_stats["goals_scored"] + away_stats["xg_created"]) / away_stats["matches"]
+        h_defense = (home_stats["goals_conceded"] + home_stats["xg_conceded"]) / home_stats["matches"]
+        a_defense = (away_stats["goals_conceded"] + away_stats["xg_conceded"]) / away_stats["matches"]
+        diff = (h_attack - a_defense + 0.25) - (a_attack - h_defense)
+
+        winner_id = None; confidence = 0.5 + (0.35 - abs(diff))
+        if diff > 0.35:
+            winner_id = match.home_team_id; confidence = 0.5 + min(diff/3, 0.45)
+        elif diff < -0.35:
+            winner_id = match.away_team_id; confidence = 0.5 + min(abs(diff)/3, 0.45)
+
+        analysis.get_top_players_string(db, match.home_team_id)
+        analysis.get_top_players_string(db, match.away_team_id)
+        db.add(models.Prediction(
+            match_id=match.id, predicted_winner_id=winner_id,
+            is_draw_prediction=(winner_id is None), confidence_score=confidence,
+            analysis_content=f"{match.home_team.name} vs {match.away_team.name}"
+        ))
+        count += 1
+    db.commit()
+    return {"status": "success", "predictions": count}
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def measure(fn, db, counter, repeat):
+    timings = []; queries = 0
+    for _ in range(repeat):
+        counter.count = 0
+        started = time.perf_counter()
+        result = fn(db)
+        timings.append(time.perf_counter() - started)
+        queries = counter.count
+    timings.sort()
+    return {
+        "predictions": result["predictions"],
+        "queries": queries,
+        "median_seconds": round(timings[len(timings) // 2], 5),
+        "min_seconds": round(timings[0], 5),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--finished-ratio", type=float, default=0.6)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine)
+    payload = make_league_payload(n_teams=args.teams, finished_ratio=args.finished_ratio)
+    services.fetch_understat_payload = lambda: (payload, None)
+
+    db = database.SessionLocal()
+    try:
+        services.sync_fbref_data(db, force=True)
+        counter = QueryCounter(database.engine)
+        legacy = measure(legacy_generate_predictions, db, counter, args.repeat)
+        batch = measure(analysis.generate_predictions, db, counter, args.repeat)
+    finally:
+        db.close()
+
+    print(json.dumps({
+        "benchmark": "generate_predictions",
+        "teams": args.teams,
+        "legacy_loop": legacy,
+        "batch_engine": batch,
+        "speedup": round(legacy["median_seconds"] / max(batch["median_seconds"], 1e-9), 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
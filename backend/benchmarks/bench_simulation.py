@@ -0,0 +1,112 @@
+"""
+Benchmarks the Monte Carlo season simulator (simulation.run).
+
+Run from backend/:
+    python -m benchmarks.bench_simulation [--teams 20] [--finished-ratio 0.4]
+                                          [--seasons 100000] [--processes 1,2,4]
+
+Loads one synthetic league season, then runs the full simulation (read
+teams and fixtures, simulate, write Team.xpts) once per process count. The
+pool is started before the timed run, as the API keeps it between runs.
+A per-season Python loop over the same model, on a sample of seasons, is the
+reference. Uses DATABASE_URL when set, otherwise a temporary SQLite database.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+import numpy as np
+
+from app import database, leagues, models, queries, schema, services, simulation
+from benchmarks.synthetic import make_league_payload
+
+
+def loop_seasons(attack, defense, league_avg, home, away, points, seasons: int, seed: int) -> float:
+    """Reference: one season at a time, one fixture at a time. Returns seconds per season."""
+    rng = np.random.default_rng(seed)
+    advantage = np.sqrt(simulation.HOME_ADVANTAGE)
+    started = time.perf_counter()
+    for _ in range(seasons):
+        table = points.copy()
+        for h, a in zip(home, away):
+            goals_h = rng.poisson(league_avg * attack[h] * defense[a] * advantage)
+            goals_a = rng.poisson(league_avg * attack[a] * defense[h] / advantage)
+            if goals_h > goals_a:
+                table[h] += 3
+            elif goals_h < goals_a:
+                table[a] += 3
+            else:
+                table[h] += 1; table[a] += 1
+        np.argsort(-table)
+    return (time.perf_counter() - started) / seasons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--finished-ratio", type=float, default=0.4)
+    parser.add_argument("--seasons", type=int, default=100000)
+    parser.add_argument("--processes", default="1,2,4", help="comma separated SIMULATION_PROCESSES values")
+    parser.add_argument("--loop-sample", type=int, default=200, help="seasons run by the reference loop")
+    args = parser.parse_args()
+
+    schema.upgrade_schema()
+    payload = make_league_payload(n_teams=args.teams, finished_ratio=args.finished_ratio)
+    league, season = leagues.DEFAULT_LEAGUE, leagues.CURRENT_SEASON
+    db = database.SessionLocal()
+    try:
+        services.sync_league(db, league, season, payload, force=True)
+        teams = db.query(models.Team).filter_by(league=league, season=season).order_by("id").all()
+        index = {t.id: i for i, t in enumerate(teams)}
+        fixtures = db.query(models.Match).filter(
+            queries.NOT_FINISHED, models.Match.league == league
+        ).all()
+        home = np.array([index[m.home_team_id] for m in fixtures])
+        away = np.array([index[m.away_team_id] for m in fixtures])
+        attack, defense, league_avg = simulation.strengths(teams)
+        per_season = loop_seasons(
+            attack, defense, league_avg, home, away, np.array([t.points for t in teams]), args.loop_sample, 1
+        )
+
+        runs = {}
+        for processes in (int(p) for p in args.processes.split(",")):
+            simulation.shutdown_pool()
+            simulation.PROCESSES = processes
+            if processes > 1:
+                # Start the workers outside the timed run
+                list(simulation._get_pool().map(abs, range(processes)))
+            started = time.perf_counter()
+            result = simulation.run(db, league, season, args.seasons)
+            seconds = time.perf_counter() - started
+            runs[f"processes_{processes}"] = {
+                "seconds": round(seconds, 3),
+                "seasons_per_second": int(args.seasons / seconds),
+                "processes_used": result["processes"],
+            }
+        simulation.shutdown_pool()
+    finally:
+        db.close()
+
+    fastest = min(r["seconds"] for r in runs.values())
+    print(json.dumps({
+        "benchmark": "season_simulation",
+        "database": database.engine.dialect.name,
+        "teams": args.teams,
+        "remaining_fixtures": len(fixtures),
+        "seasons": args.seasons,
+        "chunk": simulation.CHUNK,
+        "cpus": os.cpu_count(),
+        "python_loop_estimate_s": round(per_season * args.seasons, 1),
+        **runs,
+        "speedup_vs_loop": round(per_season * args.seasons / fastest, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Checks that the hot queries are planned on their indexes, not on full scans.
+
+Run from backend/:
+    python -m benchmarks.check_query_plans [--teams 20] [--seasons 3] [--leagues 2]
+
+Creates the schema through the Alembic migrations, seeds synthetic data,
+runs the real query functions while capturing their SQL, and EXPLAINs every
+captured SELECT. Exits with status 1 if an expected index is not used or a
+checked table is scanned sequentially. Uses DATABASE_URL when set (Postgres:
+sequential scans are disabled for the session, because on small tables the
+planner would rightly prefer them; the check is that the index is usable),
+otherwise a temporary SQLite database.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+from sqlalchemy import event
+
+from app import analysis, database, models, queries, schema, services
+from benchmarks.synthetic import make_dataset
+
+# name -> (query function, indexes its plan must use, tables that must not be scanned)
+CHECKS = {
+    "table": (
+        lambda db, ids: db.execute(queries.table()).all(),
+        {"uq_teams_league_season_external_id"}, {"teams"},
+    ),
+    "table_as_of_matchday": (
+        lambda db, ids: db.execute(queries.table_as_of("EPL", 2025, matchday=10)).all(),
+        {"ix_standings_league_season_matchday", "uq_standings_team_matchday"}, {"standings", "teams"},
+    ),
+    "table_as_of_date": (
+        lambda db, ids: db.execute(queries.table_as_of("EPL", 2025, day=ids["day"])).all(),
+        {"ix_standings_league_season_date", "uq_standings_team_matchday"}, {"standings", "teams"},
+    ),
+    "team_positions": (
+        lambda db, ids: db.execute(queries.team_positions(ids["team"])).all(),
+        {"uq_standings_team_matchday"}, {"standings"},
+    ),
+    "upcoming_matches": (
+        lambda db, ids: db.execute(queries.upcoming_matches()).all(),
+        {"ix_matches_upcoming_league_date"}, {"matches", "predictions"},
+    ),
+    "match_detail": (
+        lambda db, ids: db.execute(queries.match_detail(ids["match"])).all(),
+        {"uq_predictions_match_id"}, {"matches", "predictions"},
+    ),
+    "match_list_deep_page": (
+        lambda db, ids: db.execute(queries.match_list(after=ids["cursor"], limit=21)).all(),
+        {"ix_matches_date_id"}, {"matches"},
+    ),
+    "match_list_league_season": (
+        lambda db, ids: db.execute(queries.match_list(league="EPL", season=2025, after=ids["cursor"], limit=21)).all(),
+        {"ix_matches_league_season_date_id"}, {"matches"},
+    ),
+    "team_form": (
+        lambda db, ids: analysis.get_team_form(db, ids["team"]),
+        {"ix_matches_home_team_status_date", "ix_matches_away_team_status_date"}, {"matches"},
+    ),
+    "squads": (
+        lambda db, ids: analysis._squads_by_team(db, [ids["team"]]),
+        {"ix_player_rankings_team_rank"}, {"players", "player_rankings"},
+    ),
+    "top_players": (
+        lambda db, ids: db.execute(queries.top_players("EPL", 2025, "xg_per90", 10)).all(),
+        {"ix_player_rankings_league_rank"}, {"players", "player_rankings"},
+    ),
+    "head_to_head": (
+        lambda db, ids: db.execute(queries.head_to_head(ids["team"], ids["opponent"])).all(),
+        {"uq_head_to_head_home_away"}, {"head_to_head", "teams"},
+    ),
+    "prediction_by_match": (
+        lambda db, ids: db.query(models.Prediction).filter(models.Prediction.match_id == ids["match"]).first(),
+        {"uq_predictions_match_id"}, {"predictions"},
+    ),
+    "form_table": (
+        lambda db, ids: analysis.compute_form_table(db),
+        {"ix_matches_status_date", "uq_match_stats_match_id"}, {"match_stats"},
+    ),
+    # predict_match: the form of one fixture's two teams
+    "form_two_teams": (
+        lambda db, ids: analysis.compute_form_table(db, team_ids=(ids["team"], ids["opponent"])),
+        {"ix_matches_home_team_status_date", "ix_matches_away_team_status_date"}, {"matches", "match_stats"},
+    ),
+}
+
+
+class Capture:
+    """Records the SELECT statements (and parameters) executed on an engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and not executemany:
+            self.statements.append((statement, parameters))
+
+    def stop(self):
+        if event.contains(self.engine, "before_cursor_execute", self._on_execute):
+            event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def explain(conn, statement, parameters):
+    """Returns (index names used, tables scanned sequentially) for one statement."""
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        details = [row[-1] for row in rows]
+        indexes = {m for d in details for m in re.findall(r"USING (?:COVERING )?INDEX (\w+)", d)}
+        # "SCAN matches" / "SCAN home" without an index is a full table scan
+        scans = {d.split()[1] for d in details if d.startswith("SCAN") and "INDEX" not in d}
+        return indexes, scans, details
+
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    indexes, scans, details = set(), set(), []
+
+    def walk(node):
+        details.append(node["Node Type"] + (f" on {node['Relation Name']}" if "Relation Name" in node else ""))
+        if "Index Name" in node:
+            indexes.add(node["Index Name"])
+        if node["Node Type"] == "Seq Scan":
+            scans.add(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk((plan if isinstance(plan, list) else json.loads(plan))[0]["Plan"])
+    return indexes, scans, details
+
+
+def _aliases(statement):
+    """Maps SQL aliases (e.g. "home") back to table names for the scan check."""
+    return {alias: table for table, alias in re.findall(r"\b(\w+) AS (\w+)\b", statement)}
+
+
+def seed(teams: int = 20, seasons: int = 3, n_leagues: int = 2) -> dict:
+    """Migrates the database, loads synthetic leagues and returns the ids the checks query."""
+    schema.upgrade_schema()
+
+    db = database.SessionLocal()
+    try:
+        for item in make_dataset(n_leagues, seasons, n_teams=teams):
+            services.sync_league(db, item["league"], item["season"], item["payload"], force=True)
+        analysis.generate_predictions(db)
+        ids = {
+            "team": db.query(models.Team.id).first()[0],
+            "match": db.query(models.Prediction.match_id).first()[0],
+        }
+        team = db.get(models.Team, ids["team"])
+        ids["opponent"] = db.query(models.Team.id).filter(
+            models.Team.league == team.league, models.Team.season == team.season, models.Team.id != team.id
+        ).first()[0]
+        # A (date, id) cursor in the middle of the loaded seasons
+        total = db.query(models.Match).count()
+        ids["cursor"] = tuple(db.query(models.Match.date, models.Match.id).order_by(
+            models.Match.date, models.Match.id
+        ).offset(total // 2).first())
+        ids["day"] = ids["cursor"][0].date()
+        return ids
+    finally:
+        db.close()
+
+
+def check(name: str, ids: dict) -> dict:
+    """Runs one check's queries, EXPLAINs them and reports the indexes used and the bad scans."""
+    run, expected, no_scan = CHECKS[name]
+    captured = Capture(database.engine)
+    db = database.SessionLocal()
+    try:
+        run(db, ids)
+        captured.stop()
+        conn = db.connection()
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        used, scanned, plans = set(), set(), []
+        for statement, parameters in captured.statements:
+            indexes, scans, details = explain(conn, statement, parameters)
+            aliases = _aliases(statement)
+            used |= indexes
+            scanned |= {aliases.get(s, s) for s in scans}
+            plans.append(details)
+    finally:
+        captured.stop()
+        db.close()
+
+    missing = sorted(expected - used)
+    bad_scans = sorted(scanned & no_scan)
+    return {
+        "ok": not missing and not bad_scans, "indexes": sorted(used), "missing": missing,
+        "sequential_scans": bad_scans, "plan": plans,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--seasons", type=int, default=3, help="synthetic seasons to load")
+    parser.add_argument("--leagues", type=int, default=2, help="synthetic leagues to load")
+    args = parser.parse_args()
+
+    ids = seed(args.teams, args.seasons, args.leagues)
+    results = {name: check(name, ids) for name in CHECKS}
+    print(json.dumps({"database": database.engine.dialect.name, "checks": results}, indent=2))
+    sys.exit(0 if all(r["ok"] for r in results.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
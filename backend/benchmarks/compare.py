@@ -0,0 +1,54 @@
+"""
+Compares two benchmark suite results (see benchmarks.suite).
+
+Run from backend/:
+    python -m benchmarks.compare base.json new.json [--threshold 10] [--metric median_ms]
+
+Prints every benchmark with the change in `--metric` and in the statement
+count, and exits with status 1 if any benchmark got slower by more than
+`--threshold` percent or runs more SQL statements than before.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    parser.add_argument("--metric", default="median_ms", choices=["median_ms", "p95_ms", "min_ms"])
+    args = parser.parse_args()
+
+    base, new = load(args.base), load(args.new)
+    if base["meta"]["dataset"] != new["meta"]["dataset"]:
+        print("Warning: the runs used different datasets", file=sys.stderr)
+
+    regressions = []
+    print(f"{'benchmark':<36} {'base':>10} {'new':>10} {'change':>8} {'queries':>9}")
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        before, after = base["results"].get(name), new["results"].get(name)
+        if before is None or after is None:
+            print(f"{name:<36} {'only in ' + ('new' if before is None else 'base'):>30}")
+            continue
+        change = (after[args.metric] - before[args.metric]) / max(before[args.metric], 1e-9) * 100
+        queries = f"{before['queries']}->{after['queries']}"
+        flag = ""
+        if change > args.threshold or after["queries"] > before["queries"]:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36} {before[args.metric]:>10.3f} {after[args.metric]:>10.3f} {change:>+7.1f}% {queries:>9}{flag}")
+
+    print(f"\n{base['meta'].get('commit')} -> {new['meta'].get('commit')}: {len(regressions)} regression(s)")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
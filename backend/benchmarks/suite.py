@@ -0,0 +1,341 @@
+"""
+Local benchmark suite: sync, predictions, read endpoints (cold and warm
+cache) and cache invalidation, on synthetic multi-league, multi-season data.
+
+Run from backend/:
+    python -m benchmarks.suite [--leagues 1] [--seasons 3] [--teams 20] [--players 25]
+                               [--redis fake|none|redis://...] [--repeat 20]
+                               [--only sync,predictions,reads,invalidation]
+                               [--output results.json]
+
+Uses DATABASE_URL when set (e.g. a local Postgres), otherwise a temporary
+SQLite database; the schema is created through the migrations. --redis fake
+(default) runs the cache against an in-process fakeredis, a redis:// URL
+uses a real server (keys go to the CACHE_NAMESPACE "fm-bench"), none
+disables the cache. Every result has timings in milliseconds and the number
+of SQL statements per run (profiler.profile). The JSON output also records
+the commit and settings; compare two runs with benchmarks.compare.
+
+The k6 scripts in the repository root remain the load tests for a deployed
+cluster; this suite is for comparing commits locally.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+GROUPS = ("sync", "predictions", "reads", "invalidation")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leagues", type=int, default=1)
+    parser.add_argument("--seasons", type=int, default=3)
+    parser.add_argument("--teams", type=int, default=20, help="teams per league")
+    parser.add_argument("--players", type=int, default=25, help="players per team")
+    parser.add_argument("--redis", default="fake", help="fake, none or a redis:// URL")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", help=f"comma separated subset of: {', '.join(GROUPS)}")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    return parser.parse_args()
+
+
+def configure_env(args):
+    """Settings that app modules read at import time."""
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+    os.environ.setdefault("AI_PREGENERATE", "false")
+    os.environ["CACHE_ENABLED"] = "false" if args.redis == "none" else "true"
+    if args.redis.startswith("redis"):
+        os.environ["REDIS_URL"] = args.redis
+        os.environ.setdefault("CACHE_NAMESPACE", "fm-bench")
+
+
+def use_fake_redis():
+    import fakeredis
+    import fakeredis.aioredis
+    from app import cache
+
+    server = fakeredis.FakeServer()
+    decoded = fakeredis.FakeRedis(server=server, decode_responses=True)
+    binary = fakeredis.FakeRedis(server=server)
+    async_client = fakeredis.aioredis.FakeRedis(server=server)
+    cache.get_redis_client = lambda: decoded
+    cache.get_binary_client = lambda: binary
+    cache.get_async_redis = lambda: async_client
+
+
+def summarize(timings: list, queries: list) -> dict:
+    ms = sorted(t * 1000 for t in timings)
+    return {
+        "runs": len(ms),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(int(len(ms) * 0.95), len(ms) - 1)], 3),
+        "min_ms": round(ms[0], 3),
+        "queries": max(queries) if queries else 0,
+    }
+
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """Runs fn `repeat` times (setup before each run is not timed)."""
+    from app import profiler
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with profiler.profile("bench") as prof:
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+        queries.append(prof.count)
+    return summarize(timings, queries)
+
+
+def _sync(item, force: bool):
+    from app import database, services
+
+    db = database.SessionLocal()
+    try:
+        return services.sync_league(db, item["league"], item["season"], item["payload"], force=force)
+    finally:
+        db.close()
+
+
+def _with_db(fn):
+    from app import database
+
+    def run():
+        db = database.SessionLocal()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+    return run
+
+
+def bench_sync(dataset, args) -> dict:
+    """Initial load of every payload, re-sync of an unchanged payload, re-sync with changed results."""
+    from app import profiler
+
+    loads, queries = [], []
+    for item in dataset:
+        with profiler.profile("bench") as prof:
+            started = time.perf_counter()
+            _sync(item, force=True)
+            loads.append(time.perf_counter() - started)
+        queries.append(prof.count)
+
+    current = dataset[-1]
+    rnd = random.Random(args.seed)
+    finished = [m for m in current["payload"]["dates"] if m["isResult"]]
+
+    def change_results():
+        for match in rnd.sample(finished, min(10, len(finished))):
+            match["goals"] = {"h": str(rnd.randint(0, 5)), "a": str(rnd.randint(0, 5))}
+
+    return {
+        "sync_initial_load": {**summarize(loads, queries), "payloads": len(dataset)},
+        "sync_unchanged": measure(lambda: _sync(current, force=False), args.repeat),
+        "sync_10_changed_results": measure(lambda: _sync(current, force=False), max(args.repeat // 4, 3), setup=change_results),
+    }
+
+
+def bench_predictions(args) -> dict:
+    from app import analysis
+
+    return {"generate_predictions": measure(_with_db(analysis.generate_predictions), max(args.repeat // 4, 3))}
+
+
+def _read_paths():
+    """Read endpoint paths: table, upcoming, one detail, first and a deep listing page."""
+    from app import database, main, models
+
+    db = database.SessionLocal()
+    try:
+        upcoming_id = db.query(models.Match.id).filter(models.Match.status != "FINISHED").order_by(models.Match.date).first()[0]
+        total = db.query(models.Match).count()
+        middle = db.query(models.Match.date, models.Match.id).order_by(
+            models.Match.date, models.Match.id
+        ).offset(total // 2).first()
+    finally:
+        db.close()
+    return {
+        "table": "/table",
+        "matches_upcoming": "/matches",
+        "match_detail": f"/matches/{upcoming_id}",
+        "match_list_first_page": "/matches/list?limit=20",
+        "match_list_deep_page": f"/matches/list?limit=20&cursor={main._encode_cursor(*middle)}",
+    }
+
+
+def _clear_cache():
+    from app import cache
+
+    cache.invalidate_all_cache()
+    cache._l1.clear()
+
+
+def bench_reads(args) -> dict:
+    """
+    Each read endpoint in-process (ASGI transport): cold (cache flushed before
+    every request), warm (L1 hit) and warm_redis (L1 cleared, Redis hit).
+    """
+    import httpx
+    from app import cache, database, main, profiler
+
+    paths = _read_paths()
+
+    async def run():
+        results = {}
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def timed(path):
+                with profiler.profile("bench") as prof:
+                    started = time.perf_counter()
+                    response = await client.get(path)
+                    elapsed = time.perf_counter() - started
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {path} returned {response.status_code}")
+                return elapsed, prof.count
+
+            for name, path in paths.items():
+                await timed(path)  # first request: connections, imports
+                cold = []
+                for _ in range(args.repeat):
+                    _clear_cache()
+                    cold.append(await timed(path))
+                await timed(path)
+                warm = [await timed(path) for _ in range(args.repeat)]
+                # Redis hit without the in-process L1 copy (another replica's entry)
+                redis_only = []
+                for _ in range(args.repeat):
+                    cache._l1.clear()
+                    redis_only.append(await timed(path))
+                for mode, runs in (("cold", cold), ("warm", warm), ("warm_redis", redis_only)):
+                    results[f"{name}_{mode}"] = summarize([t for t, _ in runs], [q for _, q in runs])
+        await database.dispose_async_engine()
+        return results
+
+    return asyncio.run(run())
+
+
+def bench_invalidation(args) -> dict:
+    """Invalidation after a sync change set (delete, and refresh-ahead) and a full flush."""
+    from app import cache, database, leagues, models, views, warmer
+
+    db = database.SessionLocal()
+    try:
+        match_ids = [m for (m,) in db.query(models.Match.id).order_by(models.Match.date)]
+        team_ids = [t for (t,) in db.query(models.Team.id)]
+    finally:
+        db.close()
+    changes = {
+        "teams": team_ids[:2], "matches": match_ids[-10:], "players": [],
+        "tables": [[leagues.DEFAULT_LEAGUE, leagues.CURRENT_SEASON]],
+    }
+
+    def populate():
+        # The table, the fixtures list, every detail page and 50 listing pages
+        cache.set_cache(views.TABLE_KEY, [{"id": t} for t in team_ids])
+        cache.set_cache(views.UPCOMING_KEY, [{"id": m} for m in match_ids[-10:]])
+        for mid in match_ids:
+            cache.set_cache(f"matches:detail:{mid}", {"id": mid})
+        for page in range(50):
+            cache.set_cache(cache.cache_key("matchlist", "all", page), [])
+
+    repeat = max(args.repeat // 4, 3)
+    families = set(warmer.WARM_FAMILIES)
+    try:
+        warmer.WARM_FAMILIES.clear()
+        after_sync = measure(lambda: warmer.after_sync(changes), repeat, setup=populate)
+        warmer.WARM_FAMILIES.update({"table", "upcoming", "detail"})
+        after_sync_warm = measure(lambda: warmer.after_sync(changes), repeat, setup=populate)
+    finally:
+        warmer.WARM_FAMILIES.clear()
+        warmer.WARM_FAMILIES.update(families)
+    return {
+        "invalidate_sync_changes": {**after_sync, "cached_keys": len(match_ids) + 52},
+        "refresh_ahead_sync_changes": after_sync_warm,
+        "invalidate_all": measure(cache.invalidate_all_cache, repeat, setup=populate),
+    }
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], capture_output=True, text=True).stdout.strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    configure_env(args)
+    groups = args.only.split(",") if args.only else list(GROUPS)
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        sys.exit(f"Unknown benchmark groups: {', '.join(sorted(unknown))}")
+
+    if args.redis == "fake":
+        use_fake_redis()
+
+    from app import analysis, database, schema
+    from benchmarks.synthetic import make_dataset
+
+    schema.upgrade_schema()
+    dataset = make_dataset(args.leagues, args.seasons, args.teams, args.players, args.seed)
+
+    results = {}
+    if "sync" in groups:
+        results.update(bench_sync(dataset, args))
+    else:
+        for item in dataset:
+            _sync(item, force=True)
+    if "predictions" in groups:
+        results.update(bench_predictions(args))
+    else:
+        _with_db(analysis.generate_predictions)()
+    if "reads" in groups:
+        results.update(bench_reads(args))
+    if "invalidation" in groups and args.redis != "none":
+        results.update(bench_invalidation(args))
+
+    report = {
+        "suite": "football-merchant",
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database.engine.dialect.name,
+            "redis": "url" if args.redis.startswith("redis") else args.redis,
+            "dataset": {
+                "leagues": args.leagues, "seasons": args.seasons, "teams_per_league": args.teams,
+                "players_per_team": args.players, "payloads": len(dataset),
+                "matches": sum(len(item["payload"]["dates"]) for item in dataset),
+            },
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Synthetic Understat-shaped payloads for local benchmarks.
+
+Produces the same structure as https://understat.com/getLeagueData/<league>/<season>
+({"teams": {...}, "dates": [...], "players": [...]}) so it can be fed straight
+into services.sync_league.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+
+def make_league_payload(n_teams: int = 20, players_per_team: int = 25,
+                        finished_ratio: float = 0.6, seed: int = 1,
+                        team_id_offset: int = 100, match_id_offset: int = 10000,
+                        player_id_offset: int = 100000, season_start: datetime = None):
+    """Double round-robin season; the first `finished_ratio` of fixtures have results."""
+    rnd = random.Random(seed)
+    season_start = season_start or datetime(2025, 8, 16, 15, 0, 0)
+
+    teams = {
+        str(team_id_offset + i): {"id": str(team_id_offset + i), "title": f"Team {team_id_offset + i}"}
+        for i in range(n_teams)
+    }
+    ids = list(teams)
+    fixtures = [(h, a) for h in ids for a in ids if h != a]
+    rnd.shuffle(fixtures)
+
+    per_round = max(n_teams // 2, 1)
+    finished = int(len(fixtures) * finished_ratio)
+    dates = []
+    for k, (h, a) in enumerate(fixtures):
+        is_result = k < finished
+        kickoff = season_start + timedelta(days=7 * (k // per_round), hours=2 * (k % per_round))
+        dates.append({
+            "id": str(match_id_offset + k),
+            "isResult": is_result,
+            "datetime": kickoff.strftime("%Y-%m-%d %H:%M:%S"),
+            "h": {"id": h, "title": teams[h]["title"]},
+            "a": {"id": a, "title": teams[a]["title"]},
+            "goals": {
+                "h": str(rnd.randint(0, 4)) if is_result else None,
+                "a": str(rnd.randint(0, 3)) if is_result else None,
+            },
+            "xG": {
+                "h": f"{rnd.random() * 3:.4f}" if is_result else None,
+                "a": f"{rnd.random() * 2.5:.4f}" if is_result else None,
+            },
+        })
+
+    players = []
+    pid = player_id_offset
+    for t in ids:
+        for _ in range(players_per_team):
+            games = rnd.randint(0, 38)
+            players.append({
+                "id": str(pid),
+                "player_name": f"Player {pid}",
+                "team_title": teams[t]["title"],
+                "position": rnd.choice(["GK", "D", "M", "F", "F M", "D S"]),
+                "games": str(games),
+                "time": str(games * rnd.randint(20, 90)),
+                "goals": str(rnd.randint(0, 25)),
+                "assists": str(rnd.randint(0, 12)),
+                "shots": str(rnd.randint(0, 90)),
+                "xG": f"{rnd.random() * 18:.4f}",
+                "xA": f"{rnd.random() * 9:.4f}",
+            })
+            pid += 1
+
+    return {"teams": teams, "dates": dates, "players": players}
+
+
+LEAGUE_CODES = ("EPL", "La_liga", "Bundesliga", "Serie_A", "Ligue_1", "RFPL")
+
+
+def make_dataset(leagues: int = 1, seasons: int = 1, n_teams: int = 20,
+                 players_per_team: int = 25, seed: int = 1) -> list:
+    """
+    Payloads for leagues x seasons, oldest season first (league codes from
+    LEAGUE_CODES, then "L6", "L7", ...; seasons end at 2025); within a league the
+    teams and players keep their ids across seasons and only the last season
+    is in progress. Match ids are unique across the dataset, team and
+    player ids across leagues.
+    Returns [{"league": code, "season": year, "payload": {...}}, ...].
+    """
+    last_season = 2025
+    dataset = []
+    for league in range(leagues):
+        for s in range(seasons):
+            year = last_season - seasons + 1 + s
+            dataset.append({
+                "league": LEAGUE_CODES[league] if league < len(LEAGUE_CODES) else f"L{league}",
+                "season": year,
+                "payload": make_league_payload(
+                    n_teams=n_teams, players_per_team=players_per_team,
+                    finished_ratio=1.0 if s < seasons - 1 else 0.6,
+                    seed=seed + 1000 * league + s,
+                    team_id_offset=100 + 1000 * league,
+                    match_id_offset=1_000_000 * (league + 1) + 10_000 * s,
+                    player_id_offset=10_000_000 + 100_000 * league,
+                    season_start=datetime(year, 8, 16, 15, 0, 0),
+                ),
+            })
+    return dataset
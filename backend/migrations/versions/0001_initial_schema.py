@@ -0,0 +1,97 @@
+"""initial schema
+
+The tables as create_all() built them before migrations were introduced.
+Databases created that way are stamped at this revision (see app/schema.py).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "teams",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("external_id", sa.Integer(), unique=True),
+        sa.Column("name", sa.String()),
+        sa.Column("short_name", sa.String()),
+        sa.Column("logo_url", sa.String(), nullable=True),
+        sa.Column("matches_played", sa.Integer()),
+        sa.Column("wins", sa.Integer()),
+        sa.Column("draws", sa.Integer()),
+        sa.Column("loses", sa.Integer()),
+        sa.Column("goals_scored", sa.Integer()),
+        sa.Column("goals_conceded", sa.Integer()),
+        sa.Column("points", sa.Integer()),
+        sa.Column("position", sa.Integer()),
+        sa.Column("xpts", sa.Float()),
+        sa.Column("xg_for", sa.Float()),
+        sa.Column("xg_against", sa.Float()),
+    )
+    op.create_index("ix_teams_id", "teams", ["id"])
+    op.create_index("ix_teams_name", "teams", ["name"])
+
+    op.create_table(
+        "players",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("external_id", sa.Integer(), unique=True),
+        sa.Column("name", sa.String()),
+        sa.Column("position", sa.String()),
+        sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id")),
+        sa.Column("games", sa.Integer()),
+        sa.Column("goals", sa.Integer()),
+        sa.Column("assists", sa.Integer()),
+        sa.Column("shots", sa.Integer()),
+        sa.Column("xg", sa.Float()),
+        sa.Column("xa", sa.Float()),
+    )
+    op.create_index("ix_players_id", "players", ["id"])
+
+    op.create_table(
+        "matches",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("external_id", sa.Integer()),
+        sa.Column("date", sa.DateTime()),
+        sa.Column("home_team_id", sa.Integer(), sa.ForeignKey("teams.id")),
+        sa.Column("away_team_id", sa.Integer(), sa.ForeignKey("teams.id")),
+        sa.Column("home_score", sa.Integer(), nullable=True),
+        sa.Column("away_score", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String()),
+    )
+    op.create_index("ix_matches_id", "matches", ["id"])
+    op.create_index("ix_matches_external_id", "matches", ["external_id"], unique=True)
+
+    op.create_table(
+        "match_stats",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("match_id", sa.Integer(), sa.ForeignKey("matches.id")),
+        sa.Column("home_xg", sa.Float(), nullable=True),
+        sa.Column("away_xg", sa.Float(), nullable=True),
+    )
+    op.create_index("ix_match_stats_id", "match_stats", ["id"])
+
+    op.create_table(
+        "predictions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("match_id", sa.Integer(), sa.ForeignKey("matches.id")),
+        sa.Column("predicted_winner_id", sa.Integer(), sa.ForeignKey("teams.id"), nullable=True),
+        sa.Column("is_draw_prediction", sa.Boolean()),
+        sa.Column("confidence_score", sa.Float()),
+        sa.Column("analysis_content", sa.Text()),
+        sa.Column("ai_generated_commentary", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_predictions_id", "predictions", ["id"])
+
+
+def downgrade():
+    for table in ("predictions", "match_stats", "matches", "players", "teams"):
+        op.drop_table(table)
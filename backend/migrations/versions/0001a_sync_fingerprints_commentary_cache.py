@@ -0,0 +1,49 @@
+"""sync fingerprints and commentary cache tables
+
+Both tables were added to the models (delta sync, commentary cache) before
+migrations existed, so create_all() made them on databases created after
+that, but not on older ones, which are stamped at 0001 as well. They are
+only created here when missing.
+
+Revision ID: 0001a
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001a"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if "sync_fingerprints" not in tables:
+        op.create_table(
+            "sync_fingerprints",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("kind", sa.String()),
+            sa.Column("external_id", sa.Integer()),
+            sa.Column("digest", sa.String(32)),
+            sa.UniqueConstraint("kind", "external_id", name="uq_sync_fingerprints_kind_external_id"),
+        )
+        op.create_index("ix_sync_fingerprints_id", "sync_fingerprints", ["id"])
+
+    if "commentary_cache" not in tables:
+        op.create_table(
+            "commentary_cache",
+            sa.Column("key", sa.String(64), primary_key=True),
+            sa.Column("model", sa.String()),
+            sa.Column("text", sa.Text()),
+            sa.Column("generation_seconds", sa.Float()),
+            sa.Column("hits", sa.Integer()),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+
+def downgrade():
+    op.drop_table("commentary_cache")
+    op.drop_table("sync_fingerprints")
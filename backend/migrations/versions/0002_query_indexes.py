@@ -0,0 +1,57 @@
+"""indexes for the hot query shapes, one-to-one match_id
+
+Adds the composite / partial / covering indexes used by /matches,
+get_team_form, generate_predictions and the squad lookups, and makes
+predictions.match_id and match_stats.match_id unique (the code already
+treats both as one-to-one; duplicates are removed first, keeping the newest
+row). On Postgres the indexes are built CONCURRENTLY, outside the migration
+transaction, so the tables stay writable.
+
+Revision ID: 0002
+Revises: 0001a
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001a"
+branch_labels = None
+depends_on = None
+
+UPCOMING = sa.text("status <> 'FINISHED'")
+
+INDEXES = [
+    # (name, table, columns, options)
+    ("ix_matches_status_date", "matches", ["status", "date"], {}),
+    ("ix_matches_upcoming_date", "matches", ["date"], {"postgresql_where": UPCOMING, "sqlite_where": UPCOMING}),
+    ("ix_matches_home_team_status_date", "matches", ["home_team_id", "status", sa.text("date DESC")], {}),
+    ("ix_matches_away_team_status_date", "matches", ["away_team_id", "status", sa.text("date DESC")], {}),
+    ("ix_players_team_id", "players", ["team_id"], {"postgresql_include": ["name", "goals", "assists", "xg"]}),
+    ("uq_predictions_match_id", "predictions", ["match_id"], {"unique": True}),
+    ("uq_match_stats_match_id", "match_stats", ["match_id"], {"unique": True}),
+]
+
+
+def upgrade():
+    for table in ("predictions", "match_stats"):
+        op.execute(
+            f"DELETE FROM {table} WHERE match_id IS NOT NULL AND id NOT IN "
+            f"(SELECT MAX(id) FROM {table} WHERE match_id IS NOT NULL GROUP BY match_id)"
+        )
+
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+    if is_postgres:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns, options in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+    else:
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, **options)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,25 @@
+"""(date, id) index for the keyset-paginated match listing
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index("ix_matches_date_id", "matches", ["date", "id"], postgresql_concurrently=True, if_not_exists=True)
+    else:
+        op.create_index("ix_matches_date_id", "matches", ["date", "id"], if_not_exists=True)
+
+
+def downgrade():
+    op.drop_index("ix_matches_date_id", table_name="matches")
@@ -0,0 +1,108 @@
+"""league and season keys on teams, players, matches and sync fingerprints
+
+Existing rows were all synced from the hard-coded EPL 2025 endpoint and are
+backfilled with that scope. Team and player external ids are unique per
+league season (a team has one row per season it played); fingerprints are
+keyed by league season too. On SQLite the tables are rebuilt (batch mode)
+to swap the unique constraints. On Postgres the new indexes are built
+CONCURRENTLY, as in 0002, before the old keys are dropped.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BACKFILL_LEAGUE = "EPL"
+BACKFILL_SEASON = 2025
+
+# Names SQLite batch mode gives the unnamed constraints it reflects
+NAMING = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+OLD_UNIQUE = {
+    "postgresql": {"teams": "teams_external_id_key", "players": "players_external_id_key"},
+    "sqlite": {"teams": "uq_teams_external_id", "players": "uq_players_external_id"},
+}
+UNIQUE_INDEXES = {
+    "teams": "uq_teams_league_season_external_id",
+    "players": "uq_players_league_season_external_id",
+}
+FINGERPRINT_UNIQUE = "uq_sync_fingerprints_kind_external_id"
+FINGERPRINT_SCOPE_UNIQUE = "uq_sync_fingerprints_scope_kind_external_id"
+UPCOMING = sa.text("status <> 'FINISHED'")
+
+INDEXES = [
+    # (name, table, columns, options)
+    *((index, table, ["league", "season", "external_id"], {"unique": True}) for table, index in UNIQUE_INDEXES.items()),
+    ("ix_matches_league_season_date_id", "matches", ["league", "season", "date", "id"], {}),
+    (
+        "ix_matches_upcoming_league_date", "matches", ["league", "date"],
+        {"postgresql_where": UPCOMING, "sqlite_where": UPCOMING},
+    ),
+]
+
+
+def _add_scope_columns(table):
+    with op.batch_alter_table(table) as batch:
+        batch.add_column(sa.Column("league", sa.String(), nullable=False, server_default=BACKFILL_LEAGUE))
+        batch.add_column(sa.Column("season", sa.Integer(), nullable=False, server_default=str(BACKFILL_SEASON)))
+    # The default was only for the backfill; the sync always sets both
+    with op.batch_alter_table(table) as batch:
+        batch.alter_column("league", server_default=None)
+        batch.alter_column("season", server_default=None)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table in ("teams", "players", "matches", "sync_fingerprints"):
+        _add_scope_columns(table)
+    with op.batch_alter_table("sync_fingerprints") as batch:
+        batch.drop_constraint(FINGERPRINT_UNIQUE, type_="unique")
+        batch.create_unique_constraint(FINGERPRINT_SCOPE_UNIQUE, ["league", "season", "kind", "external_id"])
+
+    if dialect == "postgresql":
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns, options in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+    else:
+        for name, table, columns, options in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, **options)
+
+    # The new keys are in place; drop the ones they replace
+    old_names = OLD_UNIQUE.get(dialect, OLD_UNIQUE["postgresql"])
+    for table in UNIQUE_INDEXES:
+        with op.batch_alter_table(table, naming_convention=NAMING) as batch:
+            batch.drop_constraint(old_names[table], type_="unique")
+    # /matches lists one league's fixtures
+    op.drop_index("ix_matches_upcoming_date", table_name="matches")
+
+
+def downgrade():
+    # Only one league season fits under the old unique keys; drop the others
+    other = f"league <> '{BACKFILL_LEAGUE}' OR season <> {BACKFILL_SEASON}"
+    for table in ("predictions", "match_stats"):
+        op.execute(f"DELETE FROM {table} WHERE match_id IN (SELECT id FROM matches WHERE {other})")
+    for table in ("matches", "players", "teams", "sync_fingerprints"):
+        op.execute(f"DELETE FROM {table} WHERE {other}")
+
+    op.drop_index("ix_matches_upcoming_league_date", table_name="matches")
+    op.create_index("ix_matches_upcoming_date", "matches", ["date"], postgresql_where=UPCOMING, sqlite_where=UPCOMING)
+    op.drop_index("ix_matches_league_season_date_id", table_name="matches")
+    with op.batch_alter_table("sync_fingerprints") as batch:
+        batch.drop_constraint(FINGERPRINT_SCOPE_UNIQUE, type_="unique")
+        batch.create_unique_constraint(FINGERPRINT_UNIQUE, ["kind", "external_id"])
+    for table, index in UNIQUE_INDEXES.items():
+        op.drop_index(index, table_name=table)
+        with op.batch_alter_table(table) as batch:
+            batch.create_unique_constraint(f"uq_{table}_external_id", ["external_id"])
+    for table in ("sync_fingerprints", "matches", "players", "teams"):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column("season")
+            batch.drop_column("league")
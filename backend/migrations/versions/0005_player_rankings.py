@@ -0,0 +1,47 @@
+"""player_rankings (leaderboard index) and players.minutes
+
+players.minutes is filled from Understat's "time" on the next sync. The
+payload fingerprints are dropped so that sync rewrites every player (their
+record now includes minutes) and builds the rankings, even if Understat's
+data has not changed since.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("players") as batch:
+        batch.add_column(sa.Column("minutes", sa.Integer(), nullable=True))
+
+    op.create_table(
+        "player_rankings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("league", sa.String(), nullable=False),
+        sa.Column("season", sa.Integer(), nullable=False),
+        sa.Column("metric", sa.String(), nullable=False),
+        sa.Column("player_id", sa.Integer(), sa.ForeignKey("players.id"), nullable=False),
+        sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id"), nullable=False),
+        sa.Column("value", sa.Float()),
+        sa.Column("league_rank", sa.Integer(), nullable=True),
+        sa.Column("team_rank", sa.Integer(), nullable=True),
+    )
+    op.create_index("ix_player_rankings_league_rank", "player_rankings", ["league", "season", "metric", "league_rank"])
+    op.create_index("ix_player_rankings_team_rank", "player_rankings", ["team_id", "metric", "team_rank"])
+
+    op.execute("DELETE FROM sync_fingerprints WHERE kind = 'payload'")
+
+
+def downgrade():
+    op.drop_table("player_rankings")
+    with op.batch_alter_table("players") as batch:
+        batch.drop_column("minutes")
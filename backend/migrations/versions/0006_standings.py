@@ -0,0 +1,49 @@
+"""standings snapshots (a team's record after each matchday)
+
+The team and match fingerprints are dropped along with the payload ones,
+so the next sync rewrites every match, which builds the snapshots and
+recomputes the table from the match results (see standings.py).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "standings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("league", sa.String(), nullable=False),
+        sa.Column("season", sa.Integer(), nullable=False),
+        sa.Column("team_id", sa.Integer(), sa.ForeignKey("teams.id"), nullable=False),
+        sa.Column("matchday", sa.Integer(), nullable=False),
+        sa.Column("match_id", sa.Integer(), sa.ForeignKey("matches.id"), nullable=False),
+        sa.Column("date", sa.DateTime()),
+        sa.Column("wins", sa.Integer()),
+        sa.Column("draws", sa.Integer()),
+        sa.Column("loses", sa.Integer()),
+        sa.Column("goals_scored", sa.Integer()),
+        sa.Column("goals_conceded", sa.Integer()),
+        sa.Column("points", sa.Integer()),
+        sa.Column("xg_for", sa.Float()),
+        sa.Column("xg_against", sa.Float()),
+        sa.Column("position", sa.Integer()),
+    )
+    op.create_index("uq_standings_team_matchday", "standings", ["team_id", "matchday"], unique=True)
+    op.create_index("ix_standings_league_season_matchday", "standings", ["league", "season", "matchday"])
+    op.create_index("ix_standings_league_season_date", "standings", ["league", "season", "date"])
+
+    op.execute("DELETE FROM sync_fingerprints WHERE kind IN ('payload', 'team', 'match')")
+
+
+def downgrade():
+    op.drop_table("standings")
@@ -0,0 +1,41 @@
+"""head-to-head matrix (outcome probabilities of every team pair)
+
+The team fingerprints are dropped along with the payload ones, so the next
+sync rewrites the teams and builds the matrix (see headtohead.py).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "head_to_head",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("league", sa.String(), nullable=False),
+        sa.Column("season", sa.Integer(), nullable=False),
+        sa.Column("home_team_id", sa.Integer(), sa.ForeignKey("teams.id"), nullable=False),
+        sa.Column("away_team_id", sa.Integer(), sa.ForeignKey("teams.id"), nullable=False),
+        sa.Column("home_win", sa.Float()),
+        sa.Column("draw", sa.Float()),
+        sa.Column("away_win", sa.Float()),
+        sa.Column("home_xg", sa.Float()),
+        sa.Column("away_xg", sa.Float()),
+    )
+    op.create_index("uq_head_to_head_home_away", "head_to_head", ["home_team_id", "away_team_id"], unique=True)
+    op.create_index("ix_head_to_head_league_season", "head_to_head", ["league", "season"])
+
+    op.execute("DELETE FROM sync_fingerprints WHERE kind IN ('payload', 'team')")
+
+
+def downgrade():
+    op.drop_table("head_to_head")
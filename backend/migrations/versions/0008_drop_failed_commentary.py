@@ -0,0 +1,31 @@
+"""drop failed AI commentary
+
+ai.generate_match_commentary used to return "Error generating analysis."
+when Ollama answered without a response; it was cached and stored like real
+commentary. It is removed so the next request generates it again.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+FAILED = "'Error generating analysis.'"
+
+
+def upgrade():
+    op.execute(f"DELETE FROM commentary_cache WHERE text = {FAILED} OR TRIM(text) = ''")
+    op.execute(
+        "UPDATE predictions SET ai_generated_commentary = NULL "
+        f"WHERE ai_generated_commentary = {FAILED} OR TRIM(ai_generated_commentary) = ''"
+    )
+
+
+def downgrade():
+    pass
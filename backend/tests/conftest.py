@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads DATABASE_URL on import. Tests never touch the configured
+# database: TEST_DATABASE_URL (e.g. a throwaway Postgres) or a temporary SQLite file.
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkstemp(suffix='.db')[1]}"
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """An in-memory Redis (fakeredis) behind the cache, job and async clients."""
+    import fakeredis
+    import fakeredis.aioredis
+
+    from app import cache
+
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    binary = fakeredis.FakeRedis(server=server)
+    async_client = fakeredis.aioredis.FakeRedis(server=server)
+    monkeypatch.setattr(cache, "get_redis_client", lambda: client)
+    monkeypatch.setattr(cache, "get_binary_client", lambda: binary)
+    monkeypatch.setattr(cache, "get_async_redis", lambda: async_client)
+    cache._l1.clear()
+    yield client
+    cache._l1.clear()
+
+
+@pytest.fixture(scope="session")
+def ids():
+    """Migrates the test database once, loads two synthetic leagues and returns ids to query."""
+    from benchmarks import check_query_plans
+
+    return check_query_plans.seed()
+
+
+@pytest.fixture
+def scratch_league(ids):
+    """(league, season) of its own for tests that sync data; its rows are deleted afterwards."""
+    from sqlalchemy import select
+
+    from app import database, models
+
+    league, season = "TEST", 2099
+    yield league, season
+
+    db = database.SessionLocal()
+    try:
+        match_ids = select(models.Match.id).filter(models.Match.league == league)
+        for model in (models.MatchStat, models.Prediction):
+            db.query(model).filter(model.match_id.in_(match_ids)).delete(synchronize_session=False)
+        for model in (
+            models.HeadToHead, models.Standing, models.PlayerRanking, models.SyncFingerprint,
+            models.Player, models.Match, models.Team,
+        ):
+            db.query(model).filter(model.league == league).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
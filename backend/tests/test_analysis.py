@@ -0,0 +1,123 @@
+"""
+The vectorized form table and fixture scores match the per-team loop they
+replaced (get_team_form and the per-fixture arithmetic of the original
+generate_predictions), on the synthetic leagues of the `ids` fixture plus a
+small league season with the edge cases: teams with fewer than `limit`
+matches or none at all, draws, and a match without xG.
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app import analysis, database, models
+
+
+def _reference_score(home: dict, away: dict) -> tuple:
+    """(outcome, confidence) of one fixture, as the original loop computed them."""
+    h_attack = (home["goals_scored"] + home["xg_created"]) / home["matches"]
+    a_attack = (away["goals_scored"] + away["xg_created"]) / away["matches"]
+    h_defense = (home["goals_conceded"] + home["xg_conceded"]) / home["matches"]
+    a_defense = (away["goals_conceded"] + away["xg_conceded"]) / away["matches"]
+    diff = (h_attack - a_defense + 0.25) - (a_attack - h_defense)
+    if diff > 0.35:
+        return 1, 0.5 + min(diff / 3, 0.45)
+    if diff < -0.35:
+        return -1, 0.5 + min(abs(diff) / 3, 0.45)
+    return 0, 0.5 + (0.35 - abs(diff))
+
+
+@pytest.fixture
+def db(ids):
+    session = database.SessionLocal()
+    teams = [models.Team(external_id=i, league="TST", season=2099, name=f"Team {i}") for i in range(4)]
+    session.add_all(teams)
+    session.flush()
+    a, b, c, d = (t.id for t in teams)
+    fixtures = [
+        # (home, away, score, xG, status)
+        (a, b, (1, 1), (1.2, 0.8), "FINISHED"),
+        (c, a, (0, 2), None, "FINISHED"),
+        (b, c, (3, 1), (2.1, 0.4), "FINISHED"),
+        (d, a, (None, None), None, "SCHEDULED"),
+        (b, d, (None, None), None, "SCHEDULED"),
+    ]
+    for i, (home, away, (hs, as_), xg, status) in enumerate(fixtures):
+        match = models.Match(
+            external_id=990000 + i, league="TST", season=2099, date=datetime(2099, 8, 10 + i),
+            home_team_id=home, away_team_id=away, home_score=hs, away_score=as_, status=status
+        )
+        session.add(match)
+        session.flush()
+        if xg:
+            session.add(models.MatchStat(match_id=match.id, home_xg=xg[0], away_xg=xg[1]))
+    session.commit()
+
+    yield session
+
+    match_ids = [m for (m,) in session.query(models.Match.id).filter(models.Match.league == "TST")]
+    session.query(models.MatchStat).filter(models.MatchStat.match_id.in_(match_ids)).delete(synchronize_session=False)
+    session.query(models.Match).filter(models.Match.league == "TST").delete(synchronize_session=False)
+    session.query(models.Team).filter(models.Team.league == "TST").delete(synchronize_session=False)
+    session.commit()
+    session.close()
+
+
+@pytest.mark.parametrize("limit", [1, 5, 40])
+def test_form_table_matches_the_per_team_loop(db, limit):
+    form = analysis.compute_form_table(db, limit=limit)
+    rows = {int(t): i for i, t in enumerate(form["team_ids"])}
+    team_ids = [t for (t,) in db.query(models.Team.id).order_by(models.Team.id)]
+    reference = {t: analysis.get_team_form(db, t, limit) for t in team_ids}
+
+    # The cases the rewrite has to get right are in the data
+    assert any(0 < r["matches"] < limit for r in reference.values()) or limit == 1
+    assert any(r["matches"] == 0 for r in reference.values())
+    assert any("D" in r["results"] for r in reference.values())
+
+    for team_id, ref in reference.items():
+        if ref["matches"] == 0:
+            assert team_id not in rows
+            continue
+        i = rows[team_id]
+        assert form["matches"][i] == ref["matches"]
+        assert form["points"][i] == ref["points"]
+        assert form["goals_scored"][i] == ref["goals_scored"]
+        assert form["goals_conceded"][i] == ref["goals_conceded"]
+        assert form["xg_created"][i] == pytest.approx(ref["xg_created"])
+        assert form["xg_conceded"][i] == pytest.approx(ref["xg_conceded"])
+        assert form["results"][i] == ref["results"]
+
+
+def test_fixture_scores_match_the_per_fixture_loop(db):
+    fixtures = analysis._fixtures(db).all()
+    home_ids = np.array([m.home_team_id for m in fixtures], dtype=np.int64)
+    away_ids = np.array([m.away_team_id for m in fixtures], dtype=np.int64)
+    scores = analysis.score_fixtures(analysis.compute_form_table(db), home_ids, away_ids)
+
+    outcomes = set()
+    for i, match in enumerate(fixtures):
+        home = analysis.get_team_form(db, match.home_team_id)
+        away = analysis.get_team_form(db, match.away_team_id)
+        if home["matches"] == 0 or away["matches"] == 0:
+            assert not scores["valid"][i]
+            continue
+        outcome, confidence = _reference_score(home, away)
+        outcomes.add(outcome)
+        assert scores["valid"][i]
+        assert scores["outcome"][i] == outcome
+        assert scores["confidence"][i] == pytest.approx(confidence)
+    assert outcomes == {-1, 0, 1}
+
+
+def test_form_table_of_some_teams_matches_the_full_table(db):
+    full = analysis.compute_form_table(db)
+    team_ids = [t for (t,) in db.query(models.Team.id).filter(models.Team.league == "TST")][:2]
+    some = analysis.compute_form_table(db, team_ids=team_ids)
+    for team_id in team_ids:
+        i = list(full["team_ids"]).index(team_id)
+        j = list(some["team_ids"]).index(team_id)
+        for column in ("matches", "points", "goals_scored", "goals_conceded", "xg_created", "xg_conceded"):
+            assert some[column][j] == pytest.approx(full[column][i])
+        assert some["results"][j] == full["results"][i]
@@ -0,0 +1,71 @@
+"""
+Response cache: async single-flight on a miss, L1 invalidation messages.
+"""
+
+import asyncio
+
+from app import cache
+
+KEY = "table:TEST:2025"
+
+
+def _counting_build(calls: list, delay: float = 0.05):
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return cache.dumps({"built": len(calls)})
+    return build
+
+
+def test_concurrent_misses_build_once(redis_client):
+    calls = []
+
+    async def run():
+        build = _counting_build(calls)
+        return await asyncio.gather(*[cache.aget_or_build(KEY, build) for _ in range(20)])
+
+    entries = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert {e.body for e in entries} == {cache.dumps({"built": 1})}
+    assert not cache._async_flights
+
+
+def test_cancelled_leader_does_not_cancel_followers(redis_client):
+    calls = []
+
+    async def run():
+        build = _counting_build(calls)
+        leader = asyncio.ensure_future(cache.aget_or_build(KEY, build))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(cache.aget_or_build(KEY, build)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # The leader's client went away mid-build
+        leader.cancel()
+        return leader, await asyncio.gather(*followers)
+
+    leader, entries = asyncio.run(run())
+
+    assert leader.cancelled()
+    assert len(calls) == 1
+    assert {e.body for e in entries} == {cache.dumps({"built": 1})}
+    # The rebuild finished and was stored for later requests
+    assert cache.get_cache(KEY) == {"built": 1}
+
+
+def test_replace_keeps_its_own_l1_entry(redis_client):
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(cache.INVALIDATION_CHANNEL)
+    cache.replace(KEY, {"warmed": True})
+    message = None
+    while message is None:
+        message = pubsub.get_message(timeout=1.0)
+    pubsub.close()
+
+    # What this replica's listener receives for its own replace()
+    cache._handle_invalidation(message["data"])
+    assert cache._l1.get(KEY)[0]
+
+    # Another replica's message for the same key does evict it
+    cache._handle_invalidation('{"origin": "other", "patterns": ["%s"]}' % KEY)
+    assert not cache._l1.get(KEY)[0]
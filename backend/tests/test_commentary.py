@@ -0,0 +1,82 @@
+"""
+AI commentary: failed generations are never cached.
+"""
+
+import pytest
+
+from app import ai, commentary, database, jobs, models
+
+
+class _Response:
+    def __init__(self, body: dict):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class _Session:
+    def __init__(self, body: dict):
+        self.body = body
+
+    def post(self, url, json, timeout):
+        return _Response(self.body)
+
+
+@pytest.mark.parametrize("body", [{}, {"response": ""}, {"response": "  \n"}])
+def test_empty_response_is_not_cached(ids, monkeypatch, body):
+    monkeypatch.setattr(ai, "_get_session", lambda: _Session(body))
+    db = database.SessionLocal()
+    try:
+        assert commentary.generate(db, f"analysis {body}", "EPL") is None
+        key = commentary.content_key(f"analysis {body}", "EPL")
+        assert db.get(models.CommentaryCache, key) is None
+    finally:
+        db.close()
+
+
+def test_generated_commentary_is_cached(ids, monkeypatch):
+    monkeypatch.setattr(ai, "_get_session", lambda: _Session({"response": "Predicted Winner: A"}))
+    db = database.SessionLocal()
+    try:
+        assert commentary.generate(db, "analysis ok", "EPL") == "Predicted Winner: A"
+        db.commit()
+        assert commentary.cached_commentary(db, "analysis ok", "EPL") == "Predicted Winner: A"
+    finally:
+        db.close()
+
+
+def test_pregeneration_skips_matches_a_request_is_generating(ids, redis_client, monkeypatch):
+    db = database.SessionLocal()
+    try:
+        pending = [
+            match_id for (match_id,) in db.query(models.Prediction.match_id).filter(
+                models.Prediction.ai_generated_commentary.is_(None)
+            )
+        ]
+    finally:
+        db.close()
+    busy = pending[0]
+    job, owner = jobs.begin_stream(busy)
+    assert owner
+    monkeypatch.setattr(ai, "generate_match_commentary", lambda context_text, league: "commentary")
+
+    db = database.SessionLocal()
+    try:
+        result = commentary.pregenerate_upcoming()
+        assert result["failed"] == 0 and result["generated"] > 0
+        commentaries = dict(db.query(models.Prediction.match_id, models.Prediction.ai_generated_commentary))
+        assert commentaries[busy] is None
+        assert all(commentaries[m] == "commentary" for m in pending[1:])
+        # The claims pre-generation took are released
+        assert all(redis_client.get(jobs._inflight_key(m)) is None for m in pending[1:])
+    finally:
+        jobs.finish_stream(job)
+        db.query(models.Prediction).filter(models.Prediction.match_id.in_(pending)).update(
+            {"ai_generated_commentary": None}, synchronize_session=False
+        )
+        db.commit()
+        db.close()
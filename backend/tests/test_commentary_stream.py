@@ -0,0 +1,63 @@
+"""
+GET /analyze/{id}/stream releases the match when the client goes away.
+
+The app is called as a raw ASGI app so the test can disconnect after the
+first token, the way a browser closing the tab does.
+"""
+
+import asyncio
+
+from app import ai, jobs, main
+
+MATCH_ID = 1
+
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [], "client": ("test", 1), "server": ("test", 80),
+    }
+
+
+async def _disconnect_after_first_token(path: str) -> list:
+    token_sent = asyncio.Event()
+    chunks = []
+
+    async def receive():
+        await token_sent.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks.append(message["body"])
+            if b"token" in message["body"]:
+                token_sent.set()
+
+    await main.app(_scope(path), receive, send)
+    return chunks
+
+
+def test_disconnect_mid_stream_releases_the_claim(redis_client, monkeypatch):
+    async def slow_tokens(context_text, league):
+        for i in range(1000):
+            await asyncio.sleep(0.01)
+            yield f"token{i} "
+
+    started = []
+    claim = jobs.begin_stream
+
+    def begin_stream(match_id):
+        job, owner = claim(match_id)
+        started.append(job)
+        return job, owner
+
+    monkeypatch.setattr(ai, "stream_match_commentary", slow_tokens)
+    monkeypatch.setattr(main, "_load_analysis", lambda match_id: ("analysis", None, "EPL"))
+    monkeypatch.setattr(jobs, "begin_stream", begin_stream)
+
+    chunks = asyncio.run(_disconnect_after_first_token(f"/analyze/{MATCH_ID}/stream"))
+
+    assert chunks and b"done" not in b"".join(chunks)
+    assert redis_client.get(jobs._inflight_key(MATCH_ID)) is None
+    assert jobs.get_job(started[0]["id"])["status"] == jobs.FAILED
@@ -0,0 +1,61 @@
+"""
+Cached read endpoints: ETags and 304 Not Modified.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import cache, main, views
+
+
+@pytest.fixture
+def client(ids, redis_client):
+    return TestClient(main.app)
+
+
+def test_matching_etag_gets_304(client):
+    first = client.get("/table", headers={"Accept-Encoding": "identity"})
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        again = client.get("/table", headers={"If-None-Match": header, "Accept-Encoding": "identity"})
+        assert again.status_code == 304, header
+        assert again.content == b""
+        assert again.headers["ETag"] == etag
+
+    other = client.get("/table", headers={"If-None-Match": '"other"', "Accept-Encoding": "identity"})
+    assert other.status_code == 200 and other.content == first.content
+
+
+def test_gzip_variant_has_its_own_etag(client):
+    plain = client.get("/table", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/table", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["ETag"] != plain.headers["ETag"]
+
+    # Either tag revalidates either representation
+    again = client.get("/table", headers={"If-None-Match": plain.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == gzipped.headers["ETag"]
+
+
+def test_changed_entry_gets_a_new_body(client):
+    etag = client.get("/table").headers["ETag"]
+    cache.replace(views.TABLE_KEY, [{"name": "changed"}])
+
+    changed = client.get("/table", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json() == [{"name": "changed"}]
+    assert changed.headers["ETag"] != etag
+
+
+def test_gzip_only_when_accepted(client):
+    for header in ("gzip", "deflate, gzip;q=0.5", "br;q=1.0, GZIP", "*", "identity;q=1, *;q=0.1"):
+        response = client.get("/table", headers={"Accept-Encoding": header})
+        assert response.headers.get("Content-Encoding") == "gzip", header
+
+    for header in ("gzip;q=0", "gzip; q=0.000", "x-gzip-no", "deflate", "*;q=0", "*, gzip;q=0", ""):
+        response = client.get("/table", headers={"Accept-Encoding": header})
+        assert "Content-Encoding" not in response.headers, header
+        assert response.json() == client.get("/table", headers={"Accept-Encoding": "identity"}).json()
@@ -0,0 +1,79 @@
+"""
+Commentary job queue: one job per match, and leases instead of age decide
+which taken jobs are lost.
+"""
+
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import jobs, main
+
+
+def test_concurrent_analyze_calls_share_one_job(ids, redis_client, monkeypatch):
+    match_id = ids["match"]
+    # A finished job that did not release the match: both requests find it
+    redis_client.hset(jobs._job_key("old"), mapping={
+        "id": "old", "match_id": str(match_id), "status": jobs.DONE, "attempts": "1", "created_at": "0"
+    })
+    redis_client.set(jobs._inflight_key(match_id), "old")
+
+    both_read = threading.Barrier(2, timeout=5)
+    get_job = jobs.get_job
+
+    def slow_get_job(job_id):
+        job = get_job(job_id)
+        if job_id == "old":
+            both_read.wait()
+        return job
+
+    monkeypatch.setattr(jobs, "get_job", slow_get_job)
+    client = TestClient(main.app)
+    responses = []
+
+    def analyze():
+        responses.append(client.post(f"/analyze/{match_id}").json())
+
+    threads = [threading.Thread(target=analyze) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [r["status"] for r in responses] == [jobs.QUEUED, jobs.QUEUED]
+    assert responses[0]["job_id"] == responses[1]["job_id"]
+    assert redis_client.lrange(jobs.QUEUE_KEY, 0, -1) == [responses[0]["job_id"]]
+    assert redis_client.get(jobs._inflight_key(match_id)) == responses[0]["job_id"]
+
+
+def _taken_job(client, job_id: str, status: str):
+    # Queued (or started) long before the visibility timeout
+    client.hset(jobs._job_key(job_id), mapping={
+        "id": job_id, "match_id": "1", "status": status, "attempts": "1", "created_at": "0", "started_at": "0"
+    })
+    client.lpush(jobs.PROCESSING_KEY, job_id)
+
+
+def test_requeue_checks_the_lease(redis_client):
+    # Just moved off the queue, not leased yet: gets a lease, not a second run
+    _taken_job(redis_client, "fresh", jobs.QUEUED)
+    # Long-running model call whose worker keeps renewing the lease
+    _taken_job(redis_client, "slow", jobs.RUNNING)
+    done = threading.Event()
+    lease = threading.Thread(target=jobs._hold_lease, args=(redis_client, "slow", done))
+    lease.start()
+    # Its worker died: the lease ran out
+    _taken_job(redis_client, "lost", jobs.RUNNING)
+    redis_client.zadd(jobs.LEASES_KEY, {"lost": time.time() - 1})
+
+    try:
+        assert jobs.requeue_stale_jobs() == 1
+    finally:
+        done.set()
+        lease.join()
+
+    assert redis_client.lrange(jobs.QUEUE_KEY, 0, -1) == ["lost"]
+    assert sorted(redis_client.lrange(jobs.PROCESSING_KEY, 0, -1)) == ["fresh", "slow"]
+    assert redis_client.zscore(jobs.LEASES_KEY, "fresh") > time.time()
+    assert redis_client.zscore(jobs.LEASES_KEY, "slow") is None
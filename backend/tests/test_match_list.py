@@ -0,0 +1,65 @@
+"""
+GET /matches/list: keyset pagination returns every match once, in order.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import or_
+
+from app import database, main, models
+
+
+@pytest.fixture
+def client(ids, redis_client):
+    return TestClient(main.app)
+
+
+def _walk(client, **params) -> list:
+    ids, cursor = [], None
+    while True:
+        page = client.get("/matches/list", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def _expected(*filters, descending=False) -> list:
+    db = database.SessionLocal()
+    try:
+        order = (models.Match.date.desc(), models.Match.id.desc()) if descending else (models.Match.date, models.Match.id)
+        return [m for (m,) in db.query(models.Match.id).filter(*filters).order_by(*order)]
+    finally:
+        db.close()
+
+
+def test_pages_cover_every_match_once(client):
+    # Leagues share kickoff times, so pages split runs of equal dates
+    assert _walk(client, limit=100) == _expected()
+    assert _walk(client, limit=100, order="desc") == _expected(descending=True)
+
+
+def test_pages_with_filters(client, ids):
+    team = ids["team"]
+    assert _walk(client, limit=7, league="EPL", season=2025, status="finished") == _expected(
+        models.Match.league == "EPL", models.Match.season == 2025, models.Match.status == "FINISHED"
+    )
+    assert _walk(client, limit=3, team_id=team) == _expected(
+        or_(models.Match.home_team_id == team, models.Match.away_team_id == team)
+    )
+
+
+def test_last_page_has_no_cursor(client, ids):
+    team = ids["team"]
+    params = {"team_id": team}
+    total = len(_expected(or_(models.Match.home_team_id == team, models.Match.away_team_id == team)))
+    assert 1 < total <= main.MAX_PAGE_SIZE
+    assert client.get("/matches/list", params={**params, "limit": total}).json()["next_cursor"] is None
+
+    first = client.get("/matches/list", params={**params, "limit": total - 1}).json()
+    last = client.get("/matches/list", params={**params, "limit": total - 1, "cursor": first["next_cursor"]}).json()
+    assert len(last["items"]) == 1 and last["next_cursor"] is None
+
+
+def test_invalid_cursor(client):
+    assert client.get("/matches/list", params={"cursor": "not-a-cursor"}).status_code == 400
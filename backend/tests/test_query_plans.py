@@ -0,0 +1,19 @@
+"""
+The hot query shapes are planned on their indexes.
+
+On the database of the `ids` fixture (migrated with Alembic, two synthetic
+leagues of three seasons), EXPLAINs the statements of every check in
+benchmarks.check_query_plans: each must use its expected indexes and must
+not scan the listed tables sequentially.
+"""
+
+import pytest
+
+from benchmarks import check_query_plans
+
+
+@pytest.mark.parametrize("name", list(check_query_plans.CHECKS))
+def test_query_uses_index(name, ids):
+    result = check_query_plans.check(name, ids)
+    assert not result["missing"], f"{name} does not use {result['missing']}: {result['plan']}"
+    assert not result["sequential_scans"], f"{name} scans {result['sequential_scans']}: {result['plan']}"
@@ -0,0 +1,102 @@
+"""
+Standings snapshots: the incremental update after a sync leaves the same
+rows as replaying the whole season, and ends on the teams' table.
+"""
+
+import copy
+
+import pytest
+
+from app import database, models, services, standings
+from benchmarks.synthetic import make_league_payload
+
+
+def _payload():
+    return make_league_payload(
+        n_teams=6, players_per_team=2, finished_ratio=0.5, team_id_offset=90_000,
+        match_id_offset=90_000_000, player_id_offset=90_000_000,
+    )
+
+
+def _sync(league, season, payload) -> dict:
+    db = database.SessionLocal()
+    try:
+        return services.sync_league(db, league, season, payload)
+    finally:
+        db.close()
+
+
+def _stored(db, league, season) -> dict:
+    rows = db.query(models.Standing).filter(models.Standing.league == league, models.Standing.season == season)
+    return {
+        (r.team_id, r.matchday): (r.match_id, r.position, *(pytest.approx(getattr(r, c)) for c in standings.COUNTERS))
+        for r in rows
+    }
+
+
+def _replayed(db, league, season) -> dict:
+    """Every team's record after each of its finished matches, and its place as of that matchday."""
+    teams = [t for (t,) in db.query(models.Team.id).filter(models.Team.league == league, models.Team.season == season)]
+    history = {t: [] for t in teams}
+    for m in db.execute(standings._finished(league, season).order_by(models.Match.date, models.Match.id)):
+        for team, gf, ga, xgf, xga in (
+            (m.home_team_id, m.home_score, m.away_score, m.home_xg, m.away_xg),
+            (m.away_team_id, m.away_score, m.home_score, m.away_xg, m.home_xg),
+        ):
+            prev = history[team][-1] if history[team] else {**standings.EMPTY, "team_id": team}
+            history[team].append({
+                "team_id": team, "match_id": m.id, "matchday": prev["matchday"] + 1,
+                "wins": prev["wins"] + (gf > ga), "draws": prev["draws"] + (gf == ga), "loses": prev["loses"] + (gf < ga),
+                "goals_scored": prev["goals_scored"] + gf, "goals_conceded": prev["goals_conceded"] + ga,
+                "points": prev["points"] + (3 if gf > ga else int(gf == ga)),
+                "xg_for": prev["xg_for"] + xgf, "xg_against": prev["xg_against"] + xga,
+            })
+
+    expected = {}
+    for matchday in range(1, max(len(h) for h in history.values()) + 1):
+        # Teams with fewer matches count with their latest row
+        table = [
+            h[min(matchday, len(h)) - 1] if h else {**standings.EMPTY, "team_id": t} for t, h in history.items()
+        ]
+        places = {r["team_id"]: p for p, r in enumerate(sorted(table, key=standings._sort_key), 1)}
+        for t, h in history.items():
+            if len(h) >= matchday:
+                row = h[matchday - 1]
+                expected[(t, matchday)] = (
+                    row["match_id"], places[t], *(pytest.approx(row[c]) for c in standings.COUNTERS)
+                )
+    return expected
+
+
+def _check(league, season):
+    db = database.SessionLocal()
+    try:
+        stored = _stored(db, league, season)
+        assert stored == _replayed(db, league, season)
+        # The last snapshot of each team is its row of the table
+        for team in db.query(models.Team).filter(models.Team.league == league, models.Team.season == season):
+            last = max(m for t, m in stored if t == team.id)
+            assert stored[(team.id, last)][2:] == tuple(
+                pytest.approx(getattr(team, c)) for c in standings.COUNTERS
+            )
+    finally:
+        db.close()
+
+
+def test_incremental_update_matches_a_full_replay(scratch_league):
+    league, season = scratch_league
+    payload = _payload()
+    _sync(league, season, payload)
+    _check(league, season)
+
+    changed = copy.deepcopy(payload)
+    results = sorted((d for d in changed["dates"] if d["isResult"]), key=lambda d: d["datetime"])
+    # An early result is corrected and the next round is played
+    results[2]["goals"] = {"h": "5", "a": "0"}
+    for fixture in sorted((d for d in changed["dates"] if not d["isResult"]), key=lambda d: d["datetime"])[:3]:
+        fixture.update({"isResult": True, "goals": {"h": "1", "a": "1"}, "xG": {"h": "0.9", "a": "1.1"}})
+
+    outcome = _sync(league, season, changed)
+    assert outcome["changes"]["tables"] == [[league, season]]
+    assert outcome["stages"]["standings"]["rows"] > 0
+    _check(league, season)
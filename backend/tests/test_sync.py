@@ -0,0 +1,87 @@
+"""
+services.sync_league: unchanged payloads and records are skipped by fingerprint.
+"""
+
+import copy
+
+from app import database, models, services
+from benchmarks.synthetic import make_league_payload
+
+
+def _payload():
+    return make_league_payload(
+        n_teams=4, players_per_team=3, team_id_offset=90_000,
+        match_id_offset=90_000_000, player_id_offset=90_000_000,
+    )
+
+
+def _sync(league, season, payload, force=False):
+    db = database.SessionLocal()
+    try:
+        return services.sync_league(db, league, season, payload, force=force)
+    finally:
+        db.close()
+
+
+def test_unchanged_payload_is_skipped(scratch_league):
+    league, season = scratch_league
+    payload = _payload()
+
+    first = _sync(league, season, payload)
+    assert first["status"] == "success" and not first["unchanged"]
+    assert first["processed"] == len(payload["dates"])
+
+    again = _sync(league, season, copy.deepcopy(payload))
+    assert again["unchanged"] and again["processed"] == 0
+    assert again["changes"] == {"teams": [], "matches": [], "players": [], "tables": [], "renamed": []}
+    assert "parse" not in again["stages"]
+
+
+def test_only_changed_records_are_written(scratch_league):
+    league, season = scratch_league
+    payload = _payload()
+    _sync(league, season, payload)
+
+    changed = copy.deepcopy(payload)
+    result = next(d for d in changed["dates"] if d["isResult"])
+    result["goals"]["h"] = str(int(result["goals"]["h"]) + 1)
+    outcome = _sync(league, season, changed)
+
+    db = database.SessionLocal()
+    try:
+        match = db.query(models.Match).filter(models.Match.external_id == int(result["id"])).one()
+        assert match.home_score == int(result["goals"]["h"])
+    finally:
+        db.close()
+    assert not outcome["unchanged"]
+    assert outcome["processed"] == 1
+    assert outcome["changes"]["matches"] == [match.id]
+    assert outcome["changes"]["players"] == []
+    assert {match.home_team_id, match.away_team_id} <= set(outcome["changes"]["teams"])
+    assert outcome["changes"]["tables"] == [[league, season]]
+
+    # force rewrites every record regardless of the fingerprints
+    forced = _sync(league, season, changed, force=True)
+    assert forced["processed"] == len(payload["dates"])
+
+
+def test_transferred_player_is_moved(scratch_league):
+    league, season = scratch_league
+    payload = _payload()
+    _sync(league, season, payload)
+
+    changed = copy.deepcopy(payload)
+    player = changed["players"][0]
+    new_team = next(t["title"] for t in changed["teams"].values() if t["title"] != player["team_title"])
+    player.update({"player_name": "Renamed Player", "team_title": new_team, "position": "GK"})
+    outcome = _sync(league, season, changed)
+
+    db = database.SessionLocal()
+    try:
+        row = db.query(models.Player).filter(
+            models.Player.league == league, models.Player.external_id == int(player["id"])
+        ).one()
+        assert outcome["changes"]["players"] == [row.id]
+        assert (row.name, row.team.name, row.position) == ("Renamed Player", new_team, "GK")
+    finally:
+        db.close()
@@ -0,0 +1,95 @@
+"""
+Cache warmer: after a sync or a logo update, the cached views that embed the
+changed matches, team names or logos are refreshed or invalidated.
+"""
+
+import copy
+
+from app import cache, database, models, services, views, warmer
+from benchmarks.synthetic import make_league_payload
+
+
+def _payload():
+    return make_league_payload(
+        n_teams=4, players_per_team=2, team_id_offset=90_000,
+        match_id_offset=90_000_000, player_id_offset=90_000_000,
+    )
+
+
+def _sync(league, season, payload) -> dict:
+    db = database.SessionLocal()
+    try:
+        return services.sync_league(db, league, season, payload)
+    finally:
+        db.close()
+
+
+def _finished_matches(league) -> list:
+    db = database.SessionLocal()
+    try:
+        return db.query(models.Match).filter(models.Match.league == league, models.Match.status == "FINISHED").all()
+    finally:
+        db.close()
+
+
+def _rename(payload, external_id: str, name: str):
+    old = payload["teams"][external_id]["title"]
+    payload["teams"][external_id]["title"] = name
+    for match in payload["dates"]:
+        for side in ("h", "a"):
+            if match[side]["title"] == old:
+                match[side]["title"] = name
+    for player in payload["players"]:
+        if player["team_title"] == old:
+            player["team_title"] = name
+
+
+def test_sync_drops_finished_and_renamed_team_pages(scratch_league, redis_client):
+    league, season = scratch_league
+    payload = _payload()
+    _sync(league, season, payload)
+
+    # A result comes in for a match whose page is cached
+    changed = copy.deepcopy(payload)
+    result = next(d for d in changed["dates"] if d["isResult"])
+    result["goals"]["h"] = str(int(result["goals"]["h"]) + 1)
+    match = next(m for m in _finished_matches(league) if m.external_id == int(result["id"]))
+    cache.set_cache(views.detail_key(match.id), {"stale": True})
+    warmer.after_sync(_sync(league, season, changed)["changes"])
+    assert cache.get_cache(views.detail_key(match.id)) is None
+
+    # A team is renamed: every page showing its name goes
+    team_ext = result["h"]["id"]
+    db = database.SessionLocal()
+    try:
+        team = db.query(models.Team).filter(models.Team.league == league, models.Team.external_id == int(team_ext)).one()
+        team_matches = [
+            m for (m,) in db.query(models.Match.id).filter(
+                (models.Match.home_team_id == team.id) | (models.Match.away_team_id == team.id)
+            )
+        ]
+        other = db.query(models.Match.id).filter(
+            models.Match.league == league, models.Match.home_team_id != team.id, models.Match.away_team_id != team.id
+        ).first()[0]
+    finally:
+        db.close()
+    for match_id in team_matches + [other]:
+        cache.set_cache(views.detail_key(match_id), {"stale": True})
+    cache.set_cache(views.top_players_key(league, season, "goals", 10), [{"team": "stale"}])
+
+    renamed = copy.deepcopy(changed)
+    _rename(renamed, team_ext, "Renamed FC")
+    changes = _sync(league, season, renamed)["changes"]
+    assert changes["renamed"] == [team.id]
+    warmer.after_sync(changes)
+    assert all(cache.get_cache(views.detail_key(m)) is None for m in team_matches)
+    assert cache.get_cache(views.top_players_key(league, season, "goals", 10)) is None
+    # Pages of other teams' matches are kept
+    assert cache.get_cache(views.detail_key(other)) == {"stale": True}
+
+
+def test_logo_update_drops_every_detail_page(ids, redis_client):
+    finished = _finished_matches("EPL")[0]
+    cache.set_cache(views.detail_key(finished.id), {"logo_home": "old"})
+    warmer.after_logos()
+    assert cache.get_cache(views.detail_key(finished.id)) is None
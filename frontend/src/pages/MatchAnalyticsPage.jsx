@@ -23,18 +23,49 @@ function MatchAnalyticsPage() {
             })
     }, [id])
 
-    const handleAnalyze = async () => {
+    const setAiText = (text) => {
+        setMatch(prev => ({
+            ...prev,
+            prediction: { ...(prev.prediction || {}), ai_text: text }
+        }))
+    }
+
+    // Fallback: queue a background job and poll until it finishes
+    const analyzeWithJob = async () => {
+        const res = await axios.post(`${API_BASE}/analyze/${id}`)
+        let job = res.data
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 2000))
+            job = (await axios.get(`${API_BASE}/analyze/jobs/${res.data.job_id}`)).data
+        }
+        if (job.status === 'failed') throw new Error(job.error || 'AI job failed')
+        return job.text
+    }
+
+    const handleAnalyze = () => {
         setAnalyzing(true)
-        try {
-            const res = await axios.post(`${API_BASE}/analyze/${id}`)
-            setMatch(prev => ({
-                ...prev,
-                prediction: { ...(prev.prediction || {}), ai_text: res.data.text }
-            }))
-        } catch (err) {
-            alert("AI Analysis error")
-        } finally {
+        let streamed = ''
+        const source = new EventSource(`${API_BASE}/analyze/${id}/stream`)
+
+        // Tokens are shown as soon as the model produces them
+        source.onmessage = (e) => {
+            streamed += JSON.parse(e.data).token
+            setAiText(streamed)
+        }
+        source.addEventListener('done', (e) => {
+            source.close()
+            setAiText(JSON.parse(e.data).text)
             setAnalyzing(false)
+        })
+        source.onerror = async () => {
+            source.close()
+            try {
+                setAiText(await analyzeWithJob())
+            } catch (err) {
+                alert("AI Analysis error")
+            } finally {
+                setAnalyzing(false)
+            }
         }
     }
 